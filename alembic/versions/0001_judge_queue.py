@@ -0,0 +1,36 @@
+"""judge queue columns on submissions
+
+Revision ID: 0001_judge_queue
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_judge_queue'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('submissions', sa.Column('is_run', sa.Boolean(), nullable=True, server_default=sa.false()))
+    op.add_column('submissions', sa.Column('result', sa.Text(), nullable=True))
+    op.add_column('submissions', sa.Column('started_at', sa.DateTime(), nullable=True))
+    op.add_column('submissions', sa.Column('finished_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_submissions_status_submitted_at', 'submissions', ['status', 'submitted_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_submissions_status_submitted_at', table_name='submissions')
+    op.drop_column('submissions', 'finished_at')
+    op.drop_column('submissions', 'started_at')
+    op.drop_column('submissions', 'result')
+    op.drop_column('submissions', 'is_run')
@@ -0,0 +1,30 @@
+"""test_number on test_results for streaming
+
+Revision ID: 0002_test_result_number
+Revises: 0001_judge_queue
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_test_result_number'
+down_revision: Union[str, None] = '0001_judge_queue'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('test_results', sa.Column('test_number', sa.Integer(), nullable=True))
+    op.create_index('ix_test_results_submission_id', 'test_results', ['submission_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_test_results_submission_id', table_name='test_results')
+    op.drop_column('test_results', 'test_number')
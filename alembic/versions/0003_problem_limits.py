@@ -0,0 +1,30 @@
+"""per-problem time and memory limits
+
+Revision ID: 0003_problem_limits
+Revises: 0002_test_result_number
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_problem_limits'
+down_revision: Union[str, None] = '0002_test_result_number'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('problems', sa.Column('time_limit_ms', sa.Integer(), nullable=False, server_default='2000'))
+    op.add_column('problems', sa.Column('memory_limit_mb', sa.Integer(), nullable=False, server_default='128'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('problems', 'memory_limit_mb')
+    op.drop_column('problems', 'time_limit_ms')
@@ -0,0 +1,33 @@
+"""judge queue priority
+
+Revision ID: 0004_queue_priority
+Revises: 0003_problem_limits
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004_queue_priority'
+down_revision: Union[str, None] = '0003_problem_limits'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('submissions', sa.Column('priority', sa.Integer(), nullable=False, server_default='2'))
+    op.execute("UPDATE submissions SET priority = 0 WHERE is_run")
+    op.drop_index('ix_submissions_status_submitted_at', table_name='submissions')
+    op.create_index('ix_submissions_queue', 'submissions', ['status', 'priority', 'submitted_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_submissions_queue', table_name='submissions')
+    op.create_index('ix_submissions_status_submitted_at', 'submissions', ['status', 'submitted_at'])
+    op.drop_column('submissions', 'priority')
@@ -0,0 +1,32 @@
+"""per-problem output comparison mode
+
+Revision ID: 0005_comparison_mode
+Revises: 0004_queue_priority
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005_comparison_mode'
+down_revision: Union[str, None] = '0004_queue_priority'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('problems', sa.Column('comparison_mode', sa.String(), nullable=False, server_default='exact'))
+    op.add_column('problems', sa.Column('float_abs_eps', sa.Float(), nullable=False, server_default='0.000001'))
+    op.add_column('problems', sa.Column('float_rel_eps', sa.Float(), nullable=False, server_default='0.000001'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('problems', 'float_rel_eps')
+    op.drop_column('problems', 'float_abs_eps')
+    op.drop_column('problems', 'comparison_mode')
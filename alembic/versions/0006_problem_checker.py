@@ -0,0 +1,30 @@
+"""per-problem checker programs
+
+Revision ID: 0006_problem_checker
+Revises: 0005_comparison_mode
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006_problem_checker'
+down_revision: Union[str, None] = '0005_comparison_mode'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('problems', sa.Column('checker_language', sa.String(), nullable=True))
+    op.add_column('problems', sa.Column('checker_source', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('problems', 'checker_source')
+    op.drop_column('problems', 'checker_language')
@@ -0,0 +1,101 @@
+"""one test_cases row per test, with ordinal, weight and stored blobs
+
+Revision ID: 0007_test_case_rows
+Revises: 0006_problem_checker
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007_test_case_rows'
+down_revision: Union[str, None] = '0006_problem_checker'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+test_cases = sa.table(
+    'test_cases',
+    sa.column('id', sa.Integer),
+    sa.column('problem_id', sa.Integer),
+    sa.column('ordinal', sa.Integer),
+    sa.column('input_data', sa.Text),
+    sa.column('expected_output', sa.Text),
+    sa.column('is_sample', sa.Boolean),
+)
+test_results = sa.table(
+    'test_results',
+    sa.column('test_case_id', sa.Integer),
+)
+
+
+def split_tests(input_data, expected_output):
+    """
+    Split an old "count\\ntest1\\ntest2..." row into (input, output) pairs.
+    Each test takes the same number of lines, so the line counts after the
+    headers must divide evenly; rows that don't fit are kept as one test.
+    """
+    inputs = (input_data or "").strip().split("\n")
+    outputs = (expected_output or "").strip().split("\n")
+    try:
+        count = int(inputs[0])
+    except ValueError:
+        return None
+    if count <= 0 or outputs[0].strip() != str(count):
+        return None
+    inputs, outputs = inputs[1:], outputs[1:]
+    if len(inputs) % count or len(outputs) % count:
+        return None
+    input_lines, output_lines = len(inputs) // count, len(outputs) // count
+    return [("\n".join(inputs[i * input_lines:(i + 1) * input_lines]),
+             "\n".join(outputs[i * output_lines:(i + 1) * output_lines])) for i in range(count)]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('test_cases', sa.Column('ordinal', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('test_cases', sa.Column('weight', sa.Float(), nullable=False, server_default='1'))
+    op.add_column('test_cases', sa.Column('input_blob', sa.String(length=64), nullable=True))
+    op.add_column('test_cases', sa.Column('output_blob', sa.String(length=64), nullable=True))
+    op.create_index('ix_test_cases_problem_ordinal', 'test_cases', ['problem_id', 'ordinal'])
+
+    # Split the old multi-test rows into a row per test, numbered per problem
+    # in their old order. Data stays inline; rows over the inline limit can
+    # be moved to the test data store by re-importing the problem's tests.
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(test_cases.c.id, test_cases.c.problem_id, test_cases.c.input_data,
+                  test_cases.c.expected_output, test_cases.c.is_sample)
+        .order_by(test_cases.c.problem_id, test_cases.c.id)
+    ).fetchall()
+    ordinals = {}
+    for row in rows:
+        tests = split_tests(row.input_data, row.expected_output)
+        if tests is None:
+            ordinals[row.problem_id] = ordinals.get(row.problem_id, 0) + 1
+            conn.execute(test_cases.update().where(test_cases.c.id == row.id)
+                         .values(ordinal=ordinals[row.problem_id]))
+            continue
+        for input_data, expected_output in tests:
+            ordinals[row.problem_id] = ordinals.get(row.problem_id, 0) + 1
+            conn.execute(test_cases.insert().values(
+                problem_id=row.problem_id, ordinal=ordinals[row.problem_id], input_data=input_data,
+                expected_output=expected_output, is_sample=row.is_sample,
+            ))
+        # Old results pointed at the whole row, their test numbers are all that's left
+        conn.execute(test_results.update().where(test_results.c.test_case_id == row.id).values(test_case_id=None))
+        conn.execute(test_cases.delete().where(test_cases.c.id == row.id))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Tests stay one per row; the old format can't hold multi-line tests
+    op.drop_index('ix_test_cases_problem_ordinal', table_name='test_cases')
+    op.drop_column('test_cases', 'output_blob')
+    op.drop_column('test_cases', 'input_blob')
+    op.drop_column('test_cases', 'weight')
+    op.drop_column('test_cases', 'ordinal')
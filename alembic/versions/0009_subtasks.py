@@ -0,0 +1,45 @@
+"""subtasks with points and partial submission scores
+
+Revision ID: 0009_subtasks
+Revises: 0008_test_version
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009_subtasks'
+down_revision: Union[str, None] = '0008_test_version'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'subtasks',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('problem_id', sa.Integer(), nullable=True),
+        sa.Column('number', sa.Integer(), nullable=False),
+        sa.Column('points', sa.Float(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['problem_id'], ['problems.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_subtasks_id'), 'subtasks', ['id'], unique=False)
+    op.create_index(op.f('ix_subtasks_problem_id'), 'subtasks', ['problem_id'], unique=False)
+    op.add_column('test_cases', sa.Column('subtask', sa.Integer(), nullable=True))
+    op.add_column('submissions', sa.Column('score', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('submissions', 'score')
+    op.drop_column('test_cases', 'subtask')
+    op.drop_index(op.f('ix_subtasks_problem_id'), table_name='subtasks')
+    op.drop_index(op.f('ix_subtasks_id'), table_name='subtasks')
+    op.drop_table('subtasks')
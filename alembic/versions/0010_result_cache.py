@@ -0,0 +1,34 @@
+"""result keys on submissions for reusing judged results
+
+Revision ID: 0010_result_cache
+Revises: 0009_subtasks
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010_result_cache'
+down_revision: Union[str, None] = '0009_subtasks'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('submissions', sa.Column('result_key', sa.String(length=64), nullable=True))
+    op.add_column('submissions', sa.Column('cached_from', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_submissions_result_key'), 'submissions', ['result_key'], unique=False)
+    op.create_foreign_key('fk_submissions_cached_from', 'submissions', 'submissions', ['cached_from'], ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('fk_submissions_cached_from', 'submissions', type_='foreignkey')
+    op.drop_index(op.f('ix_submissions_result_key'), table_name='submissions')
+    op.drop_column('submissions', 'cached_from')
+    op.drop_column('submissions', 'result_key')
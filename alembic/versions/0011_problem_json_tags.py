@@ -0,0 +1,98 @@
+"""problem examples, constraints and tags as JSON, and a problem_tags index
+
+Revision ID: 0011_problem_json_tags
+Revises: 0010_result_cache
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011_problem_json_tags'
+down_revision: Union[str, None] = '0010_result_cache'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+JSON_COLUMNS = ('examples', 'constraints', 'tags')
+json_document = sa.JSON(none_as_null=True).with_variant(postgresql.JSONB(none_as_null=True), 'postgresql')
+
+problem_tags = sa.table(
+    'problem_tags',
+    sa.column('problem_id', sa.Integer),
+    sa.column('tag', sa.String),
+)
+
+
+def parse(value):
+    """An old JSON string column's value; unreadable ones were shown as empty lists"""
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+
+def tag_key(tag):
+    # As app.models.models.tag_key
+    return "-".join(str(tag).lower().split())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'problem_tags',
+        sa.Column('problem_id', sa.Integer(), nullable=False),
+        sa.Column('tag', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['problem_id'], ['problems.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('problem_id', 'tag')
+    )
+    op.create_index('ix_problem_tags_tag_problem', 'problem_tags', ['tag', 'problem_id'], unique=False)
+
+    # Parse the old strings before the columns change type, then write them
+    # back as documents; PostgreSQL would refuse to cast malformed ones
+    conn = op.get_bind()
+    old_problems = sa.table('problems', sa.column('id', sa.Integer),
+                            *[sa.column(name, sa.Text) for name in JSON_COLUMNS])
+    rows = conn.execute(sa.select(old_problems)).fetchall()
+    documents = {row.id: {name: parse(getattr(row, name)) for name in JSON_COLUMNS} for row in rows}
+
+    if conn.dialect.name == 'postgresql':
+        for name in JSON_COLUMNS:
+            op.alter_column('problems', name, type_=postgresql.JSONB(), postgresql_using='NULL')
+    else:
+        with op.batch_alter_table('problems') as batch_op:
+            for name in JSON_COLUMNS:
+                batch_op.alter_column(name, type_=sa.JSON())
+    # After the columns change: SQLite rebuilds the table without expression indexes
+    op.create_index('ix_problems_difficulty_lower', 'problems', [sa.text('lower(difficulty)')], unique=False)
+
+    new_problems = sa.table('problems', sa.column('id', sa.Integer),
+                            *[sa.column(name, json_document) for name in JSON_COLUMNS])
+    for problem_id, values in documents.items():
+        conn.execute(new_problems.update().where(new_problems.c.id == problem_id).values(**values))
+        tags = values['tags'] if isinstance(values['tags'], list) else []
+        keys = [key for key in dict.fromkeys(tag_key(tag) for tag in tags) if key]
+        if keys:
+            conn.execute(problem_tags.insert(), [{'problem_id': problem_id, 'tag': key} for key in keys])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_problems_difficulty_lower', table_name='problems')
+    if op.get_bind().dialect.name == 'postgresql':
+        for name in JSON_COLUMNS:
+            op.alter_column('problems', name, type_=sa.Text(), postgresql_using=f'{name}::text')
+    else:
+        with op.batch_alter_table('problems') as batch_op:
+            for name in JSON_COLUMNS:
+                batch_op.alter_column(name, type_=sa.Text())
+    op.drop_index('ix_problem_tags_tag_problem', table_name='problem_tags')
+    op.drop_table('problem_tags')
@@ -0,0 +1,35 @@
+"""indexes for keyset pagination of problems and submissions
+
+Revision ID: 0012_pagination_indexes
+Revises: 0011_problem_json_tags
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012_pagination_indexes'
+down_revision: Union[str, None] = '0011_problem_json_tags'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_submissions_user_submitted', 'submissions', ['user_id', 'submitted_at', 'id'], unique=False)
+    op.create_index('ix_submissions_user_problem_submitted', 'submissions',
+                    ['user_id', 'problem_id', 'submitted_at', 'id'], unique=False)
+    op.create_index('ix_problems_title_id', 'problems', ['title', 'id'], unique=False)
+    op.create_index('ix_problems_acceptance_id', 'problems', ['acceptance', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_problems_acceptance_id', table_name='problems')
+    op.drop_index('ix_problems_title_id', table_name='problems')
+    op.drop_index('ix_submissions_user_problem_submitted', table_name='submissions')
+    op.drop_index('ix_submissions_user_submitted', table_name='submissions')
@@ -2,7 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 import jwt as pyjwt
 from datetime import datetime, timedelta
@@ -40,7 +42,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = pyjwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -53,7 +55,7 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except pyjwt.PyJWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+    user = await db.scalar(select(User).where(User.username == username))
     if user is None:
         raise credentials_exception
     return user
@@ -77,20 +79,20 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
 #     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register")
-async def register_user(user_data: UserRegistration, db: Session = Depends(get_db)):
+async def register_user(user_data: UserRegistration, db: AsyncSession = Depends(get_db)):
     try:
         # Check if username already exists
-        existing_user = db.query(User).filter(User.username == user_data.username).first()
+        existing_user = await db.scalar(select(User).where(User.username == user_data.username))
         if existing_user:
             raise HTTPException(status_code=400, detail="Username already registered")
         
         # Check if email already exists
-        existing_email = db.query(User).filter(User.email == user_data.email).first()
+        existing_email = await db.scalar(select(User).where(User.email == user_data.email))
         if existing_email:
             raise HTTPException(status_code=400, detail="Email already registered")
         
-        # Create new user
-        hashed_password = get_password_hash(user_data.password)
+        # Create new user. bcrypt is slow on purpose, so it runs off the event loop
+        hashed_password = await run_in_threadpool(get_password_hash, user_data.password)
         new_user = User(
             username=user_data.username,
             email=user_data.email,
@@ -106,21 +108,21 @@ async def register_user(user_data: UserRegistration, db: Session = Depends(get_d
         )
         
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         
         return {
             "message": "User registered successfully", 
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Registration error: {str(e)}")
 
 @router.post("/auth/login")
-async def login_user(login_data:UserLogin, db: Session = Depends(get_db)):
+async def login_user(login_data:UserLogin, db: AsyncSession = Depends(get_db)):
     
-    user = db.query(User).filter(User.email == login_data.email).first()
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    user = await db.scalar(select(User).where(User.email == login_data.email))
+    if not user or not await run_in_threadpool(verify_password, login_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -136,18 +138,18 @@ async def login_user(login_data:UserLogin, db: Session = Depends(get_db)):
 
 # Additional auth endpoints for the frontend
 @router.post("/auth/check-email")
-async def check_email_availability(email: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == email).first()
+async def check_email_availability(email: str, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.email == email))
     return {"available": user is None}
 
 @router.post("/auth/check-username")
-async def check_username_availability(username: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
+async def check_username_availability(username: str, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.username == username))
     return {"available": user is None}
 
 @router.post("/auth/resend-verification")
-async def resend_verification_email(email: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == email).first()
+async def resend_verification_email(email: str, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
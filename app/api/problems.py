@@ -1,13 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Request, UploadFile, File
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, List, Dict, Any, Literal, Optional, Sequence
+from datetime import datetime, timezone
+import asyncio
+import base64
 import json
 
-from app.db.database import get_db
-from app.models.models import Problem, TestCase, Submission, TestResult, User
+from app.db.database import get_db, AsyncSessionLocal, SessionLocal
+from app.models.models import (
+    Problem, ProblemTag, TestCase, Subtask, Submission, TestResult, User,
+    SUBMISSION_QUEUED, SUBMISSION_RUNNING, tag_key, tag_links,
+)
 from app.api.auth import get_current_user
-from app.services.code_execution import execute_code
-from app.schemas.problems import ProblemList, ProblemCreate
+from app.services.artifact_cache import artifact_cache
+from app.services.test_data import (
+    TestDataError, bump_test_version, case_text, import_test_pack, new_test_case, next_ordinal,
+)
+from app.services.judge_metrics import CACHE_LOOKUPS
+from app.services.problem_cache import problem_cache
+from app.services.judge_queue import (
+    enqueue_submission, find_judged_submission, queue_is_full, queue_stats, result_key, reuse_judged_submission,
+)
+from app.core.config import settings
+from app.schemas.problems import ProblemList, ProblemCreate, CheckerUpdate, SubtaskBase, SubmissionSummary
 
 # Create router
 router = APIRouter(tags=["problems"])
@@ -16,113 +36,318 @@ router = APIRouter(tags=["problems"])
 @router.post("/problems/", response_model=dict)
 async def create_problem(
     problem: ProblemCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     # In a production environment, you'd check if user is admin
     # if not current_user.is_admin:
     #    raise HTTPException(status_code=403, detail="Not authorized to create problems")
     
-    # Convert lists to JSON strings for database storage
-    examples_json = json.dumps(problem.examples) if problem.examples else None
-    constraints_json = json.dumps(problem.constraints) if problem.constraints else None
-    tags_json = json.dumps(problem.tags) if problem.tags else None
+    if problem.checker_source:
+        if not problem.checker_language:
+            raise HTTPException(status_code=400, detail="checker_language is required with checker_source")
     
     new_problem = Problem(
         title=problem.title,
         description=problem.description,
         difficulty=problem.difficulty,
-        examples=examples_json,
-        constraints=constraints_json,
-        tags=tags_json,
+        examples=[example.dict() for example in problem.examples] if problem.examples else None,
+        constraints=problem.constraints or None,
+        tags=problem.tags or None,
+        tag_links=tag_links(problem.tags),
         acceptance=problem.acceptance,
         likes=problem.likes,
         dislikes=problem.dislikes,
+        time=problem.time,
+        time_limit_ms=problem.time_limit_ms,
+        memory_limit_mb=problem.memory_limit_mb,
+        comparison_mode=problem.comparison_mode,
+        float_abs_eps=problem.float_abs_eps,
+        float_rel_eps=problem.float_rel_eps,
+        checker_language=problem.checker_language if problem.checker_source else None,
+        checker_source=problem.checker_source or None,
     )
     
     db.add(new_problem)
-    db.commit()
-    db.refresh(new_problem)
+    await db.commit()
+    await db.refresh(new_problem)
+    problem_cache.invalidate()
     
     return {"message": "Problem created successfully", "problem_id": new_problem.id}
 
+# Checker programs are compiled by the judges, on the first submission that
+# needs one; a checker that doesn't compile fails submissions as Judge Error
+@router.put("/problems/{problem_id}/checker", response_model=dict)
+async def set_problem_checker(
+    problem_id: int,
+    checker: CheckerUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    problem = await db.get(Problem, problem_id)
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    
+    problem.checker_language = checker.language
+    problem.checker_source = checker.source
+    await db.commit()
+    
+    return {"message": "Checker saved successfully", "problem_id": problem.id}
+
+@router.delete("/problems/{problem_id}/checker", response_model=dict)
+async def remove_problem_checker(
+    problem_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    problem = await db.get(Problem, problem_id)
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    
+    # Outputs go back to being compared by the problem's comparison_mode
+    problem.checker_language = None
+    problem.checker_source = None
+    await db.commit()
+    
+    return {"message": "Checker removed successfully", "problem_id": problem.id}
+
 @router.post("/problems/{problem_id}/test-cases/", response_model=dict)
 async def add_test_case(
     problem_id: int,
     input_data: str,
     expected_output: str,
     is_sample: bool = False,
+    weight: float = 1.0,
+    ordinal: Optional[int] = None,
+    subtask: Optional[int] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # In a production environment, you'd check if user is admin
     # if not current_user.is_admin:
     #    raise HTTPException(status_code=403, detail="Not authorized to add test cases")
     
     # Check if problem exists
-    problem = db.query(Problem).filter(Problem.id == problem_id).first()
+    problem = await db.get(Problem, problem_id)
     if not problem:
         raise HTTPException(status_code=404, detail="Problem not found")
     
-    new_test_case = TestCase(
-        problem_id=problem_id,
-        input_data=input_data,
-        expected_output=expected_output,
-        is_sample=is_sample
-    )
+    # One test per call, appended after the problem's other tests by default
+    if ordinal is None:
+        ordinal = await db.run_sync(next_ordinal, problem_id)
+    # Large tests are written to the test data store, off the event loop
+    test_case = await run_in_threadpool(new_test_case, problem_id, ordinal, input_data, expected_output,
+                                        is_sample=is_sample, weight=weight, subtask=subtask)
     
-    db.add(new_test_case)
-    db.commit()
-    db.refresh(new_test_case)
+    db.add(test_case)
+    await db.run_sync(bump_test_version, problem_id)
+    await db.commit()
+    await db.refresh(test_case)
+    problem_cache.invalidate()
     
-    return {"message": "Test case added successfully", "test_case_id": new_test_case.id}
+    return {"message": "Test case added successfully", "test_case_id": test_case.id, "ordinal": test_case.ordinal}
+
+@router.post("/problems/{problem_id}/test-pack", response_model=dict)
+async def upload_test_pack(
+    problem_id: int,
+    pack: UploadFile = File(...),
+    replace: bool = True,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Import a zip of <name>.in and <name>.out (or .ans) files as the problem's
+    tests, replacing its current ones unless replace is false. Tests named
+    sample* are the samples and tests under subtask<N>/ belong to subtask N.
+    Large packs are better imported on the server
+    with `python -m app.services.test_data`.
+    """
+    problem = await db.get(Problem, problem_id)
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    
+    try:
+        count = await run_in_threadpool(import_pack, problem_id, pack.file, replace)
+    except TestDataError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    problem_cache.invalidate()
+    
+    return {"message": "Test pack imported successfully", "test_case_count": count}
+
+def import_pack(problem_id: int, source, replace: bool) -> int:
+    # Unpacking and storing a pack is mostly file I/O, so it runs in a
+    # worker thread with a session of its own
+    db = SessionLocal()
+    try:
+        return import_test_pack(db, problem_id, source, replace=replace)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+@router.put("/problems/{problem_id}/subtasks", response_model=dict)
+async def set_problem_subtasks(
+    problem_id: int,
+    subtasks: List[SubtaskBase],
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Replace the problem's subtasks. A submission earns a subtask's points
+    times the lowest score among its test cases and stops judging a subtask
+    at its first failing test. An empty list scores the tests by weight.
+    """
+    problem = await db.get(Problem, problem_id)
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    numbers = [subtask.number for subtask in subtasks]
+    if len(set(numbers)) != len(numbers):
+        raise HTTPException(status_code=400, detail="Subtask numbers must be unique")
+    
+    await db.execute(delete(Subtask).where(Subtask.problem_id == problem_id))
+    for subtask in subtasks:
+        db.add(Subtask(problem_id=problem_id, number=subtask.number, points=subtask.points, name=subtask.name))
+    # Scores change with the subtasks, so judged results can't be reused
+    await db.run_sync(bump_test_version, problem_id)
+    await db.commit()
+    
+    return {"message": "Subtasks saved successfully", "problem_id": problem_id, "subtask_count": len(subtasks)}
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+# Problem pages are read far more often than problems change, so their
+# serialized responses are cached (see app/services/problem_cache.py) and
+# carry an ETag for browsers to revalidate against
+async def cached_response(request: Request, key: str, build) -> Response:
+    cached = problem_cache.get(key)
+    CACHE_LOOKUPS.inc(cache="problem", result="hit" if cached else "miss")
+    if cached is None:
+        generation = problem_cache.generation()
+        body = json.dumps(jsonable_encoder(await build())).encode('utf-8')
+        cached = problem_cache.put(key, body, generation)
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Keyset pagination: a page's next_cursor holds the sort key of its last
+# row and the next page starts right after that key, so the (sort column,
+# id) indexes seek to it and deep pages cost what the first one does
+def encode_cursor(*values) -> str:
+    data = json.dumps(jsonable_encoder(values)).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip("=")
+
+def decode_cursor(cursor: str, types: Sequence[Callable]) -> list:
+    """The values of a cursor, converted by types (one per sort column)"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types) or None in values:
+            raise ValueError(cursor)
+        return [convert(value) for convert, value in zip(types, values)]
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def after_cursor(columns: Sequence, values: Sequence, descending: bool):
+    """Rows after the cursor in (columns) order, a row-value comparison the index serves"""
+    key, bound = tuple_(*columns), tuple_(*values)
+    return key < bound if descending else key > bound
+
+def ordered(columns: Sequence, descending: bool) -> list:
+    return [column.desc() if descending else column.asc() for column in columns]
+
+def utc_naive(moment: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC"""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+# Sort orders of /problems: the columns each pages by and their types
+PROBLEM_SORTS = {
+    "id": ((Problem.id,), (int,)),
+    "title": ((Problem.title, Problem.id), (str, int)),
+    "acceptance": ((Problem.acceptance, Problem.id), (float, int)),
+}
 
 @router.get("/problems", response_model=dict)
 async def get_problems(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    request: Request,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    sort: Literal["id", "title", "acceptance"] = "id",
+    order: Literal["asc", "desc"] = "asc",
+    difficulty: Optional[str] = None,
+    tag: List[str] = Query([]),
+    db: AsyncSession = Depends(get_db)
 ):
-    problems = db.query(Problem).offset(skip).limit(limit).all()
+    """
+    A page of problems, optionally only those of a difficulty and having
+    every given tag (both case-insensitive, tags also ignore spacing: "hash
+    table" matches "Hash Table" and "hash-table"). Pass next_cursor back,
+    with the same sort and filters, for the next page; it is null on the
+    last one. total counts every page.
+    """
+    tags = sorted({tag_key(name) for name in tag} - {""})
+    key = f"problems:{limit}:{cursor}:{sort}:{order}:{(difficulty or '').lower()}:{','.join(tags)}"
+    return await cached_response(request, key, lambda: load_problems(
+        db, limit=limit, cursor=cursor, sort=sort, descending=order == "desc", difficulty=difficulty, tags=tags))
+
+async def load_problems(db: AsyncSession, limit: int, cursor: Optional[str], sort: str, descending: bool,
+                        difficulty: Optional[str], tags: List[str]) -> dict:
+    query = select(Problem)
+    if difficulty:
+        query = query.where(func.lower(Problem.difficulty) == difficulty.lower())
+    for key in tags:
+        query = query.where(Problem.id.in_(select(ProblemTag.problem_id).where(ProblemTag.tag == key)))
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    
+    columns, types = PROBLEM_SORTS[sort]
+    if cursor:
+        query = query.where(after_cursor(columns, decode_cursor(cursor, types), descending))
+    problems = (await db.scalars(query.order_by(*ordered(columns, descending)).limit(limit + 1))).all()
+    
+    next_cursor = None
+    if len(problems) > limit:
+        problems = problems[:limit]
+        next_cursor = encode_cursor(*[getattr(problems[-1], column.key) for column in columns])
     serialized_problems = [ProblemList.from_orm(problem).dict() for problem in problems]
-    return {"problems": serialized_problems}
+    return {"problems": serialized_problems, "next_cursor": next_cursor, "total": total}
 
 @router.get("/problems/{problem_id}", response_model=dict)
 async def get_problem(
     problem_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db)
 ):
-    problem = db.query(Problem).filter(Problem.id == problem_id).first()
+    return await cached_response(request, f"problem:{problem_id}", lambda: load_problem(problem_id, db))
+
+async def load_problem(problem_id: int, db: AsyncSession) -> dict:
+    problem = await db.scalar(select(Problem).where(Problem.id == problem_id))
     if not problem:
         raise HTTPException(status_code=404, detail="Problem not found")
     
-    # Get sample test cases
-    sample_test_cases = db.query(TestCase).filter(
+    # Only sample tests are sent; the rest stay hidden, and this response is cached
+    sample_test_cases = (await db.scalars(select(TestCase).where(
         TestCase.problem_id == problem_id,
         TestCase.is_sample == True
-    ).all()
+    ).order_by(TestCase.ordinal, TestCase.id))).all()
     
     from app.schemas.problems import Problem as ProblemSchema
     # from app.schemas.problems import TestCaseSample
     
     # Convert SQLAlchemy models to Pydantic models for serialization
     problem_schema = ProblemSchema.from_orm(problem)
-    # sample_test_cases = TestCaseSample.from_orm(sample_test_cases)
-    # Parse sample test cases (input/output) into lists
+    # One entry per sample test, large ones cut short
     sample_test_cases_list = []
     for tc in sample_test_cases:
-        # Split input and output by lines
-        input_lines = tc.input_data.strip().split('\n')
-        output_lines = tc.expected_output.strip().split('\n')
-        # If first line is number of test cases, skip it for each test case
-        inputs = input_lines[1:]
-        output = output_lines[1:]
-        # Pair each input/output (if lengths match)
-        for i, (inp, out) in enumerate(zip(inputs, output)):
-            sample_test_cases_list.append({
-                "input_data": inp,
-                "expected_output": out
-            })
+        input_text, output_text = case_text(tc, limit=settings.JUDGE_OUTPUT_PREVIEW)
+        sample_test_cases_list.append({
+            "input_data": input_text,
+            "expected_output": output_text
+        })
 
     return {
         "problem": problem_schema,
@@ -130,13 +355,26 @@ async def get_problem(
     }
 
 # Code execution endpoints
+# Both endpoints only enqueue a job and return its id; judge workers run the
+# code and clients follow /judge/{id}/events (or poll /runs/{id} and
+# /submissions/{id}) for the verdict. Code identical to an already judged
+# submission isn't queued, the new one is finished with its result.
+async def ensure_queue_capacity(db: AsyncSession):
+    """Turn new jobs away while the judge queue is at JUDGE_MAX_QUEUE_DEPTH"""
+    if await db.run_sync(queue_is_full):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The judge is busy, please try again shortly",
+            headers={"Retry-After": "5"}
+        )
+
 @router.post("/run/{problem_id}", response_model=dict)
 async def run_code(
     problem_id: int,
     request_body: dict = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    problem = db.query(Problem).filter(Problem.id == problem_id).first()
+    problem = await db.get(Problem, problem_id)
     if not problem:
         raise HTTPException(status_code=404, detail="Problem not found")
     
@@ -149,41 +387,52 @@ async def run_code(
     if not language:
         raise HTTPException(status_code=400, detail="Language is required")
     
-    # Get test cases for the problem with is_sample=true
-    test_cases = db.query(TestCase).filter(
+    # Make sure there is something to run against
+    has_samples = await db.scalar(select(TestCase.id).where(
         TestCase.problem_id == problem_id,
         TestCase.is_sample == True
-    ).all()
-    if not test_cases:
+    ).limit(1))
+    if not has_samples:
         raise HTTPException(status_code=404, detail="No sample test cases found for this problem")
     
-    input_data = ""
-    expected_output = ""
-    for i, test_case in enumerate(test_cases):
-        input_data += f"{test_case.input_data}\n"
-        expected_output += f"{test_case.expected_output}\n"
+    key = result_key(problem, language, code)
+    judged = await db.run_sync(find_judged_submission, key, is_run=True)
+    CACHE_LOOKUPS.inc(cache="result", result="hit" if judged else "miss")
+    if judged:
+        run = await db.run_sync(reuse_judged_submission, judged, code)
+    else:
+        await ensure_queue_capacity(db)
+        run = await db.run_sync(enqueue_submission, problem_id, language, code, is_run=True, result_key=key)
+    return {"submission_id": run.id, "status": run.status, "cached": judged is not None}
 
-    try:
-        result = execute_code(
-            language=language, 
-            source_code=code,
-            input_data=input_data,
-            expected_output=expected_output,
-            early_termination=False
-        )
-        return {"result": result}
-    except Exception as e:
-        return {"error": str(e)}
+@router.get("/runs/{run_id}", response_model=dict)
+async def get_run_result(
+    run_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    run = await db.scalar(select(Submission).where(
+        Submission.id == run_id,
+        Submission.is_run == True
+    ))
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    
+    return {
+        "submission_id": run.id,
+        "status": run.status,
+        "cached_from": run.cached_from,
+        "result": json.loads(run.result) if run.result else None
+    }
 
 @router.post("/submit/{problem_id}", response_model=dict)
 async def submit_code(
     problem_id: int, 
     request_body: dict = Body(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if problem exists
-    problem = db.query(Problem).filter(Problem.id == problem_id).first()
+    problem = await db.get(Problem, problem_id)
     if not problem:
         raise HTTPException(status_code=404, detail="Problem not found")
     
@@ -196,84 +445,175 @@ async def submit_code(
     if not language:
         raise HTTPException(status_code=400, detail="Language is required")
     
-    # Get test cases for the problem
-    test_cases = db.query(TestCase).filter(TestCase.problem_id == problem_id).all()
-    if not test_cases:
+    # Make sure the problem can be judged
+    has_tests = await db.scalar(select(TestCase.id).where(TestCase.problem_id == problem_id).limit(1))
+    if not has_tests:
         raise HTTPException(status_code=404, detail="No test cases found for this problem")
     
-    # Prepare input and expected output
-    input_data = ""
-    expected_output = ""
-    for i, test_case in enumerate(test_cases):
-        input_data += f"{test_case.input_data}\n"
-        expected_output += f"{test_case.expected_output}\n"
-    
-    try:
-        # Execute code with test cases
-        result = execute_code(
-            language=language, 
-            source_code=code,
-            input_data=input_data,
-            expected_output=expected_output
-        )
+    key = result_key(problem, language, code)
+    judged = await db.run_sync(find_judged_submission, key)
+    CACHE_LOOKUPS.inc(cache="result", result="hit" if judged else "miss")
+    if judged:
+        submission = await db.run_sync(reuse_judged_submission, judged, code, user_id=current_user.id)
+    else:
+        await ensure_queue_capacity(db)
+        submission = await db.run_sync(enqueue_submission, problem_id, language, code, user_id=current_user.id,
+                                       result_key=key)
+    return {"submission_id": submission.id, "status": submission.status, "cached": judged is not None}
+
+# Streaming judge progress (Server-Sent Events)
+def format_sse(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    message = f"event: {event}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+async def judge_event_stream(request: Request, submission_id: int, last_test_number: int):
+    """
+    Push per-test results as the judge worker records them, then the verdict.
+    Test events carry the test number as their id so a reconnecting client
+    (Last-Event-ID) resumes after the last test it saw.
+    """
+    yield "retry: 1000\n\n"
+    last_status = None
+    while True:
+        if await request.is_disconnected():
+            return
         
-        # Create submission record
-        submission = Submission(
-            user_id=current_user.id,
-            problem_id=problem_id,
-            language=language,
-            code=code,
-            status="Accepted" if result.get("all_passed", False) else "Failed",
-            execution_time=result.get("execution_time"),
-            memory_used=result.get("memory_used")
-        )
-        db.add(submission)
-        db.flush()
+        async with AsyncSessionLocal() as db:
+            # Read the submission before its results: if it is finished here,
+            # every result row was committed before we query them
+            submission = await db.get(Submission, submission_id)
+            if not submission:
+                return
+            current_status = submission.status
+            final_result = submission.result
+            rows = (await db.scalars(select(TestResult).where(
+                TestResult.submission_id == submission_id,
+                TestResult.test_number > last_test_number
+            ).order_by(TestResult.test_number))).all()
+            events = [{
+                "test_case": row.test_number,
+                "status": row.status,
+                "passed": row.status == "Passed",
+                "execution_time": row.execution_time,
+                "memory_used": row.memory_used,
+                "actual_output": row.output,
+            } for row in rows]
+        
+        if current_status != last_status:
+            yield format_sse("status", {"status": current_status})
+            last_status = current_status
+        for event in events:
+            yield format_sse("test", event, event_id=event["test_case"])
+            last_test_number = event["test_case"]
         
-        # Create test result records
-        for i, test_result in enumerate(result.get("test_results", [])):
-            test_case = test_cases[i] if i < len(test_cases) else None
-            if test_case:
-                db_test_result = TestResult(
-                    submission_id=submission.id,
-                    test_case_id=test_case.id,
-                    status="Passed" if test_result.get("passed") else "Failed",
-                    execution_time=test_result.get("execution_time"),
-                    memory_used=test_result.get("memory_used"),
-                    output=test_result.get("output")
-                )
-                db.add(db_test_result)
+        if current_status not in (SUBMISSION_QUEUED, SUBMISSION_RUNNING):
+            yield format_sse("verdict", {
+                "submission_id": submission_id,
+                "status": current_status,
+                "result": json.loads(final_result) if final_result else None
+            })
+            return
         
-        db.commit()
-        return {"result": result, "submission_id": submission.id}
+        await asyncio.sleep(settings.JUDGE_STREAM_INTERVAL)
+
+@router.get("/judge/{submission_id}/events")
+async def stream_judge_events(
+    submission_id: int,
+    request: Request,
+    token: Optional[str] = None,
+    last_event_id: int = 0,
+    db: AsyncSession = Depends(get_db)
+):
+    submission = await db.get(Submission, submission_id)
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
     
-    except Exception as e:
-        db.rollback()
-        return {"error": str(e)}
+    # EventSource can't send an Authorization header, so real submissions
+    # take the bearer token as a query parameter; sample runs are public
+    if not submission.is_run:
+        if not token:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+        current_user = await get_current_user(token=token, db=db)
+        if submission.user_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to view this submission")
+    
+    # Browsers send Last-Event-ID when they reconnect
+    header = request.headers.get("last-event-id", "")
+    resume_from = int(header) if header.isdigit() else last_event_id
+    
+    return StreamingResponse(
+        judge_event_stream(request, submission_id, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # Submission endpoints
 @router.get("/submissions/", response_model=dict)
 async def get_user_submissions(
     current_user: User = Depends(get_current_user),
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    order: Literal["desc", "asc"] = "desc",
+    problem_id: Optional[int] = None,
+    verdict: Optional[str] = Query(None, alias="status"),
+    language: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_db)
 ):
-    submissions = db.query(Submission).filter(
-        Submission.user_id == current_user.id
-    ).order_by(Submission.submitted_at.desc()).offset(skip).limit(limit).all()
+    """
+    A page of the user's submissions by submission time, newest first unless
+    order is asc, optionally of one problem, status and language and
+    submitted in [since, until). Pass next_cursor back, with the same
+    filters, for the next page; it is null on the last one. Counting them
+    all (include_total) scans every match, so it is off by default.
+    """
+    query = select(Submission).where(
+        Submission.user_id == current_user.id,
+        Submission.is_run == False
+    )
+    # The user's (problem, submitted_at, id) and (submitted_at, id) indexes
+    # serve these; status and language are checked on the rows they yield
+    if problem_id is not None:
+        query = query.where(Submission.problem_id == problem_id)
+    if verdict:
+        query = query.where(Submission.status == verdict)
+    if language:
+        query = query.where(Submission.language == language)
+    if since:
+        query = query.where(Submission.submitted_at >= utc_naive(since))
+    if until:
+        query = query.where(Submission.submitted_at < utc_naive(until))
+    total = await db.scalar(select(func.count()).select_from(query.subquery())) if include_total else None
+    
+    descending = order == "desc"
+    columns = (Submission.submitted_at, Submission.id)
+    if cursor:
+        query = query.where(after_cursor(columns, decode_cursor(cursor, [datetime.fromisoformat, int]), descending))
+    # Listing never needs the code or the full result
+    query = query.options(load_only(*[getattr(Submission, name) for name in SubmissionSummary.model_fields]))
+    submissions = (await db.scalars(query.order_by(*ordered(columns, descending)).limit(limit + 1))).all()
     
-    return {"submissions": submissions}
+    next_cursor = None
+    if len(submissions) > limit:
+        submissions = submissions[:limit]
+        next_cursor = encode_cursor(submissions[-1].submitted_at, submissions[-1].id)
+    return {
+        "submissions": [SubmissionSummary.from_orm(submission).dict() for submission in submissions],
+        "next_cursor": next_cursor,
+        "total": total
+    }
 
 @router.get("/submissions/{submission_id}", response_model=dict)
 async def get_submission_details(
     submission_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    submission = db.query(Submission).filter(
-        Submission.id == submission_id
-    ).first()
+    submission = await db.get(Submission, submission_id)
     
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
@@ -285,11 +625,20 @@ async def get_submission_details(
         raise HTTPException(status_code=403, detail="Not authorized to view this submission")
     
     # Get test results
-    test_results = db.query(TestResult).filter(
+    test_results = (await db.scalars(select(TestResult).where(
         TestResult.submission_id == submission_id
-    ).all()
+    ))).all()
     
     return {
         "submission": submission,
+        "status": submission.status,
+        "score": submission.score,
+        "cached_from": submission.cached_from,
+        "result": json.loads(submission.result) if submission.result else None,
         "test_results": test_results
     }
+
+# Judge statistics
+@router.get("/judge/stats", response_model=dict)
+async def get_judge_stats(db: AsyncSession = Depends(get_db)):
+    return {"artifact_cache": artifact_cache.stats(), "queue": await db.run_sync(queue_stats)}
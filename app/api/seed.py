@@ -1,20 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-import json
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.database import get_db
-from app.models.models import Problem, TestCase
+from app.models.models import Problem, tag_links
+from app.services.problem_cache import problem_cache
+from app.services.test_data import new_test_case
 
 # Create router for seeding data
 router = APIRouter(prefix="/seed", tags=["seed"])
 
 @router.post("/two-sum", response_model=dict)
-async def seed_two_sum_problem(db: Session = Depends(get_db)):
+async def seed_two_sum_problem(db: AsyncSession = Depends(get_db)):
     """
     Seed the database with the Two Sum problem and its test cases
     """
     # Check if problem already exists
-    existing = db.query(Problem).filter(Problem.title == "Two Sum").first()
+    existing = await db.scalar(select(Problem).where(Problem.title == "Two Sum"))
     if existing:
         return {"message": "Two Sum problem already exists", "problem_id": existing.id}
     
@@ -46,6 +48,20 @@ async def seed_two_sum_problem(db: Session = Depends(get_db)):
     
     tags = ["Array", "Hash Table"]
     
+    # The indices may come in either order, so a checker judges the output
+    # (see app/services/checker.py)
+    checker_source = """import re, sys
+
+def indices(path):
+    with open(path) as f:
+        return sorted(int(n) for n in re.findall(r"-?\\d+", f.read()))
+
+output, answer = indices(sys.argv[2]), indices(sys.argv[3])
+if output != answer:
+    print(f"expected indices {answer}, got {output}")
+    sys.exit(1)
+"""
+    
     description = """Given an array of integers <code>nums</code> and an integer <code>target</code>, return <em>indices of the two numbers such that they add up to target</em>.
     
 <p>You may assume that each input would have <strong>exactly one solution</strong>, and you may not use the same element twice.</p>
@@ -57,19 +73,22 @@ async def seed_two_sum_problem(db: Session = Depends(get_db)):
         title="Two Sum",
         difficulty="Easy",
         description=description,
-        examples=json.dumps(examples),
-        constraints=json.dumps(constraints),
-        tags=json.dumps(tags),
+        examples=examples,
+        constraints=constraints,
+        tags=tags,
+        tag_links=tag_links(tags),
         acceptance=75.0,  # Just an example value
         likes=1234,
         dislikes=56,
-        time_limit=1.0,
-        memory_limit=128
+        time_limit_ms=1000,
+        memory_limit_mb=128,
+        checker_language="python",
+        checker_source=checker_source
     )
     
     db.add(new_problem)
-    db.commit()
-    db.refresh(new_problem)
+    await db.commit()
+    await db.refresh(new_problem)
     
     # Create sample test cases in the specified format
     sample_inputs = [
@@ -95,36 +114,23 @@ async def seed_two_sum_problem(db: Session = Depends(get_db)):
         "[0,4]"
     ]
     
-    # Format according to your specification
-    sample_test_case = TestCase(
-        problem_id=new_problem.id,
-        input_data=str(len(sample_inputs)) + "\n" + "\n".join(sample_inputs),
-        expected_output=str(len(sample_outputs)) + "\n" + "\n".join(sample_outputs),
-        test_case_delimiter="\n",
-        is_sample=True
-    )
-    
-    hidden_test_case = TestCase(
-        problem_id=new_problem.id,
-        input_data=str(len(hidden_inputs)) + "\n" + "\n".join(hidden_inputs),
-        expected_output=str(len(hidden_outputs)) + "\n" + "\n".join(hidden_outputs),
-        test_case_delimiter="\n",
-        is_sample=False
-    )
-    
-    db.add(sample_test_case)
-    db.add(hidden_test_case)
-    db.commit()
+    # One row per test, samples first
+    tests = [(i, o, True) for i, o in zip(sample_inputs, sample_outputs)]
+    tests += [(i, o, False) for i, o in zip(hidden_inputs, hidden_outputs)]
+    for ordinal, (input_data, expected_output, is_sample) in enumerate(tests, start=1):
+        db.add(new_test_case(new_problem.id, ordinal, input_data, expected_output, is_sample=is_sample))
+    await db.commit()
+    problem_cache.invalidate()
     
     return {"message": "Two Sum problem and test cases created successfully", "problem_id": new_problem.id}
 
 @router.post("/add-two-numbers", response_model=dict)
-async def seed_add_two_numbers_problem(db: Session = Depends(get_db)):
+async def seed_add_two_numbers_problem(db: AsyncSession = Depends(get_db)):
     """
     Seed the database with the Add Two Numbers problem and its test cases
     """
     # Check if problem already exists
-    existing = db.query(Problem).filter(Problem.title == "Add Two Numbers").first()
+    existing = await db.scalar(select(Problem).where(Problem.title == "Add Two Numbers"))
     if existing:
         return {"message": "Add Two Numbers problem already exists", "problem_id": existing.id}
     
@@ -164,19 +170,20 @@ async def seed_add_two_numbers_problem(db: Session = Depends(get_db)):
         title="Add Two Numbers",
         difficulty="Medium",
         description=description,
-        examples=json.dumps(examples),
-        constraints=json.dumps(constraints),
-        tags=json.dumps(tags),
+        examples=examples,
+        constraints=constraints,
+        tags=tags,
+        tag_links=tag_links(tags),
         acceptance=35.8,  # From the provided data
         likes=987,        # Example value
         dislikes=234,     # Example value
-        time_limit=1.0,
-        memory_limit=128
+        time_limit_ms=1000,
+        memory_limit_mb=128
     )
     
     db.add(new_problem)
-    db.commit()
-    db.refresh(new_problem)
+    await db.commit()
+    await db.refresh(new_problem)
     
     # Create sample test cases in the specified format
     sample_inputs = [
@@ -202,25 +209,12 @@ async def seed_add_two_numbers_problem(db: Session = Depends(get_db)):
         "[9,9,9,1]"
     ]
     
-    # Format according to your specification
-    sample_test_case = TestCase(
-        problem_id=new_problem.id,
-        input_data=str(len(sample_inputs)) + "\n" + "\n".join(sample_inputs),
-        expected_output=str(len(sample_outputs)) + "\n" + "\n".join(sample_outputs),
-        test_case_delimiter="\n",
-        is_sample=True
-    )
-    
-    hidden_test_case = TestCase(
-        problem_id=new_problem.id,
-        input_data=str(len(hidden_inputs)) + "\n" + "\n".join(hidden_inputs),
-        expected_output=str(len(hidden_outputs)) + "\n" + "\n".join(hidden_outputs),
-        test_case_delimiter="\n",
-        is_sample=False
-    )
-    
-    db.add(sample_test_case)
-    db.add(hidden_test_case)
-    db.commit()
+    # One row per test, samples first
+    tests = [(i, o, True) for i, o in zip(sample_inputs, sample_outputs)]
+    tests += [(i, o, False) for i, o in zip(hidden_inputs, hidden_outputs)]
+    for ordinal, (input_data, expected_output, is_sample) in enumerate(tests, start=1):
+        db.add(new_test_case(new_problem.id, ordinal, input_data, expected_output, is_sample=is_sample))
+    await db.commit()
+    problem_cache.invalidate()
     
     return {"message": "Add Two Numbers problem and test cases created successfully", "problem_id": new_problem.id}
@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from fastapi import Depends
@@ -10,21 +12,61 @@ from app.core.config import settings
 # Database connection URL from settings
 DATABASE_URL = settings.DATABASE_URL
 
-# Create SQLAlchemy engine - different configuration based on database type
-# PostgreSQL or other database configuration
-engine = create_engine(DATABASE_URL)
+# Async drivers for the URL schemes we support; the routers use these
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its driver swapped for the async one of its database"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend in ASYNC_DRIVERS:
+        url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    return url.render_as_string(hide_password=False)
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """Pool sizing, pre-ping and statement timeout from settings, for either engine"""
+    url = make_url(url)
+    options = {"pool_pre_ping": True}
+    if url.get_backend_name() == "sqlite":
+        # SQLite has no server: no statement timeout, and the pool class
+        # depends on whether the database is in memory
+        return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    if url.get_backend_name() == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        # A runaway query is cancelled by the server instead of pinning a connection
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+# Create SQLAlchemy engine. The synchronous engine serves judge workers and
+# scripts, which run their queries off the event loop.
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The async engine serves the API routers, so a slow query only holds up the
+# request that made it
+async_engine = create_async_engine(async_database_url(DATABASE_URL),
+                                   **engine_options(DATABASE_URL, is_async=True))
+
+# Objects stay usable after commit, since async sessions can't lazy-load them
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Base class for all database models
 Base = declarative_base()
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
+# Dependency to get DB session. Routers hand shared synchronous helpers the
+# underlying session with `await db.run_sync(helper, ...)`.
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
  # Ensure tables are created when the module is imported
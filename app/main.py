@@ -1,13 +1,17 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, Depends
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-import docker
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.auth import router as auth_router
 from app.api.problems import router as problems_router
 from app.api.seed import router as seed_router
+from app.db.database import async_engine, get_db
+from app.services.judge_metrics import CONTENT_TYPE, export_metrics, observe_queue
+from app.services.judge_queue import queue_stats
+from app.services.judge_worker import JudgeWorkerPool
 
 def create_app() -> FastAPI:
     """
@@ -19,9 +23,19 @@ def create_app() -> FastAPI:
         version="1.0.0",
     )
     
-    # Setup Docker client
-    client = docker.from_env()
-    app.state.docker_client = client
+    # Judge workers pull from the submission queue; they own the sandbox
+    # backend connections, opened on startup and closed on shutdown. Only one
+    # app process per host starts them (see JUDGE_LOCK_FILE)
+    app.state.judge_workers = JudgeWorkerPool()
+    
+    @app.on_event("startup")
+    async def start_judge_workers():
+        await app.state.judge_workers.start()
+    
+    @app.on_event("shutdown")
+    async def stop_judge_workers():
+        await app.state.judge_workers.stop()
+        await async_engine.dispose()
     
     # Add CORS middleware
     app.add_middleware(
@@ -43,6 +57,13 @@ def create_app() -> FastAPI:
     app.include_router(problems_router)
     app.include_router(seed_router)
     
+    # Prometheus scrape endpoint: judge metrics of this process and the
+    # judge worker processes, plus the queue as the database sees it
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def judge_metrics(db: AsyncSession = Depends(get_db)):
+        observe_queue(await db.run_sync(queue_stats))
+        return PlainTextResponse(export_metrics(), media_type=CONTENT_TYPE)
+    
     # Root endpoints
     @app.get("/", response_class=HTMLResponse)
     async def root(request: Request):
@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, DateTime, Float
+from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, DateTime, Float, Index, JSON, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
 
+# JSON documents: JSONB on PostgreSQL, JSON (text) elsewhere
+JSONDocument = JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql")
+
 # User model
 class User(Base):
     __tablename__ = "users"
@@ -29,50 +33,140 @@ class User(Base):
 # Problem model
 class Problem(Base):
     __tablename__ = "problems"
+    __table_args__ = (
+        # /problems filters by difficulty, whatever its case
+        Index("ix_problems_difficulty_lower", text("lower(difficulty)")),
+        # and pages through problems in these orders, see PROBLEM_SORTS
+        Index("ix_problems_title_id", "title", "id"),
+        Index("ix_problems_acceptance_id", "acceptance", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=False)
     difficulty = Column(String, nullable=False)  # Easy, Medium, Hard
-    examples = Column(Text, nullable=True)  # JSON string of examples
-    constraints = Column(Text, nullable=True)  #string of constraints
-    tags = Column(Text, nullable=True)  # list of string of tags
+    examples = Column(JSONDocument, nullable=True)  # list of {input, output, explanation}
+    constraints = Column(JSONDocument, nullable=True)  # list of strings
+    tags = Column(JSONDocument, nullable=True)  # list of strings, as shown; problem_tags indexes them
     acceptance = Column(Float, default=0.0)  # Acceptance rate as a percentage
     likes = Column(Integer, default=0)
     dislikes = Column(Integer, default=0)
     time = Column(String, default="O(nlogn)")  # big o notation for time limit
+    time_limit_ms = Column(Integer, nullable=False, default=2000)  # CPU time per test
+    memory_limit_mb = Column(Integer, nullable=False, default=128)  # peak memory per test
+    comparison_mode = Column(String, nullable=False, default="exact")  # exact, token, float or unordered
+    float_abs_eps = Column(Float, nullable=False, default=1e-6)  # float mode tolerances
+    float_rel_eps = Column(Float, nullable=False, default=1e-6)
+    checker_language = Column(String, nullable=True)  # c++ or python, if a checker program judges outputs
+    checker_source = Column(Text, nullable=True)
+    test_version = Column(Integer, nullable=False, default=1)  # bumped whenever the test cases change
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     test_cases = relationship("TestCase", back_populates="problem")
+    subtasks = relationship("Subtask", back_populates="problem")
     submissions = relationship("Submission", back_populates="problem")
+    tag_links = relationship("ProblemTag", back_populates="problem", cascade="all, delete-orphan")
+
+def tag_key(tag: str) -> str:
+    """A tag as problems are filtered by it, e.g. Hash Table -> hash-table"""
+    return "-".join(tag.lower().split())
+
+def tag_links(tags) -> list:
+    """problem_tags rows for a new problem's tags"""
+    keys = dict.fromkeys(tag_key(tag) for tag in tags or [])
+    return [ProblemTag(tag=key) for key in keys if key]
+
+# Problem tags, normalized, for filtering problems by tag
+class ProblemTag(Base):
+    __tablename__ = "problem_tags"
+    __table_args__ = (
+        # Problems with a tag; the primary key covers a problem's tags
+        Index("ix_problem_tags_tag_problem", "tag", "problem_id"),
+    )
+    
+    problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String, primary_key=True)  # see tag_key
+    
+    # Relationship
+    problem = relationship("Problem", back_populates="tag_links")
     
 # TestCase model
 class TestCase(Base):
     __tablename__ = "test_cases"
+    __table_args__ = (
+        # The judge loads a problem's tests in order
+        Index("ix_test_cases_problem_ordinal", "problem_id", "ordinal"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     problem_id = Column(Integer, ForeignKey("problems.id"))
-    input_data = Column(Text)  # Format: "number_of_test_cases\ntest1\ntest2\ntest3"
-    expected_output = Column(Text)  # Format: "number_of_outputs\noutput1\noutput2\noutput3"
+    ordinal = Column(Integer, nullable=False, default=0)  # position in the judging order
+    weight = Column(Float, nullable=False, default=1.0)
+    # One test each. Data larger than TEST_DATA_INLINE_LIMIT lives in the test
+    # data store (app/services/test_data.py) and only its hash is kept here.
+    input_data = Column(Text, nullable=True)
+    expected_output = Column(Text, nullable=True)
+    input_blob = Column(String(64), nullable=True)
+    output_blob = Column(String(64), nullable=True)
     is_sample = Column(Boolean, default=False)  # Sample test cases are visible to users
+    subtask = Column(Integer, nullable=True)  # number of the subtask it belongs to, if any
     
     # Relationship
     problem = relationship("Problem", back_populates="test_cases")
 
+# Subtask model - a group of test cases scored together (IOI style)
+class Subtask(Base):
+    __tablename__ = "subtasks"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    problem_id = Column(Integer, ForeignKey("problems.id"), index=True)
+    number = Column(Integer, nullable=False)  # test cases refer to it by this
+    points = Column(Float, nullable=False)  # earned times the lowest score among its tests
+    name = Column(String, nullable=True)
+    
+    # Relationship
+    problem = relationship("Problem", back_populates="subtasks")
+
+# Submission statuses used by the judge queue
+SUBMISSION_QUEUED = "Queued"
+SUBMISSION_RUNNING = "Running"
+
+# Judge queue priorities, lower is judged first
+PRIORITY_RUN = 0  # sample runs, someone is watching the editor
+PRIORITY_CONTEST = 1
+PRIORITY_PRACTICE = 2
+PRIORITY_NAMES = {PRIORITY_RUN: "run", PRIORITY_CONTEST: "contest", PRIORITY_PRACTICE: "practice"}
+
 # Submission model
 class Submission(Base):
     __tablename__ = "submissions"
+    __table_args__ = (
+        # Workers pick the highest priority, oldest queued job
+        Index("ix_submissions_queue", "status", "priority", "submitted_at"),
+        # Users page through their submissions by time, all or per problem
+        Index("ix_submissions_user_submitted", "user_id", "submitted_at", "id"),
+        Index("ix_submissions_user_problem_submitted", "user_id", "problem_id", "submitted_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"))  # None for anonymous sample runs
     problem_id = Column(Integer, ForeignKey("problems.id"))
     language = Column(String, nullable=False)
     code = Column(Text, nullable=False)
-    status = Column(String, nullable=False)  # Accepted, Wrong Answer, Runtime Error, etc.
+    status = Column(String, nullable=False)  # Queued, Running, then Accepted, Wrong Answer, Runtime Error, etc.
+    is_run = Column(Boolean, default=False)  # "Run" against sample tests, not a real submission
+    priority = Column(Integer, nullable=False, default=PRIORITY_PRACTICE)  # see PRIORITY_*
     execution_time = Column(Float)  # seconds
     memory_used = Column(Integer)  # MB
+    score = Column(Float, nullable=True)  # points earned, out of 100 or the subtasks' total
+    result = Column(Text, nullable=True)  # JSON of the full judge result
+    # Hash of what the result depends on, see judge_queue.result_key
+    result_key = Column(String(64), nullable=True, index=True)
+    cached_from = Column(Integer, ForeignKey("submissions.id"), nullable=True)  # judged submission reused
     submitted_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)  # picked up by a judge worker
+    finished_at = Column(DateTime, nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="submissions")
@@ -84,8 +178,9 @@ class TestResult(Base):
     __tablename__ = "test_results"
     
     id = Column(Integer, primary_key=True, index=True)
-    submission_id = Column(Integer, ForeignKey("submissions.id"))
+    submission_id = Column(Integer, ForeignKey("submissions.id"), index=True)
     test_case_id = Column(Integer, ForeignKey("test_cases.id"))
+    test_number = Column(Integer, nullable=True)  # 1-based position in the judged run, used to resume streams
     status = Column(String, nullable=False)  # Passed, Failed
     execution_time = Column(Float)  # seconds
     memory_used = Column(Integer)  # MB
@@ -1,13 +1,15 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
-import json
 
 # Problem Schemas
 class TestCaseBase(BaseModel):
-    input_data: str
-    expected_output: str
+    input_data: Optional[str] = None  # None when stored in the test data store
+    expected_output: Optional[str] = None
     is_sample: bool = False
+    ordinal: int = 0
+    weight: float = 1.0
+    subtask: Optional[int] = None
 
 class TestCase(TestCaseBase):
     id: int
@@ -40,37 +42,21 @@ class ProblemBase(BaseModel):
     likes: int = 0
     dislikes: int = 0
     time: str = "O(nlogn)"
-
+    time_limit_ms: int = 2000  # per test, before language multipliers
+    memory_limit_mb: int = 128
+    # How outputs are judged, see app/services/comparator.py
+    comparison_mode: Literal["exact", "token", "float", "unordered"] = "exact"
+    float_abs_eps: float = 1e-6
+    float_rel_eps: float = 1e-6
+
+# Public problem detail. Test cases are not part of it: hidden ones must never
+# reach clients, and samples are sent separately as TestCaseSample-like dicts.
 class Problem(ProblemBase):
     id: int
     created_at: datetime
-    test_cases: List[TestCase] = []
 
     class Config:
         from_attributes = True
-        
-    @classmethod
-    def from_orm(cls, obj):
-        # Convert string-stored fields to Python objects
-        if obj.examples and isinstance(obj.examples, str):
-            try:
-                obj.examples = json.loads(obj.examples)
-            except:
-                obj.examples = []
-                
-        if obj.constraints and isinstance(obj.constraints, str):
-            try:
-                obj.constraints = json.loads(obj.constraints)
-            except:
-                obj.constraints = []
-                
-        if obj.tags and isinstance(obj.tags, str):
-            try:
-                obj.tags = json.loads(obj.tags)
-            except:
-                obj.tags = []
-                
-        return super().from_orm(obj)
 
 class ProblemList(BaseModel):
     id: int
@@ -84,20 +70,21 @@ class ProblemList(BaseModel):
 
     class Config:
         from_attributes = True
-        
-    @classmethod
-    def from_orm(cls, obj):
-        # Convert tags from JSON string to list
-        if obj.tags and isinstance(obj.tags, str):
-            try:
-                obj.tags = json.loads(obj.tags)
-            except:
-                obj.tags = []
-                
-        return super().from_orm(obj)
 
 class ProblemCreate(ProblemBase):
-    pass
+    # Optional checker program that judges outputs, see app/services/checker.py.
+    # Not part of ProblemBase so it is never sent to clients.
+    checker_language: Optional[Literal["c++", "python"]] = None
+    checker_source: Optional[str] = None
+
+class CheckerUpdate(BaseModel):
+    language: Literal["c++", "python"]
+    source: str
+
+class SubtaskBase(BaseModel):
+    number: int  # test cases with this subtask belong to it
+    points: float
+    name: Optional[str] = None
 
 # Submission Schemas
 class SubmissionBase(BaseModel):
@@ -131,8 +118,26 @@ class Submission(SubmissionBase):
     status: str
     execution_time: Optional[float] = None
     memory_used: Optional[int] = None
+    score: Optional[float] = None
+    cached_from: Optional[int] = None  # judged submission whose result was reused
     submitted_at: datetime
     test_results: List[TestResult] = []
     
     class Config:
         from_attributes = True
+
+# One row of a submission list, without the code or results
+class SubmissionSummary(BaseModel):
+    id: int
+    problem_id: int
+    language: str
+    status: str
+    score: Optional[float] = None
+    execution_time: Optional[float] = None
+    memory_used: Optional[int] = None
+    cached_from: Optional[int] = None
+    submitted_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
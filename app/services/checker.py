@@ -0,0 +1,129 @@
+import shlex
+import asyncio
+import logging
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.services.artifact_cache import artifact_cache
+from app.services.judge_backend import SANDBOX_DIR
+from app.services.sandbox_runner import RUNNER_PATH, RunnerSession, file_archive
+
+logger = logging.getLogger('codejudge')
+
+# Checker ("special judge") programs decide a test's verdict themselves, for
+# problems with more than one right answer. A checker is run as
+#   checker <input> <output> <answer>
+# (testlib's order: the test input, the program's output, the expected
+# answer) and reports through its exit code:
+#   0  accepted
+#   1  wrong answer (2, testlib's presentation error, is a wrong answer too)
+#   7  partially correct; the first thing it prints is the score, 0 to 1
+# Anything else, or hitting a limit, is a checker failure. What it prints,
+# up to JUDGE_OUTPUT_PREVIEW bytes, becomes the test's details.
+#
+# A checker runs in a sandbox of its own, never the submission's, so nothing
+# the submission leaves behind can tamper with it. It is compiled once per
+# source and image into the artifact cache, by the first judge run that
+# needs it (the API never compiles anything), and one runner session checks
+# every test of a submission, whichever lane ran it. Each test's files are
+# streamed over the session as the checker's stdin, where CHECK_SCRIPT
+# splits them back out just before starting the checker.
+CHECKER_CONFIGS = {
+    "c++": {"source": "checker.cpp", "image": "gcc:latest",
+            "compile": f"g++ -O2 -o {SANDBOX_DIR}/checker/checker {SANDBOX_DIR}/checker.cpp",
+            "run": f"{SANDBOX_DIR}/checker/checker"},
+    "python": {"source": "checker.py", "image": "python:3.8",
+               "compile": f"python -c \"import py_compile; py_compile.compile('{SANDBOX_DIR}/checker.py', "
+                          f"cfile='{SANDBOX_DIR}/checker/checker.pyc', doraise=True)\"",
+               "run": f"python {SANDBOX_DIR}/checker/checker.pyc"},
+}
+
+# Build output, and where each test's files are put for the checker
+CHECKER_DIR = f"{SANDBOX_DIR}/checker"
+CHECK_DIR = f"{SANDBOX_DIR}/check"
+CHECK_FILES = [f"{CHECK_DIR}/{name}" for name in ("input", "output", "answer")]
+
+# Stdin is "<input bytes> <output bytes>\n", the input, the output, then the
+# answer up to EOF. read takes the header a byte at a time and GNU head -c
+# reads no further than its count, so each file gets exactly its bytes.
+# The checker's stdout goes to stderr, which the runner cuts at its limit
+# rather than killing the checker as it does for stdout: a checker that
+# prints a lot still gets its verdict, with the message truncated.
+CHECK_SCRIPT = (f'read input_bytes output_bytes && mkdir -p {CHECK_DIR} && '
+                f'head -c "$input_bytes" > {CHECK_FILES[0]} && head -c "$output_bytes" > {CHECK_FILES[1]} && '
+                f'cat > {CHECK_FILES[2]} && exec "$@" {" ".join(CHECK_FILES)} >&2')
+
+class CheckerError(Exception):
+    """A checker failed to compile or to run"""
+
+def checker_for(problem) -> Optional[dict]:
+    """A problem's checker as {"language", "source"}, None if outputs are compared"""
+    if problem is None or not problem.checker_source:
+        return None
+    return {"language": problem.checker_language, "source": problem.checker_source}
+
+def checker_cache_key(language: str, image_digest: str, source: str) -> str:
+    return artifact_cache.key(f"checker:{language}", image_digest, source)
+
+async def compile_checker(backend, sandbox: str, language: str, source: str) -> bytes:
+    """Compile a checker in sandbox (left there, ready to run), returns the archive of its build"""
+    config = CHECKER_CONFIGS[language]
+    await backend.put_archive(sandbox, SANDBOX_DIR, file_archive({config['source']: source.encode('utf-8')}, owner=1000))
+    exit_code, output = await backend.exec(sandbox, [
+        "sh", "-c", f"mkdir -p {CHECKER_DIR} && timeout -s KILL {settings.JUDGE_COMPILE_TIMEOUT} {config['compile']}"
+    ])
+    if exit_code != 0:
+        raise CheckerError(f"Checker failed to compile:\n{output.decode('utf-8', errors='replace')}")
+    return await backend.get_archive(sandbox, CHECKER_DIR)
+
+def checker_command(language: str) -> list:
+    """Runner command checking one test: the checker under JUDGE_CHECKER_* limits"""
+    cpu_ms = settings.JUDGE_CHECKER_TIME_LIMIT_MS
+    return ([RUNNER_PATH, str(2 * cpu_ms + 1000), str(cpu_ms), str(settings.JUDGE_CHECKER_MEMORY_LIMIT_MB * 1024),
+             str(settings.JUDGE_OUTPUT_PREVIEW), "--", "sh", "-c", CHECK_SCRIPT, "checker"]
+            + shlex.split(CHECKER_CONFIGS[language]['run']))
+
+def _buffer(data):
+    """Test data (text, bytes or a mapped file) as a buffer to stream, without copying it"""
+    if data is None:
+        return b""
+    return data.encode('utf-8') if isinstance(data, str) else data
+
+class CheckerSession:
+    """
+    The checks of one submission, on a runner session in the checker's
+    sandbox. Lanes share it, taking turns.
+    """
+
+    def __init__(self, runner: RunnerSession):
+        self.runner = runner
+        self.lock = asyncio.Lock()
+
+    async def check(self, index: int, test_input, output: bytes, answer) -> Tuple[str, float, str]:
+        """Check one test's output, returns (verdict, score, details)"""
+        test_input, answer = _buffer(test_input), _buffer(answer)
+        header = f"{len(memoryview(test_input))} {len(memoryview(output))}\n".encode('ascii')
+        # A lane interrupted mid-check must not leave the shared session
+        # mid-test, so the check runs to the end whatever happens to its caller
+        run = await asyncio.shield(self._run(index, [header, test_input, output, answer]))
+        message = (run["output"] + run["error"]).strip()
+        if run["verdict"] == "OK":
+            return "Accepted", 1.0, message or "Checker accepted the output"
+        if run["verdict"] == "RE" and run["exit_code"] in (1, 2):
+            return "Wrong Answer", 0.0, message or "Checker rejected the output"
+        if run["verdict"] == "RE" and run["exit_code"] == 7:
+            try:
+                score = min(max(float(message.split()[0]), 0.0), 1.0)
+            except (IndexError, ValueError):
+                raise CheckerError(f"Checker gave partial credit without a score: {message[:200]}")
+            return "Partially Correct", score, message
+        raise CheckerError(f"Checker failed ({run['verdict']}, exit code {run['exit_code']}): {message[:200]}")
+
+    async def _run(self, index: int, parts: list) -> dict:
+        async with self.lock:
+            return await self.runner.run(index, parts)
+
+    async def close(self):
+        """Tell the runner there are no more checks, once the last one is done"""
+        async with self.lock:
+            await self.runner.close()
@@ -1,393 +1,758 @@
-#!/usr/bin/env python3
-# filepath: /home/utkarsh/Desktop/codejudge/test_standalone.py
 import uuid
 import os
-import docker
-import shutil
+import io
 import json
 import re
+import asyncio
+import inspect
+import shlex
+import functools
 import logging
-from datetime import datetime
-
-# Set up logging
-log_file = f"submissions/codejudge_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-os.makedirs("submissions", exist_ok=True)
-
-# Configure the logger with WARNING level instead of INFO to reduce output
-logging.basicConfig(
-    level=logging.WARNING,  # Changed from INFO to WARNING
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
+import tarfile
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from app.services.container_pool import ContainerPoolManager, PooledContainer, SANDBOX_DIR
+from app.services.judge_backend import JudgeBackend, JudgeBackendError, create_backend
+from app.services.artifact_cache import artifact_cache
+from app.services.judge_metrics import CACHE_LOOKUPS, POOL_CONTAINERS, metrics
+from app.services.judge_scheduler import test_lanes
+from app.services.comparator import chunked, compare_streams, create_comparator
+from app.services.checker import (
+    CHECKER_CONFIGS, CheckerSession, checker_cache_key, checker_command, compile_checker,
 )
-logger = logging.getLogger('codejudge')
-
-# If you want to completely disable logging, uncomment this line:
-# logger.disabled = True
+from app.services.sandbox_runner import (
+    RUNNER_PATH, RUNNER_SOURCE, RUNNER_BUILD_IMAGE, RunnerSession, build_runner, install_runner,
+)
+from app.core.config import settings
 
-# Initialize Docker client
-client = docker.from_env()
+# Handlers and levels are up to the entry point (the app, a judge worker or a script)
+logger = logging.getLogger('codejudge')
 
-def parse_test_cases(input_data, expected_output=None, test_case_delimiter='\n'):
+def build_archive(files, extra_tar=None):
     """
-    Parse test cases from input_data and expected_output.
-    Each line in input_data represents a separate test case.
-    Each line in expected_output represents the expected result for that test case.
+    Pack {relative_path: content} into an in-memory tar for put_archive.
+    Everything is owned by the sandbox user so the program can write next to it.
+    Members of extra_tar (e.g. a cached build directory) are appended as-is.
     """
-    if not input_data:
-        return [{'input': '', 'expected_output': expected_output}]
-    
-    # Split input by test case delimiter
-    input_parts = input_data.strip().split(test_case_delimiter)
-    # Remove empty parts and strip whitespace
-    input_parts = [part.strip() for part in input_parts if part.strip()]
-    
-    # If no test case delimiters found, treat the whole input as one test case
-    if len(input_parts) == 1:
-        return [{'input': input_data.strip(), 'expected_output': expected_output}]
-    
-    # If expected output is provided, split it into parts as well
-    expected_parts = []
-    if expected_output:
-        expected_parts = expected_output.strip().split(test_case_delimiter)
-        expected_parts = [part.strip() for part in expected_parts if part.strip()]
-    
-    # Create test cases - each line is a separate test case
-    test_cases = []
-    for i, input_part in enumerate(input_parts):
-        test_case = {
-            'input': input_part,
-            'expected_output': expected_parts[i] if i < len(expected_parts) else None
-        }
-        test_cases.append(test_case)
-    
-    return test_cases
-
-def compare_output(actual, expected):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        if extra_tar:
+            with tarfile.open(fileobj=io.BytesIO(extra_tar), mode="r") as extra:
+                for member in extra.getmembers():
+                    tar.addfile(member, extra.extractfile(member) if member.isfile() else None)
+        # Directories first, otherwise Docker creates them owned by root
+        dirs = sorted({os.path.dirname(path) for path in files if os.path.dirname(path)})
+        for directory in dirs:
+            info = tarfile.TarInfo(name=directory)
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            info.uid = info.gid = 1000
+            info.mtime = int(time.time())
+            tar.addfile(info)
+        for path, content in files.items():
+            if isinstance(content, str):
+                content = content.encode('utf-8')
+            info = tarfile.TarInfo(name=path)
+            info.size = len(content)
+            info.mode = 0o755 if path.endswith(".sh") else 0o644
+            info.uid = info.gid = 1000
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+def preview(data):
+    """Test data as text for results, cut at JUDGE_OUTPUT_PREVIEW bytes"""
+    if data is None or isinstance(data, str) and len(data) <= settings.JUDGE_OUTPUT_PREVIEW:
+        return data
+    limit = settings.JUDGE_OUTPUT_PREVIEW
+    if isinstance(data, str):
+        data = data[:limit + 1].encode('utf-8')
+    text = bytes(data[:limit]).decode('utf-8', errors='ignore')
+    return text + "..." if len(data) > limit else text
+
+def score_tests(test_cases: List[dict], test_results: List[dict], subtasks: Optional[Dict[int, float]] = None):
+    """
+    (score, max score, score per subtask) of a judged run. Each test scores
+    1 when passed, a checker's partial score, or 0, and tests never judged
+    count as failed. With subtasks (number -> points) each earns its points
+    times the lowest score among its tests; without, the score is the
+    weighted share of the tests out of 100.
+    """
+    scores = {result["test_case"] - 1: result["score"] for result in test_results}
+    if subtasks:
+        subtask_scores = {}
+        for number, points in subtasks.items():
+            group = [scores.get(i, 0.0) for i, test_case in enumerate(test_cases) if test_case.get('group') == number]
+            subtask_scores[number] = points * min(group, default=0.0)
+        return sum(subtask_scores.values()), sum(subtasks.values()), subtask_scores
+    total_weight = sum(test_case.get('weight', 1.0) for test_case in test_cases)
+    earned = sum(test_case.get('weight', 1.0) * scores.get(i, 0.0) for i, test_case in enumerate(test_cases))
+    return (100.0 * earned / total_weight if total_weight else 0.0), 100.0, None
+
+def compare_output(actual, expected, comparison=None):
+    """Compare a whole output against the expected one, returns (passed, details)"""
     if not expected:
         return True, "No expected output provided for comparison"
+    return compare_streams(chunked(actual), chunked(expected), comparison)
+
+# Language configurations. Compiled languages build once into /sandbox/build
+# and every test case runs the produced binary or class files. Run commands
+# get {memory_mb} so managed runtimes size their heap to the memory limit.
+LANGUAGE_CONFIGS = {
+    # Python is byte-compiled up front so syntax errors surface as compile
+    # errors and the .pyc can be cached like any other build artifact
+    "python": {"source": "{code_id}.py", "image": "python:3.8",
+               "compile": "python -c \"import py_compile; py_compile.compile('/sandbox/{code_id}.py', "
+                          "cfile='/sandbox/build/main.pyc', doraise=True)\"",
+               "run": "python /sandbox/build/main.pyc"},
+    "javascript": {"source": "{code_id}.js", "image": "node:14", "compile": None,
+                   "run": "node --max-old-space-size={memory_mb} /sandbox/{code_id}.js"},
+    # javac insists that public class Main lives in Main.java
+    "java": {"source": "Main.java", "image": "openjdk:11",
+             "compile": "javac -d /sandbox/build /sandbox/Main.java",
+             "run": "java -XX:+UseSerialGC -Xmx{memory_mb}m -Xss64m -cp /sandbox/build Main"},
+    "c": {"source": "{code_id}.c", "image": "gcc:latest",
+          "compile": "gcc /sandbox/{code_id}.c -o /sandbox/build/main",
+          "run": "/sandbox/build/main"},
+    "c++": {"source": "{code_id}.cpp", "image": "gcc:latest",
+            "compile": "g++ /sandbox/{code_id}.cpp -o /sandbox/build/main",
+            "run": "/sandbox/build/main"},
+}
+
+def language_limits(language, time_limit_ms=None, memory_limit_mb=None):
+    """
+    Scale a problem's per-test limits by the language multipliers.
+    Returns (CPU time limit in ms, memory limit in MB).
+    """
+    multipliers = settings.JUDGE_LANGUAGE_MULTIPLIERS.get(language, {})
+    time_limit_ms = time_limit_ms or settings.JUDGE_TIME_LIMIT_MS
+    memory_limit_mb = memory_limit_mb or settings.JUDGE_MEMORY_LIMIT_MB
+    return (int(time_limit_ms * multipliers.get("time", 1.0)),
+            int(memory_limit_mb * multipliers.get("memory", 1.0)))
+
+async def compile_code(backend, sandbox, config, code_id):
+    """
+    Run the compile step once for a submission.
+    Returns (success, compiler output).
+    """
+    if not config['compile']:
+        return True, ""
     
-    # Normalize line endings and whitespace
-    actual = actual.rstrip().replace('\r\n', '\n')
-    expected = expected.rstrip().replace('\r\n', '\n')
-    
-    if actual == expected:
-        return True, "Output matches expected result"
-    else:
-        # Find the first difference for better error reporting
-        lines_actual = actual.split('\n')
-        lines_expected = expected.split('\n')
-        
-        for i, (a_line, e_line) in enumerate(zip(lines_actual, lines_expected)):
-            if a_line != e_line:
-                return False, f"Mismatch at line {i+1}:\nExpected: '{e_line}'\nActual: '{a_line}'"
-        
-        # If we get here, one string has more lines than the other
-        if len(lines_actual) < len(lines_expected):
-            return False, f"Output is missing lines. Expected {len(lines_expected)} lines but got {len(lines_actual)}"
+    # timeout keeps a pathological compile (e.g. template blowup) from holding the sandbox
+    timeout = settings.JUDGE_COMPILE_TIMEOUT
+    compile_cmd = f"mkdir -p /sandbox/build && timeout -s KILL {timeout} {config['compile'].format(code_id=code_id)}"
+    logger.info(f"Compiling: {compile_cmd}")
+    exit_code, output = await backend.exec(sandbox, ["sh", "-c", compile_cmd])
+    output = output.decode('utf-8', errors='replace')
+    if exit_code == 137:
+        logger.warning(f"Compilation timed out after {timeout}s")
+        return False, output + f"\nCompilation timed out after {timeout} seconds"
+    if exit_code != 0:
+        logger.warning(f"Compilation failed with exit code {exit_code}")
+        return False, output
+    return True, output
+
+# Runner verdicts and the names we report for them
+RUNNER_VERDICTS = {
+    "OLE": "Output Limit Exceeded",
+    "TLE": "Time Limit Exceeded",
+    "MLE": "Memory Limit Exceeded",
+    "RE": "Runtime Error",
+}
+
+class PhaseTimer:
+    """Adds up the seconds a judging run spends in each phase"""
+
+    def __init__(self):
+        self.timings = {}
+        self.mark = time.perf_counter()
+
+    def lap(self, phase: str):
+        """Count the time since the last lap towards phase"""
+        now = time.perf_counter()
+        self.timings[phase] = self.timings.get(phase, 0.0) + now - self.mark
+        self.mark = now
+
+class TestFanOut:
+    """
+    Hands a submission's tests out to lanes judging in parallel and merges
+    their results back in test order, passing each to on_test_result once
+    every test before it is in. Tests are grouped (a problem's subtasks, or
+    one group holding every test) and with early termination a failure
+    skips the later tests of its group: they are not handed out, and ones
+    a lane is busy with are interrupted. Earlier tests still finish, since
+    one of them may fail first, and other groups carry on.
+    """
+
+    def __init__(self, groups: List, early_termination: bool, on_test_result=None):
+        self.groups = groups  # group of each test
+        self.count = len(groups)
+        self.early_termination = early_termination
+        self.on_test_result = on_test_result
+        self.next_index = 0
+        self.results = {}
+        self.failures = {}  # group -> its first failing test
+        self.emitted = 0
+        self.emit_lock = asyncio.Lock()
+        self.busy = {}  # judging task -> test it is judging
+
+    def pending(self) -> bool:
+        """Whether tests are left to hand out"""
+        while self.next_index < self.count and self.skipped(self.next_index):
+            self.next_index += 1
+        return self.next_index < self.count
+
+    def take(self):
+        """Index of the next test for the calling lane, None when it should stop"""
+        if not self.pending():
+            return None
+        index = self.next_index
+        self.next_index += 1
+        return index
+
+    def skipped(self, index: int) -> bool:
+        """Whether an earlier failure in its group skips this test"""
+        first_failure = self.failures.get(self.groups[index])
+        return self.early_termination and first_failure is not None and first_failure < index
+
+    async def judge(self, index: int, judging) -> Optional[dict]:
+        """
+        Judge a test taken by the calling lane and record its result. Returns
+        None if the test was skipped while it ran; the lane's sessions are then
+        in an unknown state and have to be restarted.
+        """
+        task = asyncio.ensure_future(judging)
+        self.busy[task] = index
+        try:
+            await asyncio.wait([task])
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            self.busy.pop(task, None)
+        if task.cancelled():
+            return None
+        result = task.result()
+        await self.done(index, result)
+        return result
+
+    async def done(self, index: int, result: dict):
+        self.results[index] = result
+        group = self.groups[index]
+        if not result["passed"] and (group not in self.failures or index < self.failures[group]):
+            self.failures[group] = index
+            if self.early_termination:
+                logger.info(f"Early termination activated after failed test case {index + 1}"
+                            + (f" in subtask {group}" if group is not None else ""))
+                # Later tests of the group are not sent; interrupt the ones in flight
+                for task, busy_index in list(self.busy.items()):
+                    if self.skipped(busy_index):
+                        task.cancel()
+        async with self.emit_lock:
+            while self.emitted < self.count:
+                if self.skipped(self.emitted):
+                    self.emitted += 1
+                    continue
+                if self.emitted not in self.results:
+                    break
+                result = self.results[self.emitted]
+                self.emitted += 1
+                if self.on_test_result:
+                    callback = self.on_test_result(result)
+                    if inspect.isawaitable(callback):
+                        await callback
+
+    async def run(self, lanes) -> list:
+        """Run the lane coroutines to completion, returns the results in order"""
+        tasks = [asyncio.ensure_future(lane) for lane in lanes]
+        try:
+            # A lane that fails takes the others down with it
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Cancelled lanes still have to leave their sandboxes
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for task in tasks:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+        return [self.results[index] for index in sorted(self.results) if not self.skipped(index)]
+
+class CodeExecutor:
+    """
+    Judges submissions in pooled sandboxes. All sandbox I/O goes through
+    JudgeBackends driven from one event loop, so many submissions can be in
+    flight without a thread each. Each language runs on the backend named in
+    JUDGE_LANGUAGE_BACKENDS, or JUDGE_BACKEND. start() before use and close()
+    when done.
+    """
+
+    def __init__(self, backend: JudgeBackend = None, pinned: bool = False, slots: int = 0):
+        if backend is not None:
+            # One backend for every language
+            self.backends = {backend.name: backend}
+            self.default_backend = backend.name
+            self.language_backends = {}
         else:
-            return False, f"Output has extra lines. Expected {len(lines_expected)} lines but got {len(lines_actual)}"
-
-def execute_code(language, source_code, input_data=None, expected_output=None, early_termination=True, test_case_delimiter='\n'):
-    logger.info(f"Starting test for {language}")
-    # Generate a unique ID for this submission
-    code_id = str(uuid.uuid4())
-    logger.info(f"Generated code_id: {code_id}")
-
-    # Define language configurations (copied from main.py)
-    language_configs = {
-        "python": {"ext": "py", "image": "python:3.8", "cmd": "python /code/{code_id}.py"},
-        "javascript": {"ext": "js", "image": "node:14", "cmd": "node /code/{code_id}.js"},
-        "java": {"ext": "java", "image": "openjdk:11", "cmd": "javac /code/{code_id}.java && java -cp /code Main"},
-        "c": {"ext": "c", "image": "gcc:latest", "cmd": "gcc /code/{code_id}.c -o /code/{code_id} && /code/{code_id}"},
-        "c++": {"ext": "cpp", "image": "gcc:latest", "cmd": "g++ /code/{code_id}.cpp -o /code/{code_id} && /code/{code_id}"}
-    }
-    
-    # Check if language is supported
-    if language not in language_configs:
-        return {"error": "Unsupported language"}
-    
-    # Get config for the language
-    config = language_configs[language]
-    filename = f"submissions/{code_id}.{config['ext']}"
-    
-    # Ensure submissions directory exists
-    os.makedirs("submissions", exist_ok=True)
-    test_dir = f"submissions/{code_id}_tests"
-    os.makedirs(test_dir, exist_ok=True)
-    logger.info(f"Created test directory: {test_dir}")
-    
-    # Write source code to file
-    with open(filename, "wb") as f:
-        f.write(source_code.encode('utf-8'))
-    logger.info(f"Created file: {filename}")
-    
-    # Parse test cases from input data
-    test_cases = parse_test_cases(input_data, expected_output, test_case_delimiter)
-    logger.info(f"Found {len(test_cases)} test case(s)")
-    
-    # Write test cases to files
-    for i, test_case in enumerate(test_cases):
+            self.default_backend = settings.JUDGE_BACKEND
+            self.language_backends = dict(settings.JUDGE_LANGUAGE_BACKENDS)
+            names = {self.default_backend, *self.language_backends.values()}
+            self.backends = {name: create_backend(name) for name in names}
+        # Warm containers per backend and image, reused across submissions.
+        # Pinned sandboxes have no CPU quota, so only pass pinned=True when
+        # every execute gets a cpuset (the scheduler's pinned slots). slots is
+        # how many executes may run at once, each holding a container.
+        self.pools = {
+            name: ContainerPoolManager(backend, setup=functools.partial(self.install_runner, backend),
+                                       pinned=pinned, slots=slots)
+            for name, backend in self.backends.items()
+        }
+        # Checkers get pools of their own: a submission holds its sandbox while
+        # it waits for a checker's, so sharing one pool could use up every
+        # sandbox on submissions that all wait for a checker
+        self.checker_pools = {
+            name: ContainerPoolManager(backend, setup=functools.partial(self.install_runner, backend),
+                                       pinned=pinned, slots=slots)
+            for name, backend in self.backends.items()
+        }
+        self.image_digests = {}  # (backend, image name) -> id, used in artifact cache keys
+        self.runner_binary = None
+        self.runner_lock = None
+
+    def backend_for(self, language) -> JudgeBackend:
+        return self.backends[self.language_backends.get(language, self.default_backend)]
+
+    async def start(self):
+        self.runner_lock = asyncio.Lock()
+        for backend in self.backends.values():
+            await backend.start()
+        metrics.add_collector(self.collect_metrics)
+
+    async def close(self):
+        metrics.remove_collector(self.collect_metrics)
+        for name, pools in self.pools.items():
+            await pools.shutdown()
+            await self.checker_pools[name].shutdown()
+            await self.backends[name].close()
+
+    def collect_metrics(self):
+        """Pool occupancy gauges, refreshed whenever metrics are exported"""
+        for name, pools in self.pools.items():
+            checker_pools = self.checker_pools[name].pools.items()
+            for image, pool in [*pools.pools.items(), *((f"checker:{image}", pool) for image, pool in checker_pools)]:
+                POOL_CONTAINERS.set(len(pool.idle), backend=name, image=image, state="idle")
+                POOL_CONTAINERS.set(pool.in_use, backend=name, image=image, state="busy")
+                POOL_CONTAINERS.set(pool.creating, backend=name, image=image, state="starting")
+
+    async def image_digest(self, backend, image):
+        """Resolve an image name to its content id so cache entries follow image updates"""
+        key = (backend.name, image)
+        if key not in self.image_digests:
+            self.image_digests[key] = await backend.image_id(image)
+        return self.image_digests[key]
+
+    async def install_runner(self, backend, sandbox):
+        """Pool setup hook: put the limit-enforcing runner into a new sandbox"""
+        # Built once (per artifact cache) and shared by all pools; it is
+        # static, so a build from either backend runs in both
+        async with self.runner_lock:
+            if self.runner_binary is None:
+                key = artifact_cache.key("runner", await self.image_digest(backend, RUNNER_BUILD_IMAGE), RUNNER_SOURCE)
+                binary = artifact_cache.get(key)
+                if binary is None:
+                    logger.info(f"Building judge runner on {backend.name}")
+                    binary = await build_runner(backend)
+                    artifact_cache.put(key, binary)
+                self.runner_binary = binary
+        await install_runner(backend, sandbox, self.runner_binary)
+
+    @asynccontextmanager
+    async def checker_session(self, checker, cpuset=None):
+        """
+        Lease a sandbox for a problem's checker and start its runner session,
+        yielding a CheckerSession (None when the problem has no checker) that
+        all of a submission's lanes share.
+        The build comes from the artifact cache, compiled here on a miss.
+        """
+        if not checker:
+            yield None
+            return
+        language, source = checker['language'], checker['source']
+        config = CHECKER_CONFIGS[language]
+        backend = self.backend_for(language)
+        pool = self.checker_pools[backend.name].get(config['image'])
+        async with pool.lease(cpuset=cpuset) as pooled:
+            sandbox = pooled.sandbox
+            memory_limit = f"{settings.JUDGE_CHECKER_MEMORY_LIMIT_MB + settings.JUDGE_MEMORY_HEADROOM_MB}m"
+            if not await pool.configure(pooled, memory_limit=memory_limit, cpuset=cpuset):
+                raise RuntimeError("Could not apply limits to the checker sandbox")
+            key = checker_cache_key(language, await self.image_digest(backend, config['image']), source)
+            build = artifact_cache.get(key)
+            if build is None:
+                logger.info(f"Compiling {language} checker {key[:12]}")
+                artifact_cache.put(key, await compile_checker(backend, sandbox, language, source))
+            else:
+                await backend.put_archive(sandbox, SANDBOX_DIR, build)
+            async with backend.attach(sandbox, checker_command(language)) as session:
+                checks = CheckerSession(RunnerSession(session, settings.JUDGE_OUTPUT_PREVIEW))
+                yield checks
+                await checks.close()
+
+    async def judge_test(self, runner, checks, i, test_case, comparison, cpu_limit_ms, memory_limit_mb,
+                         output_limit):
+        """Run test i through a lane's runner (and checker) session, returns its result"""
         test_input = test_case['input']
-        if test_input:
-            input_file = f"{test_dir}/input_{i}.txt"
-            with open(input_file, "w") as f:
-                f.write(test_input)
-            logger.info(f"Created input file for test case {i+1}: {input_file}")
-            
-    # Create a wrapper script for running test cases if there's more than one
-    if len(test_cases) > 1:
-        wrapper_script = f"{test_dir}/run_tests.sh"
-        with open(wrapper_script, "w") as f:
-            f.write("#!/bin/sh\n")
-            f.write("# Wrapper script for running test cases with early termination\n\n")
-            f.write(f"CODE_CMD=\"{config['cmd'].format(code_id=code_id)}\"\n\n")
-            
-            for i in range(len(test_cases)):
-                f.write(f"echo \"Running test case {i+1}/{len(test_cases)}...\"\n")
-                f.write(f"if [ -f /tests/input_{i}.txt ]; then\n")
-                f.write(f"  cat /tests/input_{i}.txt | $CODE_CMD > /tests/output_{i}.txt\n")
-                f.write("  EXIT_CODE=$?\n")
-                f.write("  if [ $EXIT_CODE -ne 0 ]; then\n")
-                f.write(f"    echo \"Test {i+1} failed with exit code $EXIT_CODE\"\n")
-                f.write("    exit $EXIT_CODE\n")
-                f.write("  fi\n")
-                f.write("else\n")
-                f.write(f"  $CODE_CMD > /tests/output_{i}.txt\n")
-                f.write("  EXIT_CODE=$?\n")
-                f.write("  if [ $EXIT_CODE -ne 0 ]; then\n")
-                f.write(f"    echo \"Test {i+1} failed with exit code $EXIT_CODE\"\n")
-                f.write("    exit $EXIT_CODE\n")
-                f.write("  fi\n")
-                f.write("fi\n\n")
-            
-            f.write("echo \"All tests completed successfully\"\n")
-            f.write("exit 0\n")
-            
-        # Make wrapper script executable
-        os.chmod(wrapper_script, 0o755)
-        logger.info(f"Created test wrapper script: {wrapper_script}")
-    
-    test_results = []
-    all_passed = True
-    container = None
-    
-    try:
-        logger.info(f"Creating Docker container with image: {config['image']}")
-        
-        # Create the container but don't start it yet
-        container_cmd = "/bin/sh"  # We'll execute commands through exec
-        container = client.containers.create(
-            image=config['image'],
-            command=container_cmd,
-            volumes={
-                os.path.abspath('submissions'): {'bind': '/code', 'mode': 'ro'},
-                os.path.abspath(test_dir): {'bind': '/tests', 'mode': 'rw'}
-            },
-            network_mode="none",
-            mem_limit="128m",
-            cpu_quota=50000,
-            detach=True,  # Detached mode because we'll be executing commands
-            user="1000:1000",
-            security_opt=["no-new-privileges"],
-            pids_limit=100,
-            cap_drop=["ALL"],
-            tty=True  # Allocate a TTY for interactive commands
-        )
-        
-        # Start the container
-        container.start()
-        logger.info(f"Container {container.short_id} started successfully")
-        
-        # Process test cases
-        for i, test_case in enumerate(test_cases):
-            test_input = test_case['input']
-            test_expected = test_case['expected_output']
-            
-            logger.info(f"Running test case {i+1}/{len(test_cases)}")
-            
-            try:
-                # Run the code with this test case input
-                if len(test_cases) == 1:
-                    # For single test case, simplify execution
-                    if test_input:
-                        exec_cmd = f"sh -c 'cat /tests/input_{i}.txt | {config['cmd'].format(code_id=code_id)}'"
-                    else:
-                        exec_cmd = config['cmd'].format(code_id=code_id)
-                    
-                    logger.info(f"Running command: {exec_cmd}")
-                    exit_code, logs = container.exec_run(exec_cmd)
-                    logs = logs.decode('utf-8', errors='replace')
-                else:
-                    # Just run the single test case
-                    exec_cmd = f"sh -c 'cat /tests/input_{i}.txt | {config['cmd'].format(code_id=code_id)} > /tests/output_{i}.txt'"
-                    logger.info(f"Running command: {exec_cmd}")
-                    exit_code, logs = container.exec_run(exec_cmd)
-                    
-                    if exit_code == 0:
-                        # Read the output file
-                        cat_cmd = f"cat /tests/output_{i}.txt"
-                        _, output = container.exec_run(cat_cmd)
-                        logs = output.decode('utf-8', errors='replace')
-                    else:
-                        logs = logs.decode('utf-8', errors='replace')
-                
-                # If the code execution was successful
-                if exit_code == 0:
-                    logger.info(f"Test case {i+1} execution completed")
-                    
-                    # If expected output is provided, validate the result
-                    test_passed = True
-                    comparison_result = "No expected output for validation"
-                    
-                    if test_expected:
-                        test_passed, comparison_result = compare_output(logs, test_expected)
-                        if test_passed:
-                            logger.info(f"Test case {i+1} passed ✓")
-                        else:
-                            logger.error(f"Test case {i+1} failed: {comparison_result}")
-                            all_passed = False
-                    
-                    # Add result for this test case
-                    test_results.append({
-                        "test_case": i + 1,
-                        "input": test_input,
-                        "expected_output": test_expected,
-                        "actual_output": logs,
-                        "passed": test_passed,
-                        "details": comparison_result
-                    })
-                    
-                    # If early termination is enabled and test failed, stop processing
-                    if early_termination and not test_passed:
-                        logger.info(f"Early termination activated after failed test case {i+1}")
-                        break
-                else:
-                    # The code execution failed
-                    logger.error(f"Test case {i+1} execution failed with exit code {exit_code}")
-                    
-                    # Add failed result
-                    test_results.append({
-                        "test_case": i + 1,
-                        "input": test_input,
-                        "expected_output": test_expected,
-                        "actual_output": logs,
-                        "passed": False,
-                        "details": f"Execution error (code {exit_code}): {logs}"
-                    })
-                    all_passed = False
-                    
-                    # Early termination on container error
-                    if early_termination:
-                        logger.info(f"Early termination activated after container error")
-                        break
-                
-            except docker.errors.APIError as e:
-                # Docker API error
-                logs = str(e)
-                logger.error(f"Docker API error during test case {i+1}: {logs}")
-                
-                # Add failed result
-                test_results.append({
-                    "test_case": i + 1,
-                    "input": test_input,
-                    "expected_output": test_expected,
-                    "actual_output": "",
-                    "passed": False,
-                    "details": f"Docker API error: {logs}"
-                })
-                all_passed = False
-                
-                # Early termination on API error
-                if early_termination:
-                    break
-        # Prepare the final result
-        if all_passed:
-            logger.info(f"All test cases passed")
-            result = {
-                "status": "success", 
-                "all_passed": True,
-                "test_results": test_results,
-                "passed_count": len([r for r in test_results if r["passed"]]),
-                "total_count": len(test_results)
-            }
+        if isinstance(test_input, str):
+            test_input = test_input.encode('utf-8')
+        test_expected = test_case['expected_output']
+        # Output is compared while it streams in, never held whole;
+        # a checker needs all of it (up to the output limit)
+        output = bytearray()
+        comparator = None
+        compare_time = 0.0
+        if checks:
+            on_output = output.extend
+        elif test_expected:
+            comparator = create_comparator(chunked(test_expected), comparison)
+
+            def on_output(chunk):
+                nonlocal compare_time
+                started = time.perf_counter()
+                comparator.feed(chunk)
+                compare_time += time.perf_counter() - started
         else:
-            logger.warning(f"Some test cases failed")
+            on_output = None
+        run = await runner.run(i, test_input, on_output=on_output)
+        logs = run["output"]
+        score = 0.0
+
+        memory_used = (run["rss_kb"] + 1023) // 1024
+
+        if run["verdict"] == "OLE" or run["output_bytes"] > output_limit:
+            # The program printed more than the output cap
+            logger.error(f"Test case {i+1} exceeded the output limit")
+            test_passed = False
+            verdict = RUNNER_VERDICTS["OLE"]
+            comparison_result = f"Output limit exceeded ({output_limit} bytes)"
+            logs = logs[:output_limit]
+        elif run["verdict"] == "TLE":
+            logger.error(f"Test case {i+1} exceeded the time limit")
+            test_passed = False
+            verdict = RUNNER_VERDICTS["TLE"]
+            comparison_result = (f"Time limit exceeded ({run['cpu_ms']} ms CPU, {run['wall_ms']} ms wall; "
+                                 f"limit {cpu_limit_ms} ms)")
+        elif run["verdict"] == "MLE":
+            logger.error(f"Test case {i+1} exceeded the memory limit")
+            test_passed = False
+            verdict = RUNNER_VERDICTS["MLE"]
+            comparison_result = f"Memory limit exceeded ({memory_used} MB; limit {memory_limit_mb} MB)"
+        elif run["verdict"] == "OK":
+            logger.info(f"Test case {i+1} execution completed")
+
+            # If expected output is provided, validate the result
+            test_passed = True
+            comparison_result = "No expected output for validation"
+
+            started = time.perf_counter()
+            if checks:
+                verdict, score, comparison_result = await checks.check(i, test_input, output, test_expected)
+                test_passed = verdict == "Accepted"
+            else:
+                if comparator:
+                    test_passed, comparison_result = comparator.finish()
+                verdict = "Accepted" if test_passed else "Wrong Answer"
+                score = 1.0 if test_passed else 0.0
+            compare_time += time.perf_counter() - started
+            if test_passed:
+                logger.info(f"Test case {i+1} passed ✓")
+            else:
+                logger.error(f"Test case {i+1} failed: {comparison_result}")
+        else:
+            # The code execution failed
+            logger.error(f"Test case {i+1} execution failed with exit code {run['exit_code']}")
+            test_passed = False
+            verdict = RUNNER_VERDICTS["RE"]
+            comparison_result = f"Execution error (code {run['exit_code']}): {run['error'] or logs}"
+
+        return {
+            "test_case": i + 1,
+            "input": preview(test_input),
+            "expected_output": preview(test_expected),
+            "actual_output": logs,
+            "passed": test_passed,
+            "verdict": verdict,
+            "details": comparison_result,
+            "execution_time": run["cpu_ms"] / 1000,
+            "wall_time": run["wall_ms"] / 1000,
+            "memory_used": memory_used,
+            "compare_time": compare_time,
+            "score": score,
+            "weight": test_case.get('weight', 1.0)
+        }
+
+    async def execute(self, language, source_code, test_cases, early_termination=True, on_test_result=None,
+                      time_limit_ms=None, memory_limit_mb=None, cpuset=None, comparison=None, checker=None,
+                      subtasks=None):
+        """
+        Judge source_code against test_cases, dicts of "input" (bytes or a
+        mapped file) and "expected_output" (text or a mapped file) as
+        open_cached_tests gives them.
+        on_test_result, if given, is called (or awaited, if it is a coroutine
+        function) with each per-test result dict as soon as that test has been
+        judged, for streaming progress.
+        time_limit_ms (CPU) and memory_limit_mb (peak RSS) are the problem's
+        per-test limits, scaled by the language multipliers; they default to
+        JUDGE_TIME_LIMIT_MS and JUDGE_MEMORY_LIMIT_MB. cpuset pins the sandbox
+        to the scheduler slot's cores for the run, and with
+        JUDGE_PARALLEL_TESTS tests fan out over several sandboxes, one per
+        core; results still come back in test order. comparison is the problem's
+        output comparison (exact lines by default), unless it has a checker
+        ({"language", "source"}) that judges each output instead.
+        Tests with a "group" belong to that subtask: early termination only
+        skips the rest of a failing test's group, and with subtasks (number ->
+        points) the score is the sum of the subtasks' points earned.
+        """
+        logger.info(f"Starting test for {language}")
+        # Generate a unique ID for this submission
+        code_id = str(uuid.uuid4())
+        logger.info(f"Generated code_id: {code_id}")
+
+        # Check if language is supported
+        if language not in LANGUAGE_CONFIGS:
+            return {"error": "Unsupported language"}
+        if checker and checker['language'] not in CHECKER_CONFIGS:
+            return {"error": "Unsupported checker language"}
+
+        # Get config for the language
+        config = LANGUAGE_CONFIGS[language]
+
+        # Per-test limits. The wall clock allows for I/O and is capped at
+        # DOCKER_TIMEOUT, unless the CPU limit itself is longer than that.
+        cpu_limit_ms, memory_limit_mb = language_limits(language, time_limit_ms, memory_limit_mb)
+        wall_limit_ms = max(min(2 * cpu_limit_ms + 1000, settings.DOCKER_TIMEOUT * 1000), cpu_limit_ms + 1000)
+        filename = config['source'].format(code_id=code_id)
+        run_cmd = config['run'].format(code_id=code_id, memory_mb=memory_limit_mb)
+
+        # Only the source is copied in; test data is streamed to the runner
+        sandbox_files = {filename: source_code}
+
+        logger.info(f"Found {len(test_cases)} test case(s)")
+
+        backend = self.backend_for(language)
+        pool = self.pools[backend.name].get(config['image'])
+        pooled = None
+        extra_lanes = []
+        discard = False
+
+        # Seconds spent in each phase, reported in the result for metrics and benchmarks
+        timer = PhaseTimer()
+        timings = timer.timings
+
+        try:
+            # Take a warm container instead of creating one per submission
+            pooled = await pool.checkout(cpuset=cpuset)
+            sandbox = pooled.sandbox
+            logger.info(f"Checked out container {sandbox[:12]} for image {config['image']}")
+            if cpuset and not await pool.configure(pooled, cpuset=cpuset):
+                raise RuntimeError("Could not pin the sandbox to its CPUs")
+            timer.lap("checkout")
+
+            # Reuse a previous build of the same source when we have one
+            cache_key = None
+            cached_build = None
+            if config['compile']:
+                cache_key = artifact_cache.key(language, await self.image_digest(backend, config['image']), source_code)
+                cached_build = artifact_cache.get(cache_key)
+                CACHE_LOOKUPS.inc(cache="artifact", result="hit" if cached_build else "miss")
+
+            # Copy the source and any cached build into the sandbox
+            await backend.put_archive(sandbox, SANDBOX_DIR, build_archive(sandbox_files, extra_tar=cached_build))
+            timer.lap("staging")
+
+            # Compile once, then every test runs against the build output
+            build = cached_build
+            if cached_build:
+                logger.info(f"Using cached build {cache_key[:12]}")
+                compiled, compile_output = True, ""
+            else:
+                compiled, compile_output = await compile_code(backend, sandbox, config, code_id)
+                if compiled and cache_key:
+                    build = await backend.get_archive(sandbox, f"{SANDBOX_DIR}/build")
+                    artifact_cache.put(cache_key, build)
+            timer.lap("compile")
+            if not compiled:
+                return {
+                    "status": "compilation_error",
+                    "all_passed": False,
+                    "compile_output": compile_output,
+                    "test_results": [],
+                    "passed_count": 0,
+                    "total_count": len(test_cases),
+                    "score": 0.0,
+                    "timings": timings
+                }
+
+            # Size the cgroup for this problem: light problems don't reserve memory
+            # they don't need and heavy ones get what they were promised
+            memory_limit = f"{memory_limit_mb + settings.JUDGE_MEMORY_HEADROOM_MB}m"
+            if not await pool.configure(pooled, memory_limit=memory_limit):
+                raise RuntimeError("Could not apply the memory limit to the sandbox")
+
+            # Tests fan out over lanes: sandboxes judging in parallel, each on
+            # its own core, with a copy of the build. Only sandboxes the pool
+            # can spare right away are taken, the rest of the tests just wait.
+            lane_cpusets = test_lanes(cpuset, len(test_cases))
+            if len(lane_cpusets) > 1:
+                if cpuset and not await pool.configure(pooled, cpuset=lane_cpusets[0]):
+                    raise RuntimeError("Could not pin the sandbox to its CPUs")
+                checkouts = await asyncio.gather(*(pool.checkout(timeout=0, cpuset=lane_cpuset)
+                                                   for lane_cpuset in lane_cpusets[1:]),
+                                                 return_exceptions=True)
+                extra_lanes.extend(lane for lane in checkouts if isinstance(lane, PooledContainer))
+                for lane in checkouts:
+                    if isinstance(lane, BaseException) and not isinstance(lane, TimeoutError):
+                        raise lane
+                timer.lap("checkout")
+                lane_files = build_archive(sandbox_files, extra_tar=build)
+                for lane, lane_cpuset in zip(extra_lanes, lane_cpusets[1:]):
+                    if not await pool.configure(lane, memory_limit=memory_limit, cpuset=lane_cpuset):
+                        raise RuntimeError("Could not apply limits to a test sandbox")
+                    await backend.put_archive(lane.sandbox, SANDBOX_DIR, lane_files)
+                timer.lap("staging")
+            lanes = [pooled] + extra_lanes
+
+            # One runner exec per lane serves all of its tests: inputs go in over
+            # its stdin and each test is judged as soon as its result comes back
+            output_limit = settings.JUDGE_OUTPUT_LIMIT
+            runner_cmd = [RUNNER_PATH, str(wall_limit_ms), str(cpu_limit_ms), str(memory_limit_mb * 1024),
+                          str(output_limit), "--"] + shlex.split(run_cmd)
+            logger.info(f"Running {len(test_cases)} test case(s) through the runner on {len(lanes)} sandbox(es)")
+
+            # Tests of a subtask stop at its first failure, without subtasks
+            # they are all one group
+            fan_out = TestFanOut([test_case.get('group') for test_case in test_cases], early_termination,
+                                 on_test_result)
+
+            async def run_lane(lane, checks):
+                while True:
+                    async with backend.attach(lane.sandbox, runner_cmd) as session:
+                        runner = RunnerSession(session, output_limit, settings.JUDGE_OUTPUT_PREVIEW)
+                        while (i := fan_out.take()) is not None:
+                            if await fan_out.judge(i, self.judge_test(
+                                runner, checks, i, test_cases[i], comparison, cpu_limit_ms, memory_limit_mb,
+                                output_limit
+                            )) is None:
+                                break
+                        else:
+                            await runner.close()
+                            return
+                    # A test was interrupted mid-run: if other tests remain, kill
+                    # what is left of it and start over with a fresh session
+                    if not fan_out.pending():
+                        return
+                    if not await pool.kill_processes(lane):
+                        raise RuntimeError("Could not reset a test sandbox")
+
+            # One checker sandbox serves every lane
+            async with self.checker_session(checker, cpuset) as checks:
+                timer.lap("staging")
+                test_results = await fan_out.run([run_lane(lane, checks) for lane in lanes])
+            timer.lap("tests")
+            timings["compare"] = sum(r["compare_time"] for r in test_results)
+            all_passed = all(r["passed"] for r in test_results)
+
+            # Prepare the final result; the verdict is that of the first failing test
+            failed = [r for r in test_results if not r["passed"]]
+            score, max_score, subtask_scores = score_tests(test_cases, test_results, subtasks)
+            if all_passed:
+                logger.info(f"All test cases passed")
+            else:
+                logger.warning(f"Some test cases failed")
             result = {
-                "status": "failure", 
-                "all_passed": False,
+                "status": "success" if all_passed else "failure",
+                "all_passed": all_passed,
+                "verdict": failed[0]["verdict"] if failed else "Accepted",
                 "test_results": test_results,
-                "passed_count": len([r for r in test_results if r["passed"]]),
-                "total_count": len(test_results)
+                "passed_count": len(test_results) - len(failed),
+                "total_count": len(test_cases),  # judged or not, so an early stop reads "k / N"
+                "score": score,
+                "max_score": max_score,
+                "subtask_scores": subtask_scores,
+                "execution_time": max((r["execution_time"] for r in test_results), default=None),
+                "memory_used": max((r["memory_used"] for r in test_results), default=None),
+                "time_limit_ms": cpu_limit_ms,
+                "memory_limit_mb": memory_limit_mb,
+                "compile_cached": bool(cached_build),
+                "backend": backend.name,
+                "timings": timings
             }
-        
-        return result
-        
-    except docker.errors.APIError as e:
-        logger.error(f"Docker API error: {str(e)}")
-        return {"status": "error", "message": "Docker API error", "details": str(e)}
-    
-    except Exception as e:
-        logs = str(e)
-        logger.error(f"Unexpected exception: {logs}")
-        return {"status": "error", "output": logs}
-    
-    finally:
-        # Clean up container if it exists
-        if container:
-            try:
-                logger.info(f"Stopping container {container.short_id}...")
-                # Use kill instead of stop for faster termination (no 10-second grace period)
-                container.kill()
-                logger.info(f"Removing container {container.short_id}...")
-                container.remove(v=True)  # v=True removes volumes associated with the container
-                logger.info(f"Container cleanup complete")
-            except Exception as e:
-                logger.warning(f"Error cleaning up container: {str(e)}")
-        
-        # Clean up test directory
-        if os.path.exists(test_dir):
-            try:
-                logger.info(f"Cleaning up test directory: {test_dir}...")
-                shutil.rmtree(test_dir)
-                logger.info(f"Test directory cleanup complete")
-            except Exception as e:
-                logger.warning(f"Error cleaning up test directory: {str(e)}")
-        
-        # Clean up the source code file
-        if os.path.exists(filename):
-            logger.info(f"Cleaning up temporary file: {filename}...")
-            os.remove(filename)
-            logger.info(f"File cleanup complete")
-
-
-
-
-
-
-
-
-
-
-
-
-
-
 
+            return result
+
+        except JudgeBackendError as e:
+            discard = True
+            logger.error(f"{backend.name} backend error: {str(e)}")
+            return {"status": "error", "message": f"{backend.name} backend error", "details": str(e)}
+
+        except Exception as e:
+            discard = True
+            logs = str(e)
+            logger.error(f"Unexpected exception: {logs}")
+            return {"status": "error", "output": logs}
+
+        finally:
+            # Hand the containers back; the pool scrubs or recycles them. The
+            # result already holds timings, so cleanup still shows up in it.
+            timer.mark = time.perf_counter()
+            for lane in extra_lanes:
+                await pool.checkin(lane, discard=discard)
+            if pooled:
+                await pool.checkin(pooled, discard=discard)
+            timer.lap("cleanup")
+
+def execute_code(*args, **kwargs):
+    """
+    Blocking wrapper around CodeExecutor.execute for scripts: judges one
+    submission on a private executor. Long-running code should share one
+    CodeExecutor instead.
+    """
+    async def run():
+        executor = CodeExecutor()
+        await executor.start()
+        try:
+            return await executor.execute(*args, **kwargs)
+        finally:
+            await executor.close()
+    return asyncio.run(run())
 
 
 
 # Example usage
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
     print("CODE JUDGE TEST SCRIPT")
+
+    def demo_tests(input_data, expected_output):
+        """Tests from inputs and outputs separated by "--- TEST CASE n ---" lines"""
+        def parts(text):
+            return [part.strip() for part in re.split(r"^--- TEST CASE \d+ ---$", text, flags=re.M) if part.strip()]
+        return [{'input': test_input, 'expected_output': test_output}
+                for test_input, test_output in zip(parts(input_data), parts(expected_output))]
     
     # First check if Docker is running and accessible
+    async def ping():
+        backend = create_backend()
+        await backend.start()
+        try:
+            await backend.image_id(RUNNER_BUILD_IMAGE)
+        finally:
+            await backend.close()
     try:
-        client.ping()
+        asyncio.run(ping())
         print("[INFO] Docker service is running and accessible ✓")
-    except docker.errors.DockerException as e:
+    except Exception as e:
         print("\n[ERROR] Cannot access Docker service! This might be due to:")
         exit(1)
     
@@ -425,7 +790,7 @@ Average: 150.0
 """
     
     print("\n=== TEST: Python with Multiple Test Cases and Early Termination ===")
-    result = execute_code("python", python_input_code, input_data, expected_output, early_termination=True)
+    result = execute_code("python", python_input_code, demo_tests(input_data, expected_output), early_termination=True)
     print("\nPython multi-test result:")
     print(json.dumps(result, indent=2))
     print("-" * 50)
@@ -440,14 +805,14 @@ print(f"Average: {sum(nums)/len(nums)}")
 """
 
     print("\n=== TEST: Python with Failing Test Case and Early Termination ===")
-    result = execute_code("python", python_fail_code, input_data, expected_output, early_termination=True)
+    result = execute_code("python", python_fail_code, demo_tests(input_data, expected_output), early_termination=True)
     print("\nPython failing test result:")
     print(json.dumps(result, indent=2))
     print("-" * 50)
     
     # Test with a failing test case but without early termination
     print("\n=== TEST: Python with Failing Test Case WITHOUT Early Termination ===")
-    result = execute_code("python", python_fail_code, input_data, expected_output, early_termination=False)
+    result = execute_code("python", python_fail_code, demo_tests(input_data, expected_output), early_termination=False)
     print("\nPython without early termination result:")
     print(json.dumps(result, indent=2))
     print("-" * 50)
@@ -493,7 +858,7 @@ Fibonacci(5) = 5
 Fibonacci(10) = 55
 """
     
-    result = execute_code("python", fibonacci_code, fib_input_data, fib_expected_output, early_termination=True)
+    result = execute_code("python", fibonacci_code, demo_tests(fib_input_data, fib_expected_output), early_termination=True)
     print("\nFibonacci test result:")
     print(json.dumps(result, indent=2))
     print("-" * 50)
@@ -536,7 +901,7 @@ Sum: 75, Average: 15.00, Max: 25, Min: 5
 Sum: 1500, Average: 300.00, Max: 500, Min: 100
 """
     
-    result = execute_code("javascript", js_array_code, js_input_data, js_expected_output, early_termination=True)
+    result = execute_code("javascript", js_array_code, demo_tests(js_input_data, js_expected_output), early_termination=True)
     print("\nJavaScript array test result:")
     print(json.dumps(result, indent=2))
     print("-" * 50)
\ No newline at end of file
@@ -0,0 +1,303 @@
+import os
+import re
+import hashlib
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Output comparison for the judge. The program's output is pushed in as it
+# streams out of the runner and the expected output is pulled chunk by chunk,
+# so a comparison holds one chunk plus the current line or token of each side,
+# never whole outputs, and stops looking at the first difference.
+#
+# Modes (Problem.comparison_mode):
+#   exact      line by line, CRLF read as LF, ignoring only the whitespace
+#              at the very end of the output (trailing spaces on any line
+#              but the last count)
+#   token      whitespace-separated tokens, however they are spaced
+#   float      tokens, numbers equal within float_abs_eps or float_rel_eps
+#   unordered  the same lines (trailing whitespace and blank lines ignored)
+#              in any order
+COMPARISON_MODES = ("exact", "token", "float", "unordered")
+
+CHUNK_SIZE = 64 * 1024
+
+# How much of a mismatching line or token goes into the details
+EXCERPT = 200
+
+NUMBER = re.compile(rb"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
+
+@dataclass
+class Comparison:
+    """How a problem's outputs are compared"""
+    mode: str = "exact"
+    abs_eps: float = 1e-6
+    rel_eps: float = 1e-6
+
+def comparison_for(problem) -> Comparison:
+    """A problem's comparison settings, the defaults for problems without any"""
+    if problem is None:
+        return Comparison()
+    return Comparison(
+        mode=problem.comparison_mode or "exact",
+        abs_eps=problem.float_abs_eps if problem.float_abs_eps is not None else 1e-6,
+        rel_eps=problem.float_rel_eps if problem.float_rel_eps is not None else 1e-6,
+    )
+
+def chunked(data, size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Slices of a str, bytes or mmap, without encoding or copying all of it at once"""
+    if isinstance(data, str):
+        # Encoded a slice at a time; a character never spans two slices
+        for offset in range(0, len(data), size):
+            yield data[offset:offset + size].encode('utf-8')
+        return
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+def _excerpt(unit: Optional[bytes]) -> str:
+    if unit is None:
+        return "<end of output>"
+    text = unit[:EXCERPT].decode('utf-8', errors='replace')
+    return text + "..." if len(unit) > EXCERPT else text
+
+class _LineSplitter:
+    """
+    Complete lines out of a chunk stream, without the CR of a CRLF, or with
+    all trailing whitespace stripped if strip is set
+    """
+
+    def __init__(self, strip: bool = False):
+        self.carry = bytearray()
+        self.strip = strip
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        pieces = chunk.split(b"\n")
+        if len(pieces) == 1:
+            self.carry += chunk
+            return []
+        self.carry += pieces[0]
+        lines = [bytes(self.carry)] + pieces[1:-1]
+        self.carry = bytearray(pieces[-1])
+        if self.strip:
+            return [line.rstrip() for line in lines]
+        return [line[:-1] if line.endswith(b"\r") else line for line in lines]
+
+    def flush(self) -> List[bytes]:
+        lines = [bytes(self.carry).rstrip() if self.strip else bytes(self.carry)] if self.carry else []
+        self.carry = bytearray()
+        return lines
+
+class _TokenSplitter:
+    """Complete whitespace-separated tokens out of a chunk stream"""
+
+    def __init__(self):
+        self.carry = bytearray()
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        tokens = chunk.split()
+        if not tokens:
+            return self.flush() if chunk else []
+        done = []
+        if self.carry:
+            if chunk[:1].isspace():
+                done = self.flush()
+            else:
+                # The chunk continues the token cut off by the previous one
+                self.carry += tokens.pop(0)
+                if tokens or chunk[-1:].isspace():
+                    done = self.flush()
+        if tokens and not chunk[-1:].isspace():
+            self.carry = bytearray(tokens.pop())
+        return done + tokens
+
+    def flush(self) -> List[bytes]:
+        tokens = [bytes(self.carry)] if self.carry else []
+        self.carry = bytearray()
+        return tokens
+
+def _units(chunks: Iterable[bytes], splitter) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield from splitter.feed(bytes(chunk))
+    yield from splitter.flush()
+
+class StreamComparator:
+    """
+    Compares pushed output against pulled expected output. feed() returns
+    False once a difference has been found, so the caller can stop sending;
+    finish() gives (passed, details).
+    """
+
+    def __init__(self, expected: Iterable[bytes], comparison: Comparison):
+        self.comparison = comparison
+        self.failure: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> bool:
+        raise NotImplementedError
+
+    def finish(self) -> Tuple[bool, str]:
+        raise NotImplementedError
+
+    def _result(self) -> Tuple[bool, str]:
+        if self.failure:
+            return False, self.failure
+        return True, "Output matches expected result"
+
+class LineComparator(StreamComparator):
+    """
+    exact mode. The last line with anything but whitespace on it is held
+    back, along with the whitespace-only lines after it: they are compared
+    as they are once more output follows, or with their trailing whitespace
+    ignored if it turns out to be the end.
+    """
+
+    def __init__(self, expected: Iterable[bytes], comparison: Comparison):
+        super().__init__(expected, comparison)
+        self.expected = _units(expected, _LineSplitter())
+        self.splitter = _LineSplitter()
+        self.line = 0
+        self.held: List[bytes] = []  # output lines not compared yet, they may be trailing
+
+    def feed(self, chunk: bytes) -> bool:
+        if self.failure is None:
+            self._compare(self.splitter.feed(chunk))
+        return self.failure is None
+
+    def finish(self) -> Tuple[bool, str]:
+        if self.failure is None:
+            self._compare(self.splitter.flush())
+        if self.failure is None and self.held and self.held[0].strip():
+            self._match(self.held[0], rstrip=True)
+        if self.failure is None:
+            # Whatever is left of the expected output may only be whitespace
+            for line in self.expected:
+                self.line += 1
+                if line.strip():
+                    self.failure = (f"Output is missing lines. Expected more output at line {self.line}:\n"
+                                    f"Expected: '{_excerpt(line)}'")
+                    break
+        return self._result()
+
+    def _compare(self, lines: List[bytes]):
+        for line in lines:
+            if line.strip():
+                # More output: the held lines weren't trailing after all
+                for held in self.held:
+                    if not self._match(held):
+                        return
+                self.held = []
+            self.held.append(line)
+
+    def _match(self, actual: bytes, rstrip: bool = False) -> bool:
+        self.line += 1
+        expected = next(self.expected, None)
+        if expected is None:
+            self.failure = (f"Output has extra lines. Unexpected output at line {self.line}:\n"
+                            f"Actual: '{_excerpt(actual)}'")
+        elif (actual.rstrip() != expected.rstrip()) if rstrip else (actual != expected):
+            self.failure = (f"Mismatch at line {self.line}:\n"
+                            f"Expected: '{_excerpt(expected)}'\nActual: '{_excerpt(actual)}'")
+        return self.failure is None
+
+class TokenComparator(StreamComparator):
+    """token and float modes"""
+
+    def __init__(self, expected: Iterable[bytes], comparison: Comparison):
+        super().__init__(expected, comparison)
+        self.expected = _units(expected, _TokenSplitter())
+        self.splitter = _TokenSplitter()
+        self.token = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        if self.failure is None:
+            self._compare(self.splitter.feed(chunk))
+        return self.failure is None
+
+    def finish(self) -> Tuple[bool, str]:
+        if self.failure is None:
+            self._compare(self.splitter.flush())
+        if self.failure is None:
+            expected = next(self.expected, None)
+            if expected is not None:
+                self.failure = (f"Output is missing tokens. Expected token {self.token + 1}: "
+                                f"'{_excerpt(expected)}'")
+        return self._result()
+
+    def _compare(self, tokens: List[bytes]):
+        for actual in tokens:
+            self.token += 1
+            expected = next(self.expected, None)
+            if expected is None:
+                self.failure = f"Output has extra tokens. Unexpected token {self.token}: '{_excerpt(actual)}'"
+                return
+            if not self._equal(actual, expected):
+                self.failure = (f"Mismatch at token {self.token}: expected '{_excerpt(expected)}', "
+                                f"got '{_excerpt(actual)}'")
+                return
+
+    def _equal(self, actual: bytes, expected: bytes) -> bool:
+        if actual == expected:
+            return True
+        if self.comparison.mode != "float" or not (NUMBER.fullmatch(actual) and NUMBER.fullmatch(expected)):
+            return False
+        difference = abs(float(actual) - float(expected))
+        return (difference <= self.comparison.abs_eps
+                or difference <= self.comparison.rel_eps * abs(float(expected)))
+
+class UnorderedComparator(StreamComparator):
+    """
+    unordered mode. Each side is folded into a count and a sum of keyed
+    line hashes, which match when the lines are the same multiset. The key
+    is random per comparison, so output can't be crafted to collide.
+    """
+
+    def __init__(self, expected: Iterable[bytes], comparison: Comparison):
+        super().__init__(expected, comparison)
+        self.key = os.urandom(16)
+        self.expected = expected
+        self.splitter = _LineSplitter(strip=True)
+        self.count = 0
+        self.total = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        self._add(self.splitter.feed(chunk))
+        return True
+
+    def finish(self) -> Tuple[bool, str]:
+        self._add(self.splitter.flush())
+        count, total = self.count, self.total
+        self.count = self.total = 0
+        self._add(_units(self.expected, _LineSplitter(strip=True)))
+        if count != self.count:
+            self.failure = f"Expected {self.count} non-blank lines (in any order) but got {count}"
+        elif total != self.total:
+            self.failure = "Lines differ from the expected output (compared in any order)"
+        return self._result()
+
+    def _add(self, lines: Iterable[bytes]):
+        for line in lines:
+            if line:
+                digest = hashlib.blake2b(line, digest_size=8, key=self.key).digest()
+                self.count += 1
+                self.total = (self.total + int.from_bytes(digest, "little")) % (1 << 64)
+
+COMPARATORS = {
+    "exact": LineComparator,
+    "token": TokenComparator,
+    "float": TokenComparator,
+    "unordered": UnorderedComparator,
+}
+
+def create_comparator(expected: Iterable[bytes], comparison: Optional[Comparison] = None) -> StreamComparator:
+    """Comparator for one test, fed the program's output and pulling from expected"""
+    comparison = comparison or Comparison()
+    if comparison.mode not in COMPARATORS:
+        raise ValueError(f"Unknown comparison mode: {comparison.mode}")
+    return COMPARATORS[comparison.mode](expected, comparison)
+
+def compare_streams(actual: Iterable[bytes], expected: Iterable[bytes],
+                    comparison: Optional[Comparison] = None) -> Tuple[bool, str]:
+    """Compare two chunk streams, returns (passed, details)"""
+    comparator = create_comparator(expected, comparison)
+    for chunk in actual:
+        if not comparator.feed(chunk):
+            break
+    return comparator.finish()
@@ -0,0 +1,286 @@
+import asyncio
+import time
+import logging
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Callable
+from contextlib import asynccontextmanager
+
+from app.core.config import settings
+from app.services.judge_backend import JudgeBackend, JudgeBackendError, SANDBOX_DIR, SANDBOX_USER
+
+logger = logging.getLogger('codejudge')
+
+@dataclass
+class PoolConfig:
+    """Sizing for the pool of one image"""
+    min_size: int = 1
+    max_size: int = 4
+    max_uses: int = 20
+
+@dataclass
+class PooledContainer:
+    """A pre-started sandbox and its bookkeeping"""
+    sandbox: str  # backend sandbox id
+    image: str
+    uses: int = 0
+    created_at: float = field(default_factory=time.time)
+    memory_limit: str = settings.DOCKER_MEMORY_LIMIT  # current cgroup limit
+    cpuset: Optional[str] = None  # cores it is pinned to, if any
+
+class ContainerPool:
+    """Pool of warm, sandboxed containers for a single image, used from one event loop"""
+
+    def __init__(self, backend: JudgeBackend, image: str, config: PoolConfig,
+                 setup: Optional[Callable] = None, pinned: bool = False):
+        self.backend = backend
+        self.image = image
+        self.config = config
+        self.setup = setup  # coroutine called with each new sandbox before it joins the pool
+        self.pinned = pinned  # sandboxes get cores per run instead of a CPU quota
+        self.idle: List[PooledContainer] = []
+        self.in_use = 0
+        self.creating = 0
+        self.closed = False
+        self.cond = asyncio.Condition()
+        self.replenisher = asyncio.get_running_loop().create_task(self._replenish_loop())
+
+    @property
+    def size(self) -> int:
+        return len(self.idle) + self.in_use + self.creating
+
+    async def checkout(self, timeout: float = 30.0, cpuset: Optional[str] = None) -> PooledContainer:
+        """
+        Take a healthy container from the pool, starting one if needed.
+        Idle containers already pinned to cpuset go first, so a slot mostly
+        gets its own back and configure has nothing to change.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            async with self.cond:
+                if self.closed:
+                    raise RuntimeError(f"Container pool for {self.image} is closed")
+                if self.idle:
+                    pooled = self.idle.pop(self._idle_index(cpuset))
+                    self.in_use += 1
+                    self.cond.notify_all()  # wake the replenisher
+                elif self.size < self.config.max_size:
+                    self.creating += 1
+                    pooled = None
+                else:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No container available for {self.image}")
+                    try:
+                        await asyncio.wait_for(self.cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+            if pooled is None:
+                # Pool is empty but below max size, start one inline
+                try:
+                    pooled = await self._create()
+                finally:
+                    async with self.cond:
+                        self.creating -= 1
+                        if pooled is not None:
+                            self.in_use += 1
+                        self.cond.notify_all()
+                return pooled
+
+            if await self.backend.is_running(pooled.sandbox):
+                return pooled
+
+            # Container died while idle, throw it away and try again
+            async with self.cond:
+                self.in_use -= 1
+                self.cond.notify_all()
+            await self._destroy(pooled)
+
+    def _idle_index(self, cpuset: Optional[str]) -> int:
+        """Most recently used idle container on cpuset, else the most recently used one"""
+        for i in range(len(self.idle) - 1, -1, -1):
+            if self.idle[i].cpuset == cpuset:
+                return i
+        return -1
+
+    async def checkin(self, pooled: PooledContainer, discard: bool = False):
+        """Return a container after a run, scrubbing or recycling it"""
+        pooled.uses += 1
+        keep = (
+            not discard
+            and pooled.uses < self.config.max_uses
+            and await self._scrub(pooled)
+            and await self.configure(pooled, memory_limit=settings.DOCKER_MEMORY_LIMIT)
+        )
+        async with self.cond:
+            self.in_use -= 1
+            keep = keep and not self.closed and len(self.idle) < self.config.max_size
+            if keep:
+                self.idle.append(pooled)
+            self.cond.notify_all()
+
+        if not keep:
+            logger.info(f"Recycling container {pooled.sandbox[:12]} after {pooled.uses} use(s)")
+            await self._destroy(pooled)
+
+    async def configure(self, pooled: PooledContainer, memory_limit: Optional[str] = None,
+                        cpuset: Optional[str] = None) -> bool:
+        """Resize the memory cgroup and/or pin to cores, False if the backend refused"""
+        if memory_limit == pooled.memory_limit:
+            memory_limit = None
+        if cpuset == pooled.cpuset:
+            cpuset = None
+        if memory_limit is None and cpuset is None:
+            return True
+        try:
+            await self.backend.update_sandbox(pooled.sandbox, memory_limit=memory_limit, cpuset=cpuset)
+        except JudgeBackendError as e:
+            logger.warning(f"Error updating container {pooled.sandbox[:12]}: {str(e)}")
+            return False
+        pooled.memory_limit = memory_limit or pooled.memory_limit
+        pooled.cpuset = cpuset or pooled.cpuset
+        return True
+
+    @asynccontextmanager
+    async def lease(self, timeout: float = 30.0, cpuset: Optional[str] = None):
+        """Check out a container for the duration of an async with-block"""
+        pooled = await self.checkout(timeout, cpuset)
+        discard = False
+        try:
+            yield pooled
+        except Exception:
+            # Don't trust a container whose run blew up
+            discard = True
+            raise
+        finally:
+            await self.checkin(pooled, discard=discard)
+
+    async def shutdown(self):
+        """Stop the replenisher and remove all idle containers"""
+        async with self.cond:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.cond.notify_all()
+        self.replenisher.cancel()
+        await asyncio.gather(*(self._destroy(pooled) for pooled in idle))
+
+    async def _replenish_loop(self):
+        """Keep at least min_size containers warm in the background"""
+        while True:
+            async with self.cond:
+                while not self.closed and len(self.idle) + self.creating >= self.config.min_size:
+                    await self.cond.wait()
+                if self.closed:
+                    return
+                if self.size >= self.config.max_size:
+                    await self.cond.wait()
+                    continue
+                self.creating += 1
+
+            pooled = None
+            try:
+                pooled = await self._create()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Failed to start pooled container for {self.image}: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                async with self.cond:
+                    self.creating -= 1
+                    if pooled is not None and not self.closed:
+                        self.idle.append(pooled)
+                        pooled = None
+                    self.cond.notify_all()
+            if pooled is not None:
+                await self._destroy(pooled)
+
+    async def _create(self) -> PooledContainer:
+        """Create and start a sandbox, then run the setup hook on it"""
+        sandbox = await self.backend.create_sandbox(self.image, pinned=self.pinned)
+        try:
+            if self.setup:
+                await self.setup(sandbox)
+        except BaseException:
+            await self.backend.remove_sandbox(sandbox)
+            raise
+        logger.info(f"Started pooled container {sandbox[:12]} for {self.image}")
+        return PooledContainer(sandbox=sandbox, image=self.image)
+
+    async def _scrub(self, pooled: PooledContainer) -> bool:
+        """Wipe the sandbox and kill stray processes, False if that failed"""
+        try:
+            # kill -1 skips PID 1 and the calling shell, so the container survives
+            exit_code, _ = await self.backend.exec(
+                pooled.sandbox,
+                ["sh", "-c", f"kill -9 -1 2>/dev/null; rm -rf {SANDBOX_DIR}/* {SANDBOX_DIR}/.[!.]* 2>/dev/null; "
+                             f"[ -z \"$(ls -A {SANDBOX_DIR})\" ]"],
+                user=SANDBOX_USER
+            )
+            return exit_code == 0
+        except JudgeBackendError as e:
+            logger.warning(f"Error scrubbing container {pooled.sandbox[:12]}: {str(e)}")
+            return False
+
+    async def kill_processes(self, pooled: PooledContainer) -> bool:
+        """Kill whatever still runs in the sandbox but keep its files, False if that failed"""
+        try:
+            exit_code, _ = await self.backend.exec(pooled.sandbox, ["sh", "-c", "kill -9 -1 2>/dev/null; true"],
+                                                   user=SANDBOX_USER)
+            return exit_code == 0
+        except JudgeBackendError as e:
+            logger.warning(f"Error killing processes in container {pooled.sandbox[:12]}: {str(e)}")
+            return False
+
+    async def _destroy(self, pooled: PooledContainer):
+        try:
+            await self.backend.remove_sandbox(pooled.sandbox)
+        except Exception as e:
+            logger.warning(f"Error removing container {pooled.sandbox[:12]}: {str(e)}")
+
+class ContainerPoolManager:
+    """
+    Lazily creates one ContainerPool per image. With slots, no pool is
+    capped below that many containers: every slot judging on the image at
+    once needs one, and a capped pool would time the rest out.
+    """
+
+    def __init__(self, backend: JudgeBackend, configs: Optional[Dict[str, PoolConfig]] = None,
+                 setup: Optional[Callable] = None, pinned: bool = False, slots: int = 0):
+        self.backend = backend
+        self.configs = configs if configs is not None else _configs_from_settings()
+        self.setup = setup
+        self.pinned = pinned
+        self.slots = slots
+        self.pools: Dict[str, ContainerPool] = {}
+
+    def get(self, image: str) -> ContainerPool:
+        pool = self.pools.get(image)
+        if pool is None:
+            config = self.configs.get(image) or PoolConfig(
+                min_size=settings.DOCKER_POOL_MIN_SIZE,
+                max_size=settings.DOCKER_POOL_MAX_SIZE,
+                max_uses=settings.DOCKER_POOL_MAX_USES,
+            )
+            if config.max_size < self.slots:
+                config = replace(config, max_size=self.slots)
+            pool = ContainerPool(self.backend, image, config, setup=self.setup, pinned=self.pinned)
+            self.pools[image] = pool
+        return pool
+
+    async def shutdown(self):
+        pools, self.pools = list(self.pools.values()), {}
+        await asyncio.gather(*(pool.shutdown() for pool in pools))
+
+def _configs_from_settings() -> Dict[str, PoolConfig]:
+    """Build per-image pool configs from DOCKER_POOL_SIZES"""
+    configs = {}
+    for image, sizes in settings.DOCKER_POOL_SIZES.items():
+        configs[image] = PoolConfig(
+            min_size=sizes.get("min", settings.DOCKER_POOL_MIN_SIZE),
+            max_size=sizes.get("max", settings.DOCKER_POOL_MAX_SIZE),
+            max_uses=sizes.get("max_uses", settings.DOCKER_POOL_MAX_USES),
+        )
+    return configs
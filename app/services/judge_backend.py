@@ -0,0 +1,595 @@
+import io
+import os
+import re
+import uuid
+import errno
+import shutil
+import posixpath
+import shlex
+import signal
+import asyncio
+import logging
+import tarfile
+import resource
+import tempfile
+from contextlib import contextmanager, asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncContextManager, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.judge_scheduler import expand_cpuset
+
+logger = logging.getLogger('codejudge')
+
+# Sandbox layout shared by every backend: submission files are copied into a
+# private, writable /sandbox and everything runs as an unprivileged user.
+SANDBOX_DIR = "/sandbox"
+SANDBOX_USER = "1000:1000"
+# Read-only judge tooling (the runner) lives here
+JUDGE_DIR = "/judge"
+
+class JudgeBackendError(Exception):
+    """A sandbox runtime call failed"""
+
+class ExecSession:
+    """stdin and stdout of a command running in a sandbox"""
+
+    async def write(self, data):
+        """Send bytes (or any buffer) to the command's stdin"""
+        raise NotImplementedError
+
+    async def read(self) -> bytes:
+        """Next chunk of the command's stdout, b"" once it is closed"""
+        raise NotImplementedError
+
+class JudgeBackend:
+    """
+    What the judge needs from a sandbox runtime. Sandboxes are referred to by
+    opaque ids and every call is a coroutine, so a single event loop can drive
+    many sandboxes and exec sessions at once.
+    """
+    name = "base"
+
+    async def start(self):
+        """Open connections; called once before any other method"""
+
+    async def close(self):
+        """Release connections"""
+
+    async def image_id(self, image: str) -> str:
+        """Content id of an image, used in artifact cache keys"""
+        raise NotImplementedError
+
+    async def create_sandbox(self, image: str, pinned: bool = False) -> str:
+        """Create and start a sandbox; pinned ones get cores via update_sandbox instead of a CPU quota"""
+        raise NotImplementedError
+
+    async def remove_sandbox(self, sandbox: str):
+        raise NotImplementedError
+
+    async def is_running(self, sandbox: str) -> bool:
+        raise NotImplementedError
+
+    async def update_sandbox(self, sandbox: str, memory_limit: Optional[str] = None,
+                             cpuset: Optional[str] = None):
+        """Resize the sandbox's memory (no swap) and/or pin it to cores"""
+        raise NotImplementedError
+
+    async def put_archive(self, sandbox: str, path: str, data: bytes):
+        """Extract a tar archive at path inside the sandbox"""
+        raise NotImplementedError
+
+    async def get_archive(self, sandbox: str, path: str) -> bytes:
+        """Tar archive of path inside the sandbox"""
+        raise NotImplementedError
+
+    async def exec(self, sandbox: str, cmd: List[str], user: Optional[str] = None,
+                   environment: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        """Run cmd to completion, returns (exit code, stdout and stderr)"""
+        raise NotImplementedError
+
+    def attach(self, sandbox: str, cmd: List[str],
+               environment: Optional[Dict[str, str]] = None) -> AsyncContextManager[ExecSession]:
+        """
+        Start cmd with its stdin and stdout attached, as an async context
+        manager yielding an ExecSession. Leaving it detaches from the
+        command; the pool scrub kills whatever is left.
+        """
+        raise NotImplementedError
+
+def memory_bytes(limit: str) -> int:
+    """Parse a Docker style memory size ("128m", "1g", "65536") into bytes"""
+    match = re.fullmatch(r"(\d+)([bkmg]?)", limit.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid memory limit: {limit}")
+    return int(match.group(1)) * {"": 1, "b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}[match.group(2)]
+
+def _in_sandbox_dir(path: str) -> bool:
+    path = posixpath.normpath(path)
+    return path == SANDBOX_DIR or path.startswith(SANDBOX_DIR + "/")
+
+@contextmanager
+def _docker_errors():
+    import aiodocker
+    try:
+        yield
+    except aiodocker.DockerError as e:
+        raise JudgeBackendError(str(e)) from e
+
+class DockerBackend(JudgeBackend):
+    """
+    Docker over its HTTP API with aiodocker. One client session (and its
+    connection pool to the daemon socket) is shared by everything the judge
+    does, instead of a blocking request per call.
+    """
+    name = "docker"
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url
+        self.docker = None
+
+    async def start(self):
+        import aiodocker
+        self.docker = aiodocker.Docker(url=self.url)
+
+    async def close(self):
+        if self.docker is not None:
+            await self.docker.close()
+            self.docker = None
+
+    async def image_id(self, image: str) -> str:
+        with _docker_errors():
+            return (await self.docker.images.inspect(image))["Id"]
+
+    async def create_sandbox(self, image: str, pinned: bool = False) -> str:
+        memory = memory_bytes(settings.DOCKER_MEMORY_LIMIT)
+        host_config = {
+            "Tmpfs": {SANDBOX_DIR: "rw,exec,nosuid,size=64m,uid=1000,gid=1000,mode=0755"},
+            "NetworkMode": "none",
+            "Memory": memory,
+            "MemorySwap": memory,  # no swap, so memory overruns can't hide
+            "SecurityOpt": ["no-new-privileges"],
+            "PidsLimit": 100,
+            "CapDrop": ["ALL"],
+        }
+        if not pinned:
+            # Pinned sandboxes own their cores; unpinned ones share with a CPU quota
+            host_config["CpuQuota"] = 50000
+        with _docker_errors():
+            container = await self.docker.containers.create({
+                "Image": image,
+                "Cmd": ["/bin/sh"],
+                "Tty": True,  # Keeps /bin/sh alive so we can exec into it
+                "User": SANDBOX_USER,
+                "WorkingDir": SANDBOX_DIR,
+                "HostConfig": host_config,
+            })
+            try:
+                await container.start()
+            except Exception:
+                await container.delete(force=True)
+                raise
+            return container.id
+
+    async def remove_sandbox(self, sandbox: str):
+        with _docker_errors():
+            await self.docker.containers.container(sandbox).delete(force=True, v=True)
+
+    async def is_running(self, sandbox: str) -> bool:
+        try:
+            info = await self.docker.containers.container(sandbox).show()
+        except Exception:
+            return False
+        return bool(info.get("State", {}).get("Running"))
+
+    async def update_sandbox(self, sandbox: str, memory_limit: Optional[str] = None,
+                             cpuset: Optional[str] = None):
+        update = {}
+        if memory_limit is not None:
+            update["Memory"] = update["MemorySwap"] = memory_bytes(memory_limit)
+        if cpuset is not None:
+            update["CpusetCpus"] = cpuset
+        if not update:
+            return
+        # aiodocker has no wrapper for the update endpoint
+        with _docker_errors():
+            await self.docker._query_json(f"containers/{sandbox}/update", method="POST", data=update)
+
+    # Docker can't copy into or out of a tmpfs mount (the archive endpoints
+    # work on the container's filesystem layers), so /sandbox is staged with
+    # tar running inside the sandbox instead, over the exec's stdin and stdout
+
+    async def put_archive(self, sandbox: str, path: str, data: bytes):
+        if not _in_sandbox_dir(path):
+            with _docker_errors():
+                await self.docker.containers.container(sandbox).put_archive(path, data)
+            return
+        # head ends tar's stdin after the archive, the exec's own stdin can't be half-closed
+        exit_code, _, errors = await self._exec_piped(
+            sandbox, ["sh", "-c", f"head -c {len(data)} | tar -x -f - -C {shlex.quote(path)}"], data)
+        if exit_code != 0:
+            raise JudgeBackendError(f"Could not copy files into {path}: {errors.decode('utf-8', errors='replace')}")
+
+    async def get_archive(self, sandbox: str, path: str) -> bytes:
+        if not _in_sandbox_dir(path):
+            with _docker_errors():
+                archive = await self.docker.containers.container(sandbox).get_archive(path)
+            return archive.fileobj.getvalue()
+        # Laid out like the archive endpoint's: the path's last component at the top
+        exit_code, archive, errors = await self._exec_piped(
+            sandbox, ["tar", "-c", "-f", "-", "-C", posixpath.dirname(path), posixpath.basename(path)])
+        if exit_code != 0:
+            raise JudgeBackendError(f"Could not copy {path}: {errors.decode('utf-8', errors='replace')}")
+        return archive
+
+    async def _exec_piped(self, sandbox: str, cmd: List[str], data: Optional[bytes] = None) -> Tuple[int, bytes, bytes]:
+        """Run cmd with data on its stdin, returns (exit code, stdout, stderr)"""
+        stdout, stderr = bytearray(), bytearray()
+        with _docker_errors():
+            execution = await self.docker.containers.container(sandbox).exec(cmd, stdin=data is not None)
+            async with execution.start(detach=False) as stream:
+                if data is not None:
+                    await stream.write_in(data)
+                while True:
+                    message = await stream.read_out()
+                    if message is None:
+                        break
+                    (stdout if message.stream == 1 else stderr).extend(message.data)
+            exit_code = (await execution.inspect()).get("ExitCode")
+        return (exit_code if exit_code is not None else -1), bytes(stdout), bytes(stderr)
+
+    async def exec(self, sandbox: str, cmd: List[str], user: Optional[str] = None,
+                   environment: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        output = bytearray()
+        with _docker_errors():
+            execution = await self.docker.containers.container(sandbox).exec(
+                cmd, user=user or "", environment=environment
+            )
+            async with execution.start(detach=False) as stream:
+                while True:
+                    message = await stream.read_out()
+                    if message is None:
+                        break
+                    output += message.data
+            exit_code = (await execution.inspect()).get("ExitCode")
+        return (exit_code if exit_code is not None else -1), bytes(output)
+
+    @asynccontextmanager
+    async def attach(self, sandbox: str, cmd: List[str], environment: Optional[Dict[str, str]] = None):
+        with _docker_errors():
+            execution = await self.docker.containers.container(sandbox).exec(
+                cmd, stdin=True, environment=environment
+            )
+            stream = execution.start(detach=False)
+        async with stream:
+            yield DockerExecSession(stream)
+
+class DockerExecSession(ExecSession):
+    """An exec's hijacked connection: stdin written raw, output demultiplexed"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    async def write(self, data):
+        with _docker_errors():
+            await self.stream.write_in(data)
+
+    async def read(self) -> bytes:
+        with _docker_errors():
+            while True:
+                message = await self.stream.read_out()
+                if message is None:
+                    return b""
+                if message.stream == 1:
+                    return message.data
+
+# Syscalls submissions have no use for. The namespaces already deny most of
+# them; the filter keeps the kernel code behind them out of reach too.
+SECCOMP_DENYLIST = [
+    "ptrace", "process_vm_readv", "process_vm_writev", "mount", "umount2", "pivot_root",
+    "chroot", "unshare", "setns", "bpf", "perf_event_open", "userfaultfd", "keyctl",
+    "add_key", "request_key", "kexec_load", "kexec_file_load", "init_module",
+    "finit_module", "delete_module", "reboot", "swapon", "swapoff", "acct", "quotactl",
+    "open_by_handle_at", "name_to_handle_at", "io_uring_setup",
+]
+
+SANDBOX_PATH = "/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
+SANDBOX_FILE_LIMIT = 64 * 1024 * 1024  # largest file a program may write, as the Docker tmpfs
+SANDBOX_PIDS_LIMIT = 100
+
+# Top-level directories of a root filesystem that sandboxes see (read-only)
+ROOTFS_DIRS = ["usr", "bin", "sbin", "lib", "lib32", "lib64", "libx32", "etc", "opt"]
+
+def _seccomp_filter() -> Optional[bytes]:
+    """Compiled BPF program for SECCOMP_DENYLIST, None without the libseccomp bindings"""
+    try:
+        import seccomp
+    except ImportError:
+        logger.warning("libseccomp Python bindings not installed, bwrap sandboxes run without a seccomp filter")
+        return None
+    syscall_filter = seccomp.SyscallFilter(defaction=seccomp.ALLOW)
+    for syscall in SECCOMP_DENYLIST:
+        try:
+            syscall_filter.add_rule(seccomp.ERRNO(errno.EPERM), syscall)
+        except (RuntimeError, ValueError):
+            pass  # not a syscall on this architecture
+    with tempfile.TemporaryFile() as program:
+        syscall_filter.export_bpf(program)
+        program.seek(0)
+        return program.read()
+
+def _extract(data: bytes, destination: str):
+    """Unpack a tar archive without letting it write (or link) outside destination"""
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r") as tar:
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(destination, filter="data")
+            return
+        root = os.path.realpath(destination)
+        for member in tar.getmembers():
+            target = os.path.realpath(os.path.join(root, member.name))
+            if not (member.isfile() or member.isdir()) or os.path.commonpath([root, target]) != root:
+                raise tarfile.TarError(f"Refusing to extract {member.name}")
+            tar.extract(member, root)
+
+@dataclass
+class BwrapSandbox:
+    """Host side of a bubblewrap sandbox"""
+    path: str  # host directory holding the sandbox and judge directories
+    rootfs: str
+    memory_limit: str = settings.DOCKER_MEMORY_LIMIT
+    cpuset: Optional[str] = None
+    cgroup: Optional[str] = None  # its cgroup v2 directory, if memory is capped
+
+class BubblewrapBackend(JudgeBackend):
+    """
+    Daemonless sandboxes with bubblewrap. A sandbox is a host directory bound
+    at /sandbox (plus /judge, read-only); every exec runs in fresh user, pid,
+    network, ipc, uts and mount namespaces over a read-only root filesystem,
+    inside the sandbox's cgroup when one is configured and under a seccomp
+    filter when libseccomp is available. Starting one costs a fork and a few
+    mounts, with no daemon or overlayfs in the way.
+    """
+    name = "bwrap"
+
+    def __init__(self, bwrap: Optional[str] = None, root: Optional[str] = None,
+                 cgroup: Optional[str] = None):
+        self.bwrap = bwrap or settings.JUDGE_BWRAP_PATH
+        self.root = root or settings.JUDGE_BWRAP_ROOT
+        self.cgroup = settings.JUDGE_BWRAP_CGROUP if cgroup is None else cgroup
+        self.sandboxes: Dict[str, BwrapSandbox] = {}
+        self.seccomp_program: Optional[bytes] = None
+
+    async def start(self):
+        if shutil.which(self.bwrap) is None:
+            raise JudgeBackendError(f"bubblewrap not found: {self.bwrap}")
+        os.makedirs(self.root, mode=0o700, exist_ok=True)
+        self.seccomp_program = _seccomp_filter()
+        if not self.cgroup:
+            logger.warning("JUDGE_BWRAP_CGROUP not set, bwrap sandboxes have no memory or process cap")
+
+    async def close(self):
+        for sandbox in list(self.sandboxes):
+            await self.remove_sandbox(sandbox)
+
+    def _rootfs(self, image: str) -> str:
+        return settings.JUDGE_BWRAP_ROOTFS.get(image, "/")
+
+    async def image_id(self, image: str) -> str:
+        rootfs = self._rootfs(image)
+        # Installing or upgrading packages replaces files in usr/bin
+        try:
+            stamp = os.stat(os.path.join(rootfs, "usr", "bin")).st_mtime_ns
+        except OSError as e:
+            raise JudgeBackendError(f"No root filesystem for {image}: {str(e)}") from e
+        return f"bwrap:{rootfs}:{stamp}"
+
+    async def create_sandbox(self, image: str, pinned: bool = False) -> str:
+        # Unpinned sandboxes simply share the host's cores
+        sandbox = uuid.uuid4().hex
+        box = BwrapSandbox(path=os.path.join(self.root, sandbox), rootfs=self._rootfs(image))
+        try:
+            os.makedirs(box.path + SANDBOX_DIR, mode=0o755)
+            os.makedirs(box.path + JUDGE_DIR, mode=0o755)
+            if self.cgroup:
+                box.cgroup = os.path.join(self.cgroup, sandbox)
+                os.mkdir(box.cgroup)
+                self._write(box, "memory.max", str(memory_bytes(box.memory_limit)))
+                self._write(box, "memory.swap.max", "0")  # no swap, so memory overruns can't hide
+                self._write(box, "pids.max", str(SANDBOX_PIDS_LIMIT))
+        except OSError as e:
+            self._cleanup(box)
+            raise JudgeBackendError(f"Could not create sandbox: {str(e)}") from e
+        self.sandboxes[sandbox] = box
+        return sandbox
+
+    async def remove_sandbox(self, sandbox: str):
+        box = self.sandboxes.pop(sandbox, None)
+        if box is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._cleanup, box)
+
+    async def is_running(self, sandbox: str) -> bool:
+        box = self.sandboxes.get(sandbox)
+        return box is not None and os.path.isdir(box.path + SANDBOX_DIR)
+
+    async def update_sandbox(self, sandbox: str, memory_limit: Optional[str] = None,
+                             cpuset: Optional[str] = None):
+        box = self._sandbox(sandbox)
+        try:
+            if memory_limit is not None and box.cgroup:
+                self._write(box, "memory.max", str(memory_bytes(memory_limit)))
+            if cpuset is not None and box.cgroup and os.path.exists(os.path.join(box.cgroup, "cpuset.cpus")):
+                self._write(box, "cpuset.cpus", cpuset)
+        except OSError as e:
+            raise JudgeBackendError(f"Could not update sandbox {sandbox[:12]}: {str(e)}") from e
+        # Affinity is also set on every exec, which works without a cpuset controller
+        box.memory_limit = memory_limit or box.memory_limit
+        box.cpuset = cpuset or box.cpuset
+
+    async def put_archive(self, sandbox: str, path: str, data: bytes):
+        destination = self._host_path(sandbox, path)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, _extract, data, destination)
+        except (OSError, tarfile.TarError) as e:
+            raise JudgeBackendError(f"Could not copy files into {path}: {str(e)}") from e
+
+    async def get_archive(self, sandbox: str, path: str) -> bytes:
+        source = self._host_path(sandbox, path)
+
+        def archive():
+            buffer = io.BytesIO()
+            with tarfile.open(fileobj=buffer, mode="w") as tar:
+                tar.add(source, arcname=os.path.basename(source))  # links are stored, not followed
+            return buffer.getvalue()
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, archive)
+        except OSError as e:
+            raise JudgeBackendError(f"Could not copy {path} out of the sandbox: {str(e)}") from e
+
+    async def exec(self, sandbox: str, cmd: List[str], user: Optional[str] = None,
+                   environment: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        # Everything runs as the sandbox user, mapped onto the judge's own uid
+        process = await self._spawn(sandbox, cmd, environment, stdin=asyncio.subprocess.DEVNULL,
+                                    stderr=asyncio.subprocess.STDOUT)
+        try:
+            output, _ = await process.communicate()
+        finally:
+            await self._reap(process)
+        return process.returncode, output
+
+    @asynccontextmanager
+    async def attach(self, sandbox: str, cmd: List[str], environment: Optional[Dict[str, str]] = None):
+        process = await self._spawn(sandbox, cmd, environment, stdin=asyncio.subprocess.PIPE,
+                                    stderr=asyncio.subprocess.DEVNULL)
+        try:
+            yield ProcessExecSession(process)
+        finally:
+            await self._reap(process)
+
+    async def _spawn(self, sandbox: str, cmd: List[str], environment: Optional[Dict[str, str]], stdin, stderr):
+        box = self._sandbox(sandbox)
+        seccomp_fd = None
+        if self.seccomp_program is not None:
+            # bwrap reads the filter from an inherited fd
+            seccomp_fd = os.memfd_create("seccomp")
+            os.write(seccomp_fd, self.seccomp_program)
+            os.lseek(seccomp_fd, 0, os.SEEK_SET)
+        try:
+            return await asyncio.create_subprocess_exec(
+                *self._command(box, cmd, environment, seccomp_fd),
+                stdin=stdin, stdout=asyncio.subprocess.PIPE, stderr=stderr,
+                pass_fds=(seccomp_fd,) if seccomp_fd is not None else (),
+                preexec_fn=self._limits(box), start_new_session=True
+            )
+        except OSError as e:
+            raise JudgeBackendError(f"Could not start bwrap: {str(e)}") from e
+        finally:
+            if seccomp_fd is not None:
+                os.close(seccomp_fd)
+
+    def _command(self, box: BwrapSandbox, cmd: List[str], environment: Optional[Dict[str, str]],
+                 seccomp_fd: Optional[int]) -> List[str]:
+        uid, gid = SANDBOX_USER.split(":")
+        args = [self.bwrap, "--unshare-all", "--die-with-parent", "--new-session",
+                "--uid", uid, "--gid", gid, "--hostname", "sandbox"]
+        for directory in ROOTFS_DIRS:
+            source = os.path.join(box.rootfs, directory)
+            if os.path.islink(source):
+                args += ["--symlink", os.readlink(source), f"/{directory}"]  # merged /usr
+            elif os.path.isdir(source):
+                args += ["--ro-bind", source, f"/{directory}"]
+        args += ["--proc", "/proc", "--dev", "/dev", "--tmpfs", "/tmp",
+                 "--bind", box.path + SANDBOX_DIR, SANDBOX_DIR,
+                 "--ro-bind", box.path + JUDGE_DIR, JUDGE_DIR,
+                 "--chdir", SANDBOX_DIR, "--clearenv",
+                 "--setenv", "PATH", SANDBOX_PATH, "--setenv", "HOME", SANDBOX_DIR]
+        for key, value in (environment or {}).items():
+            args += ["--setenv", key, value]
+        if seccomp_fd is not None:
+            args += ["--seccomp", str(seccomp_fd)]
+        return args + ["--"] + cmd
+
+    def _limits(self, box: BwrapSandbox):
+        """preexec_fn for bwrap: join the cgroup and pin before anything runs"""
+        procs = os.path.join(box.cgroup, "cgroup.procs") if box.cgroup else None
+        cpus = expand_cpuset(box.cpuset) if box.cpuset else None
+
+        def apply():
+            if procs:
+                with open(procs, "w") as f:
+                    f.write(str(os.getpid()))
+            if cpus:
+                os.sched_setaffinity(0, cpus)
+            resource.setrlimit(resource.RLIMIT_FSIZE, (SANDBOX_FILE_LIMIT, SANDBOX_FILE_LIMIT))
+        return apply
+
+    async def _reap(self, process):
+        # --die-with-parent takes the whole sandbox down with bwrap. Signal the
+        # pid directly: process.kill() polls first, and reaping a bwrap that
+        # just exited there races asyncio's child watcher.
+        if process.returncode is None:
+            try:
+                os.kill(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        await process.wait()
+
+    def _sandbox(self, sandbox: str) -> BwrapSandbox:
+        box = self.sandboxes.get(sandbox)
+        if box is None:
+            raise JudgeBackendError(f"No such sandbox: {sandbox[:12]}")
+        return box
+
+    def _host_path(self, sandbox: str, path: str) -> str:
+        """Host location of a path inside the sandbox; only / and the bound directories map"""
+        box = self._sandbox(sandbox)
+        path = os.path.normpath(path)
+        if path == "/":
+            return box.path
+        for mount in (SANDBOX_DIR, JUDGE_DIR):
+            if path == mount or path.startswith(mount + "/"):
+                return box.path + path
+        raise JudgeBackendError(f"{path} is outside the sandbox")
+
+    def _write(self, box: BwrapSandbox, name: str, value: str):
+        with open(os.path.join(box.cgroup, name), "w") as f:
+            f.write(value)
+
+    def _cleanup(self, box: BwrapSandbox):
+        if box.cgroup and os.path.isdir(box.cgroup):
+            try:
+                if os.path.exists(os.path.join(box.cgroup, "cgroup.kill")):
+                    self._write(box, "cgroup.kill", "1")
+                os.rmdir(box.cgroup)
+            except OSError as e:
+                logger.warning(f"Error removing cgroup {box.cgroup}: {str(e)}")
+        shutil.rmtree(box.path, ignore_errors=True)
+
+class ProcessExecSession(ExecSession):
+    """Pipes of a local bwrap process"""
+
+    def __init__(self, process):
+        self.process = process
+
+    async def write(self, data):
+        try:
+            self.process.stdin.write(data)
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise JudgeBackendError(f"Sandboxed command went away: {str(e)}") from e
+
+    async def read(self) -> bytes:
+        return await self.process.stdout.read(65536)
+
+# Backends by JUDGE_BACKEND / JUDGE_LANGUAGE_BACKENDS name
+BACKENDS = {
+    "docker": DockerBackend,
+    "bwrap": BubblewrapBackend,
+}
+
+def create_backend(name: Optional[str] = None) -> JudgeBackend:
+    """Instantiate the configured sandbox backend"""
+    name = name or settings.JUDGE_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown judge backend: {name}")
+    return BACKENDS[name]()
@@ -0,0 +1,268 @@
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger('codejudge')
+
+# Judge metrics in the Prometheus text format, without a client library.
+# Judging mostly happens in worker processes, so each process keeps its own
+# registry and writes a snapshot of it to JUDGE_METRICS_DIR (after every
+# judged submission and every JUDGE_METRICS_FLUSH_INTERVAL seconds); the
+# app's /metrics sums its own registry with those snapshots. Counters and
+# histograms of exited workers still count, their gauges don't.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from a cached compile or one test up to a slow queue
+PHASE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes the labels {', '.join(self.labels) or 'none'}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            samples = [[list(key), value] for key, value in self.values.items()]
+        return {"kind": self.kind, "help": self.documentation, "labels": list(self.labels), "samples": samples}
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = PHASE_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                # Per-bucket (not cumulative) counts, the last one is +Inf
+                state = self.values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            state["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            state["sum"] += value
+
+    def snapshot(self) -> dict:
+        snapshot = super().snapshot()
+        snapshot["buckets"] = list(self.buckets)
+        with self.lock:
+            snapshot["samples"] = [[labels, {"counts": list(state["counts"]), "sum": state["sum"]}]
+                                   for labels, state in snapshot["samples"]]
+        return snapshot
+
+class MetricsRegistry:
+    """The metrics of one process, plus collectors run before each snapshot to refresh gauges"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        self.collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], None]):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def snapshot(self) -> dict:
+        for collector in list(self.collectors):
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {str(e)}")
+        return {"pid": os.getpid(), "metrics": {name: metric.snapshot() for name, metric in self.metrics.items()}}
+
+    def flush(self, directory: Optional[str] = None):
+        """Write this process's snapshot for the app's /metrics to pick up"""
+        directory = directory or settings.JUDGE_METRICS_DIR
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{os.getpid()}.json")
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write judge metrics: {str(e)}")
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def load_snapshots(directory: Optional[str] = None) -> List[dict]:
+    """Snapshots flushed by other processes"""
+    directory = directory or settings.JUDGE_METRICS_DIR
+    snapshots = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return snapshots
+    for name in names:
+        if not name.endswith(".json") or name == f"{os.getpid()}.json":
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # being replaced, or left half-written by a crash
+    return snapshots
+
+def clear_snapshots(directory: Optional[str] = None):
+    """Drop snapshots of earlier runs, so counters start from zero with the app"""
+    directory = directory or settings.JUDGE_METRICS_DIR
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+def merge_snapshots(snapshots: Iterable[dict]) -> Dict[str, dict]:
+    """Sum the samples of several processes' snapshots, metric by metric"""
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        alive = _alive(snapshot.get("pid", 0))
+        for name, metric in snapshot["metrics"].items():
+            if metric["kind"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                if metric["kind"] == "histogram":
+                    if metric["buckets"] != target["buckets"]:
+                        continue  # a process running other code, can't be summed
+                    state = target["samples"].setdefault(key, {"counts": [0] * len(value["counts"]), "sum": 0.0})
+                    state["counts"] = [a + b for a, b in zip(state["counts"], value["counts"])]
+                    state["sum"] += value["sum"]
+                else:
+                    target["samples"][key] = target["samples"].get(key, 0.0) + value
+    return merged
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def render(merged: Dict[str, dict]) -> str:
+    """Merged metrics in the Prometheus text exposition format"""
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for key in sorted(metric["samples"]):
+            value = metric["samples"][key]
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_labels(metric['labels'], key)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric["buckets"]) + [math.inf], value["counts"]):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{name}_bucket{_labels(metric['labels'], key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric['labels'], key)} {_number(value['sum'])}")
+            lines.append(f"{name}_count{_labels(metric['labels'], key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+def export_metrics() -> str:
+    """This process's metrics summed with the snapshots of the judge worker processes"""
+    return render(merge_snapshots([metrics.snapshot()] + load_snapshots()))
+
+metrics = MetricsRegistry()
+
+# Seconds spent per phase: queue_wait, checkout (container acquire), staging
+# (copying files in), compile, test_run and compare (per test), cleanup, and
+# total (claim to verdict)
+JUDGE_PHASE_SECONDS = metrics.register(Histogram(
+    "judge_phase_seconds", "Time spent in each phase of judging a submission", ["phase"]))
+SUBMISSIONS_JUDGED = metrics.register(Counter(
+    "judge_submissions_total", "Submissions judged, by language and verdict", ["language", "verdict"]))
+TESTS_JUDGED = metrics.register(Counter(
+    "judge_tests_total", "Tests judged, by language and verdict", ["language", "verdict"]))
+CACHE_LOOKUPS = metrics.register(Counter(
+    "judge_cache_lookups_total", "Cache lookups by cache (artifact, test_data, result, problem) and result (hit, miss)",
+    ["cache", "result"]))
+POOL_CONTAINERS = metrics.register(Gauge(
+    "judge_pool_containers", "Pooled sandboxes by backend, image and state (idle, busy, starting)",
+    ["backend", "image", "state"]))
+QUEUE_DEPTH = metrics.register(Gauge(
+    "judge_queue_depth", "Submissions waiting to be judged, by priority", ["priority"]))
+JOBS_RUNNING = metrics.register(Gauge(
+    "judge_jobs_running", "Submissions being judged"))
+
+def observe_judged(language: str, verdict: str, result: dict, queue_wait: Optional[float] = None,
+                   total: Optional[float] = None):
+    """Record a judged submission's verdict and the time it spent in each phase"""
+    SUBMISSIONS_JUDGED.inc(language=language, verdict=verdict)
+    if queue_wait is not None:
+        JUDGE_PHASE_SECONDS.observe(queue_wait, phase="queue_wait")
+    if total is not None:
+        JUDGE_PHASE_SECONDS.observe(total, phase="total")
+    for phase in ("checkout", "staging", "compile", "cleanup"):
+        if phase in (result.get("timings") or {}):
+            JUDGE_PHASE_SECONDS.observe(result["timings"][phase], phase=phase)
+    for test_result in result.get("test_results") or []:
+        TESTS_JUDGED.inc(language=language, verdict=test_result["verdict"])
+        JUDGE_PHASE_SECONDS.observe(test_result["wall_time"], phase="test_run")
+        JUDGE_PHASE_SECONDS.observe(test_result.get("compare_time", 0.0), phase="compare")
+
+def observe_queue(stats: dict):
+    """Queue gauges from judge_queue.queue_stats"""
+    for priority, depth in stats["queued_by_priority"].items():
+        QUEUE_DEPTH.set(depth, priority=priority)
+    JOBS_RUNNING.set(stats["running"])
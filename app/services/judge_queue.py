@@ -0,0 +1,249 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import (
+    Problem, Submission, TestResult,
+    SUBMISSION_QUEUED, SUBMISSION_RUNNING,
+    PRIORITY_RUN, PRIORITY_CONTEST, PRIORITY_PRACTICE, PRIORITY_NAMES,
+)
+
+logger = logging.getLogger('codejudge')
+
+# The Submission table doubles as the job queue: endpoints insert a row in
+# the Queued state and judge workers claim rows with SELECT ... FOR UPDATE
+# SKIP LOCKED, so any number of worker processes can pull concurrently.
+# Rows are claimed by priority (sample runs, then contest, then practice
+# submissions) and oldest first within a priority.
+
+def job_priority(is_run: bool = False, contest: bool = False) -> int:
+    if is_run:
+        return PRIORITY_RUN
+    return PRIORITY_CONTEST if contest else PRIORITY_PRACTICE
+
+def enqueue_submission(db: Session, problem_id: int, language: str, code: str,
+                       user_id: Optional[int] = None, is_run: bool = False,
+                       contest: bool = False, result_key: Optional[str] = None) -> Submission:
+    """Create a queued submission for the judge workers to pick up"""
+    submission = Submission(
+        user_id=user_id,
+        problem_id=problem_id,
+        language=language,
+        code=code,
+        status=SUBMISSION_QUEUED,
+        is_run=is_run,
+        priority=job_priority(is_run, contest),
+        result_key=result_key,
+    )
+    db.add(submission)
+    db.commit()
+    db.refresh(submission)
+    return submission
+
+# Judged results are reused for identical submissions: result_key hashes
+# everything a verdict depends on, so a change to the problem's tests (its
+# test_version), limits, comparison or checker, or to JUDGE_VERSION, gives
+# new keys and old results simply stop matching. The source is hashed as
+# submitted apart from CRLF line endings: any other edit, even whitespace,
+# can change what the program does.
+def result_key(problem: Problem, language: str, code: str) -> str:
+    """Hash of the source and the judging setup of its problem"""
+    digest = hashlib.sha256()
+    for part in (settings.JUDGE_VERSION, problem.id, problem.test_version, problem.time_limit_ms,
+                 problem.memory_limit_mb, problem.comparison_mode, problem.float_abs_eps, problem.float_rel_eps,
+                 problem.checker_language, problem.checker_source, language, code.replace('\r\n', '\n')):
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+# Verdicts that depend on host load rather than on the code alone: a result
+# with any of them, for the submission or one of its tests, is never reused,
+# so resubmitting after a noisy run gets judged again
+TIMING_VERDICTS = ("Time Limit Exceeded", "Memory Limit Exceeded")
+
+def find_judged_submission(db: Session, result_key: str, is_run: bool = False) -> Optional[Submission]:
+    """Latest reusable submission judged with this result key, None if there is none (or the cache is off)"""
+    if not settings.JUDGE_RESULT_CACHE:
+        return None
+    return (
+        db.query(Submission)
+        .filter(Submission.result_key == result_key, Submission.is_run == is_run,
+                Submission.finished_at.isnot(None),
+                Submission.status.notin_(("Judge Error",) + TIMING_VERDICTS),
+                *[Submission.result.notlike(f'%"{verdict}"%') for verdict in TIMING_VERDICTS])
+        .order_by(Submission.id.desc())
+        .first()
+    )
+
+def reuse_judged_submission(db: Session, judged: Submission, code: str, user_id: Optional[int] = None,
+                            contest: bool = False) -> Submission:
+    """Create a finished submission carrying the verdict and test results of an identical judged one"""
+    now = datetime.utcnow()
+    submission = Submission(
+        user_id=user_id,
+        problem_id=judged.problem_id,
+        language=judged.language,
+        code=code,
+        status=judged.status,
+        is_run=judged.is_run,
+        priority=job_priority(judged.is_run, contest),
+        execution_time=judged.execution_time,
+        memory_used=judged.memory_used,
+        score=judged.score,
+        result=judged.result,
+        result_key=judged.result_key,
+        cached_from=judged.cached_from or judged.id,
+        submitted_at=now,
+        started_at=now,
+        finished_at=now,
+    )
+    db.add(submission)
+    db.flush()
+    for row in db.query(TestResult).filter(TestResult.submission_id == judged.id).order_by(TestResult.test_number):
+        db.add(TestResult(
+            submission_id=submission.id,
+            test_case_id=row.test_case_id,
+            test_number=row.test_number,
+            status=row.status,
+            execution_time=row.execution_time,
+            memory_used=row.memory_used,
+            output=row.output
+        ))
+    db.commit()
+    db.refresh(submission)
+    logger.info(f"Submission {submission.id} reused the result of submission {submission.cached_from}")
+    return submission
+
+def queue_is_full(db: Session) -> bool:
+    """Admission control: True once JUDGE_MAX_QUEUE_DEPTH jobs are waiting"""
+    if settings.JUDGE_MAX_QUEUE_DEPTH <= 0:
+        return False
+    depth = db.query(func.count(Submission.id)).filter(Submission.status == SUBMISSION_QUEUED).scalar()
+    return depth >= settings.JUDGE_MAX_QUEUE_DEPTH
+
+def claim_next_job(db: Session) -> Optional[Submission]:
+    """Claim the most urgent queued submission, or None if the queue is empty"""
+    job = (
+        db.query(Submission)
+        .filter(Submission.status == SUBMISSION_QUEUED)
+        .order_by(Submission.priority, Submission.submitted_at, Submission.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is None:
+        db.rollback()
+        return None
+
+    # The status guard keeps the claim atomic on backends without SKIP LOCKED (SQLite)
+    claimed = (
+        db.query(Submission)
+        .filter(Submission.id == job.id, Submission.status == SUBMISSION_QUEUED)
+        .update({"status": SUBMISSION_RUNNING, "started_at": datetime.utcnow()},
+                synchronize_session=False)
+    )
+    db.commit()
+    if not claimed:
+        return None
+    db.refresh(job)
+    return job
+
+def verdict_for(result: dict) -> str:
+    """Map an execute_code result to the stored submission status"""
+    if result.get("status") == "compilation_error":
+        return "Compilation Error"
+    if result.get("status") == "error" or result.get("error"):
+        return "Judge Error"
+    if result.get("verdict"):
+        return result["verdict"]  # Accepted, Wrong Answer, Time Limit Exceeded, ...
+    return "Accepted" if result.get("all_passed", False) else "Failed"
+
+def record_test_result(db: Session, submission: Submission, test_result: dict, test_case_id: Optional[int]):
+    """Persist one test's result as soon as it is judged so it can be streamed"""
+    db.add(TestResult(
+        submission_id=submission.id,
+        test_case_id=test_case_id,
+        test_number=test_result.get("test_case"),
+        status="Passed" if test_result.get("passed") else test_result.get("verdict", "Failed"),
+        execution_time=test_result.get("execution_time"),
+        memory_used=test_result.get("memory_used"),
+        output=test_result.get("actual_output")
+    ))
+    db.commit()
+
+def finish_job(db: Session, submission: Submission, result: dict):
+    """Store the final verdict of a judged submission"""
+    submission.status = verdict_for(result)
+    submission.result = json.dumps(result)
+    submission.execution_time = result.get("execution_time")
+    submission.memory_used = result.get("memory_used")
+    submission.score = result.get("score")
+    submission.finished_at = datetime.utcnow()
+    db.commit()
+
+def fail_job(db: Session, submission_id: int, error: str):
+    """Mark a submission whose judging crashed"""
+    db.query(Submission).filter(Submission.id == submission_id).update({
+        "status": "Judge Error",
+        "result": json.dumps({"status": "error", "output": error}),
+        "finished_at": datetime.utcnow(),
+    }, synchronize_session=False)
+    db.commit()
+
+def requeue_stale_jobs(db: Session, timeout_seconds: int) -> int:
+    """Put back jobs whose worker died mid-run"""
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout_seconds)
+    stale_ids = [row.id for row in db.query(Submission.id).filter(
+        Submission.status == SUBMISSION_RUNNING, Submission.started_at < cutoff
+    )]
+    if not stale_ids:
+        return 0
+    # Drop partial per-test results, the job is judged again from scratch
+    db.query(TestResult).filter(TestResult.submission_id.in_(stale_ids)).delete(synchronize_session=False)
+    count = (
+        db.query(Submission)
+        .filter(Submission.id.in_(stale_ids), Submission.status == SUBMISSION_RUNNING)
+        .update({"status": SUBMISSION_QUEUED, "started_at": None}, synchronize_session=False)
+    )
+    db.commit()
+    if count:
+        logger.warning(f"Requeued {count} stale judge job(s)")
+    return count
+
+def queue_stats(db: Session, window_seconds: int = 300) -> dict:
+    """Queue depth per priority, jobs in flight and recent queue wait times"""
+    now = datetime.utcnow()
+    depth = dict(
+        db.query(Submission.priority, func.count(Submission.id))
+        .filter(Submission.status == SUBMISSION_QUEUED)
+        .group_by(Submission.priority)
+        .all()
+    )
+    running = db.query(func.count(Submission.id)).filter(Submission.status == SUBMISSION_RUNNING).scalar()
+    oldest = db.query(func.min(Submission.submitted_at)).filter(Submission.status == SUBMISSION_QUEUED).scalar()
+    started = db.query(Submission.submitted_at, Submission.started_at).filter(
+        Submission.started_at >= now - timedelta(seconds=window_seconds)
+    ).all()
+    waits = sorted((started_at - submitted_at).total_seconds() for submitted_at, started_at in started)
+
+    def percentile(p):
+        return round(waits[min(int(len(waits) * p), len(waits) - 1)], 3) if waits else None
+
+    return {
+        "queued": sum(depth.values()),
+        "queued_by_priority": {name: depth.get(priority, 0) for priority, name in PRIORITY_NAMES.items()},
+        "running": running,
+        "oldest_queued_seconds": round((now - oldest).total_seconds(), 3) if oldest else None,
+        "wait_seconds": {
+            "window": window_seconds,
+            "count": len(waits),
+            "avg": round(sum(waits) / len(waits), 3) if waits else None,
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+        },
+    }
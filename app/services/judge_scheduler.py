@@ -0,0 +1,74 @@
+import os
+import logging
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger('codejudge')
+
+# Admission control for the judge: the number of worker processes (and so of
+# runs in flight) is derived from what the host can actually give them, and
+# each worker's sandboxes are pinned to their own cores. Everything beyond
+# that waits in the submission queue, ordered by priority.
+
+def host_resources() -> Tuple[List[int], int]:
+    """CPUs this process may run on and total physical memory in MB"""
+    try:
+        cpus = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = list(range(os.cpu_count() or 1))
+    try:
+        memory_mb = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        memory_mb = 0  # unknown, don't cap on memory
+    return cpus, memory_mb
+
+def expand_cpuset(cpuset: str) -> List[int]:
+    """Expand a cpuset string ("2", "2,3", "4-7") into core numbers"""
+    cpus = []
+    for part in cpuset.split(","):
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+def test_lanes(cpuset: Optional[str], test_count: int) -> List[Optional[str]]:
+    """
+    Cpusets of the sandboxes one submission's tests fan out over, up to
+    JUDGE_PARALLEL_TESTS of them. A pinned slot gives each its own core, so
+    parallel tests never share one; a single lane keeps the whole slot.
+    """
+    lanes = max(min(settings.JUDGE_PARALLEL_TESTS, test_count), 1)
+    if not cpuset or lanes == 1:
+        return [cpuset] * lanes
+    cpus = expand_cpuset(cpuset)
+    if len(cpus) == 1:
+        return [cpuset]
+    return [str(cpu) for cpu in cpus[:lanes]]
+
+def plan_slots(max_workers: int, cpus: Optional[List[int]] = None,
+               memory_mb: Optional[int] = None) -> List[Optional[str]]:
+    """
+    Split the host into at most max_workers judge slots.
+    Returns one cpuset string (e.g. "2" or "2,3") per slot, or None for a
+    slot that isn't pinned (pinning off, or too few cores to dedicate).
+    """
+    if max_workers <= 0:
+        return []
+    host_cpus, host_memory_mb = host_resources()
+    cpus = host_cpus if cpus is None else cpus
+    memory_mb = host_memory_mb if memory_mb is None else memory_mb
+
+    per_slot = max(settings.JUDGE_CPUS_PER_SLOT, 1)
+    usable = cpus[settings.JUDGE_RESERVED_CPUS:]
+    count = len(usable) // per_slot
+    if memory_mb:
+        count = min(count, (memory_mb - settings.JUDGE_RESERVED_MEMORY_MB) // settings.JUDGE_MEMORY_PER_SLOT_MB)
+    count = min(count, max_workers)
+
+    if count <= 0:
+        # Small host: judge one at a time and share the cores
+        logger.warning("Not enough cores or memory for a dedicated judge slot, running one unpinned worker")
+        return [None]
+    if not settings.JUDGE_PIN_CPUS:
+        return [None] * count
+    return [",".join(str(cpu) for cpu in usable[i * per_slot:(i + 1) * per_slot]) for i in range(count)]
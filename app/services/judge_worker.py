@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import fcntl
+import json
+import logging
+import multiprocessing
+import os
+import time
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.models import Problem, Submission, Subtask
+from app.services.judge_queue import (
+    claim_next_job, record_test_result, finish_job, fail_job, requeue_stale_jobs, result_key,
+)
+from app.services.judge_scheduler import plan_slots
+from app.services.comparator import comparison_for
+from app.services.checker import checker_for
+from app.services.test_data import open_cached_tests, test_data_cache
+from app.services.judge_metrics import clear_snapshots, metrics, observe_judged
+
+logger = logging.getLogger('codejudge')
+
+# Judging runs on an event loop: each scheduler slot is a task that claims a
+# job and judges it, and all slots of a process share one CodeExecutor (one
+# connection pool to the sandbox backend). Database calls are blocking, so
+# they go to the loop's thread pool.
+
+def load_job(db, submission: Submission):
+    """Problem of a claimed submission, its cached tests (directory, manifest) and subtask points"""
+    problem = db.query(Problem).filter(Problem.id == submission.problem_id).first()
+    if problem is None:
+        return None, None, [], {}
+    # Only read from the database when the problem's tests changed
+    directory, manifest = test_data_cache.tests(db, problem)
+    # Keyed by what is actually judged, the problem may have changed since it was queued
+    submission.result_key = result_key(problem, submission.language, submission.code)
+    subtasks = {subtask.number: subtask.points
+                for subtask in db.query(Subtask).filter(Subtask.problem_id == problem.id)}
+    return problem, directory, manifest, subtasks
+
+async def judge_submission(db, submission: Submission, executor, cpuset: Optional[str] = None):
+    """Run a claimed submission against its problem's test cases and store the verdict"""
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    problem, directory, manifest, subtasks = await loop.run_in_executor(None, load_job, db, submission)
+
+    # Tests are mapped from the judge host's test cache and streamed to the
+    # runner one by one; runs get the samples only
+    with open_cached_tests(directory, manifest, samples_only=submission.is_run) as tests:
+        if not tests:
+            await loop.run_in_executor(None, fail_job, db, submission.id, "No test cases found for this problem")
+            return
+
+        async def on_test_result(test_result):
+            # Written per test so /judge/{id}/events can stream progress
+            test_case_id = tests[test_result["test_case"] - 1]["id"]
+            await loop.run_in_executor(None, record_test_result, db, submission, test_result, test_case_id)
+
+        result = await executor.execute(
+            language=submission.language,
+            source_code=submission.code,
+            test_cases=tests,
+            # Runs show every sample result, submissions stop each subtask (or
+            # the whole run) at its first failure and are scored
+            early_termination=not submission.is_run,
+            subtasks=None if submission.is_run else subtasks,
+            on_test_result=on_test_result,
+            time_limit_ms=problem.time_limit_ms,
+            memory_limit_mb=problem.memory_limit_mb,
+            comparison=comparison_for(problem),
+            checker=checker_for(problem),
+            cpuset=cpuset
+        )
+    await loop.run_in_executor(None, finish_job, db, submission, result)
+
+    queue_wait = None
+    if submission.started_at and submission.submitted_at:
+        queue_wait = (submission.started_at - submission.submitted_at).total_seconds()
+    observe_judged(submission.language, submission.status, result, queue_wait=queue_wait,
+                   total=time.monotonic() - started)
+    await loop.run_in_executor(None, metrics.flush)
+    logger.info(f"Judged submission {submission.id}: {submission.status}, "
+                f"phases {json.dumps({'queue_wait': queue_wait, **(result.get('timings') or {})})}")
+
+def abandon_job(db, submission_id: int, error: str):
+    db.rollback()
+    fail_job(db, submission_id, error)
+
+async def judge_slot(slot_id: int, cpuset: Optional[str], executor, stop_event=None):
+    """One scheduler slot: claim a queued submission, judge it, repeat"""
+    loop = asyncio.get_running_loop()
+    logger.info(f"Judge slot {slot_id} started" + (f" on CPUs {cpuset}" if cpuset else ""))
+    while stop_event is None or not stop_event.is_set():
+        db = SessionLocal()
+        try:
+            job = await loop.run_in_executor(None, claim_next_job, db)
+            if job is None:
+                await asyncio.sleep(settings.JUDGE_POLL_INTERVAL)
+                continue
+            try:
+                await judge_submission(db, job, executor, cpuset)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Judge slot {slot_id} failed on submission {job.id}: {str(e)}")
+                await loop.run_in_executor(None, abandon_job, db, job.id, str(e))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Database hiccup, back off instead of spinning
+            logger.error(f"Judge slot {slot_id} error: {str(e)}")
+            await asyncio.sleep(1)
+        finally:
+            db.close()
+    logger.info(f"Judge slot {slot_id} stopped")
+
+async def run_judge(slots: List[Tuple[int, Optional[str]]], stop_event=None):
+    """Judge on the current event loop with one task per (slot id, cpuset)"""
+    # Imported here so only judging processes load the sandbox backend
+    from app.services.code_execution import CodeExecutor
+
+    # Sandboxes go without a CPU quota only if every slot has cores of its own
+    executor = CodeExecutor(pinned=all(cpuset is not None for _, cpuset in slots), slots=len(slots))
+    await executor.start()
+    loop = asyncio.get_running_loop()
+    background = [loop.create_task(flush_metrics()), loop.create_task(sweep_stale_jobs())]
+    try:
+        await asyncio.gather(*(judge_slot(slot_id, cpuset, executor, stop_event) for slot_id, cpuset in slots))
+    finally:
+        for task in background:
+            task.cancel()
+        await executor.close()
+
+async def flush_metrics():
+    """Keep this process's metrics snapshot (pool gauges included) fresh for /metrics"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(settings.JUDGE_METRICS_FLUSH_INTERVAL)
+        await loop.run_in_executor(None, metrics.flush)
+
+def requeue_stale(timeout_seconds: int) -> int:
+    db = SessionLocal()
+    try:
+        return requeue_stale_jobs(db, timeout_seconds)
+    finally:
+        db.close()
+
+async def sweep_stale_jobs():
+    """
+    Requeue jobs left Running by a worker that died mid-run, at startup and
+    then every JUDGE_JOB_TIMEOUT, so they don't wait for a restart
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, requeue_stale, settings.JUDGE_JOB_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Stale job sweep failed: {str(e)}")
+        await asyncio.sleep(settings.JUDGE_JOB_TIMEOUT)
+
+def acquire_judge_lock(path: str = None):
+    """
+    Open and lock JUDGE_LOCK_FILE, None if another process on this host
+    already judges. The lock lasts as long as the returned file stays open
+    (or the process lives).
+    """
+    path = path or settings.JUDGE_LOCK_FILE
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    lock_file = open(path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+def worker_main(worker_id: int, stop_event=None, slots: List[Tuple[int, Optional[str]]] = ()):
+    """Entry point of a judge worker process"""
+    # Spawned processes start with logging unconfigured
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.info(f"Judge worker {worker_id} started with {len(slots)} slot(s)")
+    asyncio.run(run_judge(list(slots), stop_event))
+    logger.info(f"Judge worker {worker_id} stopped")
+
+class JudgeWorkerPool:
+    """
+    Starts and stops judging alongside the app: JUDGE_PROCESSES worker
+    processes sharing the scheduler's slots, or, with JUDGE_PROCESSES=0,
+    tasks on the app's own event loop. Of several app processes on a host,
+    only the first to take JUDGE_LOCK_FILE judges.
+    """
+
+    def __init__(self, count: int = None, processes: int = None):
+        # One slot per dedicated core set, at most JUDGE_WORKERS of them
+        self.slots = plan_slots(settings.JUDGE_WORKERS if count is None else count)
+        self.count = len(self.slots)
+        processes = settings.JUDGE_PROCESSES if processes is None else processes
+        self.process_count = min(processes, self.count)
+        self.context = multiprocessing.get_context("spawn")
+        self.stop_event = self.context.Event()
+        self.processes: List[multiprocessing.Process] = []
+        self.inline_stop: Optional[asyncio.Event] = None
+        self.inline_task: Optional[asyncio.Task] = None
+        self.lock_file = None
+
+    async def start(self):
+        if self.count <= 0:
+            return
+        self.lock_file = acquire_judge_lock()
+        if self.lock_file is None:
+            logger.info("Another process on this host is judging, this one only serves the API")
+            return
+        # Metrics restart from zero with the app, as they would in one process
+        clear_snapshots()
+
+        slots = list(enumerate(self.slots))
+        if self.process_count <= 0:
+            self.inline_stop = asyncio.Event()
+            self.inline_task = asyncio.get_running_loop().create_task(run_judge(slots, self.inline_stop))
+            logger.info(f"Judging {self.count} slot(s) on the app event loop")
+            return
+
+        for worker_id in range(self.process_count):
+            process = self.context.Process(
+                target=worker_main, args=(worker_id, self.stop_event, slots[worker_id::self.process_count]),
+                name=f"judge-worker-{worker_id}", daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+        logger.info(f"Started {self.process_count} judge worker(s) with {self.count} slot(s)")
+
+    async def stop(self, timeout: float = 10.0):
+        self.stop_event.set()
+        if self.inline_task is not None:
+            self.inline_stop.set()
+            try:
+                await asyncio.wait_for(self.inline_task, timeout)
+            except asyncio.TimeoutError:
+                pass  # wait_for cancelled it
+            self.inline_task = None
+
+        loop = asyncio.get_running_loop()
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                process.terminate()
+        self.processes.clear()
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run IsoCode judge workers")
+    parser.add_argument("--workers", type=int, default=settings.JUDGE_WORKERS,
+                        help="number of concurrent judge slots (defaults to JUDGE_WORKERS)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    lock_file = acquire_judge_lock()
+    if lock_file is None:
+        raise SystemExit(f"Another process already judges on this host ({settings.JUDGE_LOCK_FILE} is locked)")
+    slots = list(enumerate(plan_slots(max(args.workers, 1))))
+    try:
+        asyncio.run(run_judge(slots))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,136 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger('codejudge')
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+class ProblemCache:
+    """
+    TTL and size capped LRU cache of serialized problem responses (the
+    /problems list pages and /problems/{id}), as JSON bytes with their ETag.
+    Any change to a problem or its tests invalidates every entry: writes are
+    rare and the list pages depend on all problems anyway.
+
+    With a directory set, API processes on one host share entries there as
+    files, and an invalidation replaces a stamp file the others check on
+    every lookup, so none of them keeps serving a problem changed elsewhere.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, directory: str = ""):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.directory = directory
+        self.lock = threading.Lock()
+        # key -> (expires, generation, body, etag), least recently used first
+        self.entries: "OrderedDict[str, Tuple[float, tuple, bytes, str]]" = OrderedDict()
+        self.invalidations = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def generation(self) -> tuple:
+        """Changes on every invalidation, in this process or (sharing a directory) another"""
+        if not self.directory:
+            return (self.invalidations,)
+        try:
+            stat = os.stat(self._stamp_path())
+        except OSError:
+            return (self.invalidations, 0, 0)
+        return (self.invalidations, stat.st_mtime_ns, stat.st_ino)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """(body, etag) cached for key, or None on a miss"""
+        if self.ttl <= 0:
+            return None
+        generation = self.generation()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > time.monotonic() and entry[1] == generation:
+                self.entries.move_to_end(key)
+                return entry[2], entry[3]
+            self.entries.pop(key, None)
+        body = self._read_shared(key)
+        if body is None:
+            return None
+        return self._remember(key, generation, body)
+
+    def put(self, key: str, body: bytes, generation: tuple) -> Tuple[bytes, str]:
+        """
+        Cache a response built from the database as of generation (read
+        before building it), so one built across an invalidation is not kept
+        """
+        if self.ttl <= 0 or generation != self.generation():
+            return body, etag_for(body)
+        if self.directory:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not share cached problem response: {str(e)}")
+        return self._remember(key, generation, body)
+
+    def invalidate(self):
+        """Drop every entry, here and in the shared directory"""
+        with self.lock:
+            self.invalidations += 1
+            self.entries.clear()
+        if not self.directory:
+            return
+        try:
+            tmp_path = f"{self._stamp_path()}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(str(time.time()))
+            os.replace(tmp_path, self._stamp_path())
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
+        except OSError as e:
+            logger.warning(f"Could not invalidate shared problem responses: {str(e)}")
+
+    def _remember(self, key: str, generation: tuple, body: bytes) -> Tuple[bytes, str]:
+        etag = etag_for(body)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, generation, body, etag)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return body, etag
+
+    def _read_shared(self, key: str) -> Optional[bytes]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            # Written before the last invalidation, or too long ago
+            if stat.st_mtime_ns <= self._stamp_mtime_ns() or time.time() - stat.st_mtime > self.ttl:
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _stamp_mtime_ns(self) -> int:
+        try:
+            return os.stat(self._stamp_path()).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _stamp_path(self) -> str:
+        return os.path.join(self.directory, "invalidated")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + ".json")
+
+problem_cache = ProblemCache(settings.PROBLEM_CACHE_TTL, settings.PROBLEM_CACHE_SIZE, settings.PROBLEM_CACHE_DIR)
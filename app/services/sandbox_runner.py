@@ -0,0 +1,460 @@
+import io
+import time
+import asyncio
+import tarfile
+import logging
+from typing import Callable
+
+from app.services.judge_backend import SANDBOX_DIR, JUDGE_DIR, JudgeBackendError
+
+logger = logging.getLogger('codejudge')
+
+# Where the runner lives inside every sandbox. It is owned by root (or bound
+# read-only), outside the sandbox user's writable /sandbox, so submissions
+# can't replace it.
+RUNNER_PATH = f"{JUDGE_DIR}/runner"
+
+# Image used to build the runner. The binary is static, so it runs in any image.
+RUNNER_BUILD_IMAGE = "gcc:latest"
+
+# Test server run once per submission. The judge streams test inputs into its
+# stdin and reads results from its stdout over the exec session, so no test
+# data touches a file. Usage:
+#   runner <wall ms> <cpu ms> <memory kb> <output limit> -- <command...>
+# Judge to runner, any number of:
+#   @@test <index> <input bytes>\n<input>
+# ended by "@@end\n" or EOF. For each test the runner forks the command in its
+# own process group with an RLIMIT_CPU limit, relays the input to its stdin
+# and answers with
+#   @@out <index> <bytes>\n<data>    (stdout, as it arrives)
+#   @@err <index> <bytes>\n<data>    (stderr)
+#   @@result <index> <verdict> <exit code> <wall ms> <cpu ms> <peak rss kb> <stdout bytes> <stderr bytes>\n
+# The verdict is OK, RE (non-zero exit or signal), TLE, MLE or OLE. The group
+# is killed when the wall clock limit passes or stdout goes past the output
+# limit (one byte over is forwarded to mark the hit); stderr is cut at the
+# limit. Memory is capped by the sandbox cgroup, so a SIGKILL we didn't send
+# is the OOM killer.
+RUNNER_SOURCE = r"""
+#define _GNU_SOURCE
+#include <errno.h>
+#include <fcntl.h>
+#include <poll.h>
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/prctl.h>
+#include <sys/resource.h>
+#include <sys/time.h>
+#include <sys/wait.h>
+#include <time.h>
+#include <unistd.h>
+
+#define CHUNK 65536
+
+/* Buffered judge input; bytes past the current test stay for the next header */
+static char in_buf[CHUNK];
+static size_t in_start = 0, in_end = 0;
+
+static long now_ms(void) {
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    return now.tv_sec * 1000L + now.tv_nsec / 1000000L;
+}
+
+static void write_all(int fd, const char *data, size_t size) {
+    while (size > 0) {
+        ssize_t n = write(fd, data, size);
+        if (n < 0) {
+            if (errno == EINTR) continue;
+            exit(3); /* the judge went away */
+        }
+        data += n;
+        size -= n;
+    }
+}
+
+static void frame(const char *tag, long index, const char *data, size_t size) {
+    char header[64];
+    int length = snprintf(header, sizeof(header), "@@%s %ld %zu\n", tag, index, size);
+    write_all(1, header, length);
+    write_all(1, data, size);
+}
+
+/* Read more judge input, returns 0 at EOF */
+static int fill(void) {
+    if (in_start == in_end) {
+        in_start = in_end = 0;
+    } else if (in_end == sizeof(in_buf)) {
+        memmove(in_buf, in_buf + in_start, in_end - in_start);
+        in_end -= in_start;
+        in_start = 0;
+    }
+    ssize_t n;
+    do n = read(0, in_buf + in_end, sizeof(in_buf) - in_end); while (n < 0 && errno == EINTR);
+    if (n <= 0) return 0;
+    in_end += n;
+    return 1;
+}
+
+static char *read_line(void) {
+    for (;;) {
+        char *newline = memchr(in_buf + in_start, '\n', in_end - in_start);
+        if (newline) {
+            char *line = in_buf + in_start;
+            *newline = '\0';
+            in_start = newline - in_buf + 1;
+            return line;
+        }
+        if (in_end - in_start == sizeof(in_buf) || !fill()) return NULL;
+    }
+}
+
+static void run_test(long index, long remaining, long wall_ms, long cpu_ms, long mem_kb,
+                     long limit, char **command) {
+    int in_pipe[2], out_pipe[2], err_pipe[2];
+    if (pipe(in_pipe) < 0 || pipe(out_pipe) < 0 || pipe(err_pipe) < 0) {
+        perror("pipe");
+        exit(2);
+    }
+    long start = now_ms();
+    pid_t child = fork();
+    if (child < 0) {
+        perror("fork");
+        exit(2);
+    }
+    if (child == 0) {
+        setpgid(0, 0);
+        dup2(in_pipe[0], 0);
+        dup2(out_pipe[1], 1);
+        dup2(err_pipe[1], 2);
+        close(in_pipe[0]); close(in_pipe[1]);
+        close(out_pipe[0]); close(out_pipe[1]);
+        close(err_pipe[0]); close(err_pipe[1]);
+        signal(SIGPIPE, SIG_DFL);
+        struct rlimit limit_cpu;
+        limit_cpu.rlim_cur = (cpu_ms + 999) / 1000;
+        limit_cpu.rlim_max = limit_cpu.rlim_cur + 1;
+        setrlimit(RLIMIT_CPU, &limit_cpu);
+        execvp(command[0], command);
+        perror("exec");
+        _exit(127);
+    }
+    setpgid(child, child);
+    close(in_pipe[0]);
+    close(out_pipe[1]);
+    close(err_pipe[1]);
+    int to_child = in_pipe[1], from_out = out_pipe[0], from_err = err_pipe[0];
+    fcntl(to_child, F_SETFL, O_NONBLOCK);
+    fcntl(from_out, F_SETFL, O_NONBLOCK);
+    fcntl(from_err, F_SETFL, O_NONBLOCK);
+
+    long out_bytes = 0, err_bytes = 0;
+    int timed_out = 0, flooded = 0, exited = 0, status = 0;
+    struct rusage usage;
+    memset(&usage, 0, sizeof(usage));
+    char chunk[CHUNK];
+
+    for (;;) {
+        size_t pending = in_end - in_start;
+        if ((long)pending > remaining) pending = remaining;
+        if (to_child < 0 && pending > 0) {
+            /* The program stopped reading, skip the rest of its input */
+            in_start += pending;
+            remaining -= pending;
+            continue;
+        }
+        if (to_child >= 0 && remaining == 0) {
+            close(to_child);
+            to_child = -1;
+        }
+        if (!exited && wait4(child, &status, WNOHANG, &usage) == child) {
+            exited = 1;
+            kill(-child, SIGKILL); /* stray children of the program */
+        }
+        long left = start + wall_ms - now_ms();
+        if (left <= 0) {
+            if (!exited && !timed_out) {
+                timed_out = 1;
+                kill(-child, SIGKILL);
+            } else if (exited) {
+                /* Something that left the process group holds the pipes */
+                if (from_out >= 0) { close(from_out); from_out = -1; }
+                if (from_err >= 0) { close(from_err); from_err = -1; }
+            }
+        }
+        if (exited && from_out < 0 && from_err < 0 && remaining == 0) break;
+
+        struct pollfd fds[4];
+        int nfds = 0, in_at = -1, child_at = -1, out_at = -1, err_at = -1;
+        if (remaining > 0 && pending == 0) {
+            in_at = nfds;
+            fds[nfds].fd = 0; fds[nfds++].events = POLLIN;
+        }
+        if (to_child >= 0 && pending > 0) {
+            child_at = nfds;
+            fds[nfds].fd = to_child; fds[nfds++].events = POLLOUT;
+        }
+        if (from_out >= 0) {
+            out_at = nfds;
+            fds[nfds].fd = from_out; fds[nfds++].events = POLLIN;
+        }
+        if (from_err >= 0) {
+            err_at = nfds;
+            fds[nfds].fd = from_err; fds[nfds++].events = POLLIN;
+        }
+        /* Wake up for the deadline, and poll for the exit once the pipes are closed */
+        int timeout = left > 0 ? (int)left : 10;
+        if (!exited && from_out < 0 && from_err < 0 && timeout > 1) timeout = 1;
+        if (exited && remaining > 0 && from_out < 0 && from_err < 0) timeout = -1;
+        if (poll(fds, nfds, timeout) < 0 && errno != EINTR) {
+            perror("poll");
+            exit(2);
+        }
+
+        if (in_at >= 0 && fds[in_at].revents && !fill()) remaining = 0; /* judge input cut short */
+        if (child_at >= 0 && fds[child_at].revents) {
+            ssize_t n = write(to_child, in_buf + in_start, pending);
+            if (n > 0) {
+                in_start += n;
+                remaining -= n;
+            } else if (n < 0 && errno != EAGAIN && errno != EINTR) {
+                close(to_child); /* EPIPE: it closed stdin or exited */
+                to_child = -1;
+            }
+        }
+        if (out_at >= 0 && fds[out_at].revents) {
+            ssize_t n = read(from_out, chunk, sizeof(chunk));
+            if (n > 0) {
+                long room = limit + 1 - out_bytes;
+                if (room > 0) {
+                    frame("out", index, chunk, n < room ? n : room);
+                    out_bytes += n < room ? n : room;
+                }
+                if (out_bytes > limit && !flooded) {
+                    flooded = 1;
+                    kill(-child, SIGKILL);
+                }
+            } else if (n == 0 || (errno != EAGAIN && errno != EINTR)) {
+                close(from_out);
+                from_out = -1;
+            }
+        }
+        if (err_at >= 0 && fds[err_at].revents) {
+            ssize_t n = read(from_err, chunk, sizeof(chunk));
+            if (n > 0) {
+                long room = limit - err_bytes;
+                if (room > 0) {
+                    frame("err", index, chunk, n < room ? n : room);
+                    err_bytes += n < room ? n : room;
+                }
+            } else if (n == 0 || (errno != EAGAIN && errno != EINTR)) {
+                close(from_err);
+                from_err = -1;
+            }
+        }
+    }
+    if (to_child >= 0) close(to_child);
+
+    long wall = now_ms() - start;
+    long cpu = usage.ru_utime.tv_sec * 1000L + usage.ru_utime.tv_usec / 1000L
+             + usage.ru_stime.tv_sec * 1000L + usage.ru_stime.tv_usec / 1000L;
+    long rss_kb = usage.ru_maxrss;
+
+    int code;
+    const char *verdict;
+    if (WIFSIGNALED(status)) {
+        int sig = WTERMSIG(status);
+        code = 128 + sig;
+        if (flooded) verdict = "OLE";
+        else if (timed_out || sig == SIGXCPU || cpu > cpu_ms) verdict = "TLE";
+        else if (sig == SIGKILL || rss_kb > mem_kb) verdict = "MLE";
+        else verdict = "RE";
+    } else {
+        code = WEXITSTATUS(status);
+        if (flooded) verdict = "OLE";
+        else if (cpu > cpu_ms) verdict = "TLE";
+        else if (rss_kb > mem_kb) verdict = "MLE";
+        else verdict = code == 0 ? "OK" : "RE";
+    }
+
+    char result[256];
+    int length = snprintf(result, sizeof(result), "@@result %ld %s %d %ld %ld %ld %ld %ld\n",
+                          index, verdict, code, wall, cpu, rss_kb, out_bytes, err_bytes);
+    write_all(1, result, length);
+}
+
+int main(int argc, char **argv) {
+    if (argc < 7 || strcmp(argv[5], "--") != 0) {
+        fprintf(stderr, "usage: runner <wall ms> <cpu ms> <memory kb> <output limit> -- <command...>\n");
+        return 2;
+    }
+    long wall_ms = atol(argv[1]);
+    long cpu_ms = atol(argv[2]);
+    long mem_kb = atol(argv[3]);
+    long limit = atol(argv[4]);
+    char **command = argv + 6;
+
+    /* Writes to a program that quit reading fail with EPIPE instead */
+    signal(SIGPIPE, SIG_IGN);
+    /* Programs run as our user; this keeps them out of /proc/<runner>/fd,
+       so they can't write frames of their own to the judge */
+    prctl(PR_SET_DUMPABLE, 0);
+
+    char *line;
+    while ((line = read_line()) != NULL && strcmp(line, "@@end") != 0) {
+        long index, size;
+        if (sscanf(line, "@@test %ld %ld", &index, &size) != 2 || size < 0) {
+            fprintf(stderr, "runner: bad frame: %s\n", line);
+            return 2;
+        }
+        run_test(index, size, wall_ms, cpu_ms, mem_kb, limit, command);
+    }
+    return 0;
+}
+"""
+
+# Largest slice of test input written to the session at once
+RUNNER_CHUNK = 64 * 1024
+
+class RunnerSession:
+    """
+    Judge side of the runner protocol on an attached ExecSession: feeds one
+    test at a time and collects its output, so the judge decides after each
+    result whether to send the next.
+    """
+
+    def __init__(self, session, output_limit: int, preview_limit: int = None):
+        self.session = session
+        self.output_limit = output_limit
+        self.preview_limit = output_limit if preview_limit is None else preview_limit
+        self.buffer = bytearray()
+
+    async def run(self, index: int, data, on_output: Callable[[bytes], object] = None) -> dict:
+        """
+        Run test index with data (bytes, memoryview or mmap, or a list of
+        them sent back to back) on stdin. The
+        input is written in slices while output is read, so neither side
+        ever holds more than a chunk in flight. Stdout chunks are passed to
+        on_output as they arrive; only the first preview_limit bytes of
+        stdout and stderr are kept in the result.
+        """
+        writer = asyncio.ensure_future(self._send(index, data))
+        try:
+            output, error = bytearray(), bytearray()
+            output_bytes = 0
+            while True:
+                header = await self._read_line()
+                if header is None:
+                    # The runner died mid-test (killed from inside the sandbox?)
+                    return self._result(index, ["RE", "255", "0", "0", "0"], output_bytes, output, error)
+                fields = header.split()
+                if len(fields) == 3 and fields[0] in ("@@out", "@@err"):
+                    payload = await self._read_exact(int(fields[2]))
+                    if fields[0] == "@@out":
+                        # The runner caps stdout; count it ourselves too rather than trust that
+                        output_bytes += len(payload)
+                        if output_bytes > self.output_limit + 1:
+                            continue
+                        if on_output:
+                            on_output(payload)
+                        output += payload[:self.preview_limit - len(output)]
+                    else:
+                        error += payload[:self.preview_limit - len(error)]
+                elif len(fields) == 9 and fields[0] == "@@result" and int(fields[1]) == index:
+                    await writer
+                    return self._result(index, fields[2:7], min(output_bytes, self.output_limit + 1),
+                                        output, error)
+                else:
+                    raise JudgeBackendError(f"Unexpected runner output: {header[:200]}")
+        finally:
+            if not writer.done():
+                writer.cancel()
+
+    async def close(self):
+        """Tell the runner there are no more tests"""
+        await self.session.write(b"@@end\n")
+
+    async def _send(self, index: int, data):
+        views = [memoryview(part) for part in (data if isinstance(data, list) else [data])]
+        await self.session.write(f"@@test {index} {sum(len(view) for view in views)}\n".encode('ascii'))
+        for view in views:
+            for offset in range(0, len(view), RUNNER_CHUNK):
+                await self.session.write(view[offset:offset + RUNNER_CHUNK])
+
+    async def _fill(self) -> bool:
+        chunk = await self.session.read()
+        self.buffer += chunk
+        return bool(chunk)
+
+    async def _read_line(self):
+        while True:
+            newline = self.buffer.find(b"\n")
+            if newline >= 0:
+                line = self.buffer[:newline].decode('utf-8', errors='replace')
+                del self.buffer[:newline + 1]
+                return line
+            if len(self.buffer) > 4096 or not await self._fill():
+                return None
+
+    async def _read_exact(self, size: int) -> bytes:
+        while len(self.buffer) < size:
+            if not await self._fill():
+                raise JudgeBackendError("Runner output ended mid-frame")
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def _result(self, index, fields, output_bytes, output, error) -> dict:
+        verdict, exit_code, wall_ms, cpu_ms, rss_kb = fields
+        return {
+            "index": index,
+            "verdict": verdict,
+            "exit_code": int(exit_code),
+            "wall_ms": int(wall_ms),
+            "cpu_ms": int(cpu_ms),
+            "rss_kb": int(rss_kb),
+            "output_bytes": output_bytes,
+            "output": output.decode('utf-8', errors='replace'),
+            "error": error.decode('utf-8', errors='replace'),
+        }
+
+async def build_runner(backend) -> bytes:
+    """Compile the runner as a static binary in a throwaway gcc sandbox"""
+    sandbox = await backend.create_sandbox(RUNNER_BUILD_IMAGE)
+    try:
+        await backend.put_archive(sandbox, SANDBOX_DIR, file_archive({"runner.c": RUNNER_SOURCE.encode('utf-8')},
+                                                                     owner=1000))
+        exit_code, output = await backend.exec(
+            sandbox, ["gcc", "-O2", "-static", "-o", f"{SANDBOX_DIR}/runner", f"{SANDBOX_DIR}/runner.c"]
+        )
+        if exit_code != 0:
+            raise RuntimeError(f"Failed to build judge runner: {output.decode('utf-8', errors='replace')}")
+        data = await backend.get_archive(sandbox, f"{SANDBOX_DIR}/runner")
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r") as tar:
+            return tar.extractfile(tar.getmember("runner")).read()
+    finally:
+        await backend.remove_sandbox(sandbox)
+
+async def install_runner(backend, sandbox: str, binary: bytes):
+    """Copy the runner into a sandbox as a root-owned, read-only executable"""
+    await backend.put_archive(sandbox, "/", file_archive({RUNNER_PATH.lstrip("/"): binary}, mode=0o555, owner=0))
+
+def file_archive(files, mode=0o644, owner=0):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for path, content in files.items():
+            if "/" in path:
+                directory = tarfile.TarInfo(name=path.rsplit("/", 1)[0])
+                directory.type = tarfile.DIRTYPE
+                directory.mode = 0o755
+                directory.uid = directory.gid = owner
+                directory.mtime = int(time.time())
+                tar.addfile(directory)
+            info = tarfile.TarInfo(name=path)
+            info.size = len(content)
+            info.mode = mode
+            info.uid = info.gid = owner
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+import io
+import os
+import re
+import json
+import mmap
+import shutil
+import hashlib
+import zipfile
+import argparse
+import itertools
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.models import Problem, TestCase, TestResult
+from app.services.judge_metrics import CACHE_LOOKUPS
+from app.services.problem_cache import problem_cache
+
+logger = logging.getLogger('codejudge')
+
+# Every test is its own TestCase row, judged in ordinal order. Inputs and
+# outputs up to TEST_DATA_INLINE_LIMIT bytes of text are stored in the row;
+# anything larger (or binary) goes to a content-addressed store on disk and
+# the row keeps its sha256. The judge maps stored files instead of reading
+# them, so a large test is streamed to the runner and compared chunk by
+# chunk without ever being held in memory.
+#
+# Judges don't read tests from the database per submission either: each
+# problem's tests are materialized once into a directory on the judge host
+# (TestDataCache), named by the problem's test_version, which every change
+# to its tests bumps.
+
+COPY_CHUNK = 1024 * 1024
+
+# Test packs: <name>.in with <name>.out or <name>.ans, in a directory or a
+# zip, judged in natural order of their names. Tests whose name or directory
+# starts with "sample" are the samples and come first.
+PACK_INPUT = ".in"
+PACK_ANSWERS = (".out", ".ans")
+
+class TestDataError(Exception):
+    """A test pack that can't be imported"""
+
+class TestDataStore:
+    """Test data files on local disk, named by the sha256 of their content"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def put(self, chunks: Iterable[bytes]) -> str:
+        """Store data given as chunks, returns its hash"""
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    f.write(chunk)
+            key = digest.hexdigest()
+            path = self.path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return key
+
+    def read(self, key: str, limit: int = -1) -> bytes:
+        with open(self.path(key), "rb") as f:
+            return f.read(limit)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+test_data_store = TestDataStore(settings.TEST_DATA_DIR)
+
+def store_test_data(data: Union[str, bytes, BinaryIO, None]) -> Tuple[Optional[str], Optional[str]]:
+    """Store one input or output, returns (inline text, blob hash) with one of them set"""
+    if data is None:
+        return None, None
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    stream = io.BytesIO(data) if isinstance(data, bytes) else data
+    head = stream.read(settings.TEST_DATA_INLINE_LIMIT + 1)
+    # Text columns can't hold NUL bytes or invalid UTF-8, those go to the store whatever their size
+    if len(head) <= settings.TEST_DATA_INLINE_LIMIT and b"\0" not in head:
+        try:
+            return head.decode('utf-8'), None
+        except UnicodeDecodeError:
+            pass
+    return None, test_data_store.put(itertools.chain([head], iter(lambda: stream.read(COPY_CHUNK), b"")))
+
+def new_test_case(problem_id: int, ordinal: int, input_data, expected_output,
+                  is_sample: bool = False, weight: float = 1.0, subtask: Optional[int] = None) -> TestCase:
+    """A TestCase row with its data stored inline or in the test data store"""
+    input_text, input_blob = store_test_data(input_data)
+    output_text, output_blob = store_test_data(expected_output)
+    return TestCase(
+        problem_id=problem_id,
+        ordinal=ordinal,
+        weight=weight,
+        input_data=input_text,
+        expected_output=output_text,
+        input_blob=input_blob,
+        output_blob=output_blob,
+        is_sample=is_sample,
+        subtask=subtask,
+    )
+
+def next_ordinal(db: Session, problem_id: int) -> int:
+    last = db.query(func.max(TestCase.ordinal)).filter(TestCase.problem_id == problem_id).scalar()
+    return (last or 0) + 1
+
+def case_text(test_case: TestCase, limit: Optional[int] = None) -> Tuple[str, str]:
+    """(input, expected output) of a test as text, for display; cut at limit bytes"""
+    def text(inline, blob):
+        if blob:
+            return test_data_store.read(blob, -1 if limit is None else limit).decode('utf-8', errors='replace')
+        return (inline or "") if limit is None else (inline or "")[:limit]
+    return text(test_case.input_data, test_case.input_blob), text(test_case.expected_output, test_case.output_blob)
+
+def bump_test_version(db: Session, problem_id: int):
+    """Mark a problem's tests changed, in the transaction that changes them"""
+    db.query(Problem).filter(Problem.id == problem_id).update(
+        {Problem.test_version: func.coalesce(Problem.test_version, 0) + 1}, synchronize_session=False)
+
+class TestDataCache:
+    """
+    Problems' tests as files on the judge host, one directory per problem
+    and test_version holding <n>.in, <n>.out and a manifest of the tests.
+    A version is written once, to a temporary directory renamed into place,
+    so processes sharing the cache never see half of one; manifests are
+    also kept in memory. Stored blobs are hard-linked rather than copied.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, root: str, max_manifests: int = 256):
+        self.root = root
+        self.max_manifests = max_manifests
+        self.lock = threading.Lock()
+        self.manifests: "OrderedDict[Tuple[int, int], List[dict]]" = OrderedDict()
+        os.makedirs(root, exist_ok=True)
+
+    def directory(self, problem_id: int, version: int) -> str:
+        return os.path.join(self.root, str(problem_id), str(version))
+
+    def tests(self, db: Session, problem: Problem) -> Tuple[str, List[dict]]:
+        """The directory and manifest of a problem's current tests, materialized on first use"""
+        key = (problem.id, problem.test_version or 0)
+        directory = self.directory(*key)
+        with self.lock:
+            if key in self.manifests:
+                self.manifests.move_to_end(key)
+                CACHE_LOOKUPS.inc(cache="test_data", result="hit")
+                return directory, self.manifests[key]
+        try:
+            with open(os.path.join(directory, self.MANIFEST)) as f:
+                manifest = json.load(f)
+            CACHE_LOOKUPS.inc(cache="test_data", result="hit")
+        except (OSError, ValueError):
+            CACHE_LOOKUPS.inc(cache="test_data", result="miss")
+            manifest = self._materialize(db, *key)
+        with self.lock:
+            self.manifests[key] = manifest
+            while len(self.manifests) > self.max_manifests:
+                self.manifests.popitem(last=False)
+        return directory, manifest
+
+    def _materialize(self, db: Session, problem_id: int, version: int) -> List[dict]:
+        rows = (db.query(TestCase).filter(TestCase.problem_id == problem_id)
+                .order_by(TestCase.ordinal, TestCase.id).all())
+        parent = os.path.join(self.root, str(problem_id))
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".tmp")
+        try:
+            manifest = []
+            for number, row in enumerate(rows, start=1):
+                self._write(os.path.join(tmp_dir, f"{number}.in"), row.input_data, row.input_blob)
+                self._write(os.path.join(tmp_dir, f"{number}.out"), row.expected_output, row.output_blob)
+                manifest.append({
+                    "id": row.id,
+                    "number": number,
+                    "weight": row.weight if row.weight is not None else 1.0,
+                    "is_sample": bool(row.is_sample),
+                    "subtask": row.subtask,
+                })
+            with open(os.path.join(tmp_dir, self.MANIFEST), "w") as f:
+                json.dump(manifest, f)
+            try:
+                os.rename(tmp_dir, self.directory(problem_id, version))
+            except OSError:
+                # Another judge process materialized it first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        self._prune(parent, version)
+        logger.info(f"Cached {len(manifest)} test(s) of problem {problem_id} (version {version})")
+        return manifest
+
+    @staticmethod
+    def _write(path: str, inline: Optional[str], blob: Optional[str]):
+        if blob:
+            try:
+                os.link(test_data_store.path(blob), path)
+                return
+            except OSError:
+                shutil.copyfile(test_data_store.path(blob), path)
+                return
+        with open(path, "wb") as f:
+            f.write((inline or "").encode('utf-8'))
+
+    @staticmethod
+    def _prune(parent: str, version: int):
+        # The previous version stays: a judge that read the old test_version
+        # just before the change may still be about to open it
+        for name in os.listdir(parent):
+            if name.isdigit() and int(name) < version - 1:
+                shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+test_data_cache = TestDataCache(settings.TEST_CACHE_DIR)
+
+@contextmanager
+def open_cached_tests(directory: str, manifest: List[dict], samples_only: bool = False) -> Iterator[List[dict]]:
+    """
+    Tests from the cache as CodeExecutor.execute takes them, input and
+    expected output mapped from their files (closed on exit), plus the
+    TestCase id, weight and group (subtask number) of each.
+    """
+    with ExitStack() as stack:
+        def load(path):
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b""  # empty files can't be mapped
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stack.callback(data.close)
+            return data
+
+        tests = []
+        for entry in manifest:
+            if samples_only and not entry["is_sample"]:
+                continue
+            tests.append({
+                "id": entry["id"],
+                "input": load(os.path.join(directory, f"{entry['number']}.in")),
+                "expected_output": load(os.path.join(directory, f"{entry['number']}.out")),
+                "weight": entry["weight"],
+                "group": entry.get("subtask"),
+            })
+        yield tests
+
+def _natural_key(name: str):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+def _is_sample(name: str) -> bool:
+    return any(part.lower().startswith("sample") for part in name.split("/"))
+
+def _subtask(name: str) -> Optional[int]:
+    """Subtask of a pack file from a subtask<N> directory in its path"""
+    for part in name.split("/")[:-1]:
+        match = re.fullmatch(r"subtask[-_]?(\d+)", part.lower())
+        if match:
+            return int(match.group(1))
+    return None
+
+def read_test_pack(names: Iterable[str]) -> List[Tuple[str, str, str]]:
+    """Pair up a pack's files into (name, input file, answer file), in judging order"""
+    names = set(names)
+    tests = []
+    for name in names:
+        if not name.endswith(PACK_INPUT):
+            continue
+        stem = name[:-len(PACK_INPUT)]
+        answer = next((stem + ext for ext in PACK_ANSWERS if stem + ext in names), None)
+        if answer is None:
+            raise TestDataError(f"No answer file for {name}")
+        tests.append((stem, name, answer))
+    if not tests:
+        raise TestDataError("No tests found (expected <name>.in files with <name>.out or <name>.ans)")
+    return sorted(tests, key=lambda test: (not _is_sample(test[0]), _natural_key(test[0])))
+
+@contextmanager
+def open_test_pack(source) -> Iterator[Tuple[List[str], Callable[[str], BinaryIO]]]:
+    """A pack's file names and an opener for them; source is a directory, a zip path or a zip file object"""
+    if isinstance(source, str) and os.path.isdir(source):
+        names = [os.path.relpath(os.path.join(dirpath, name), source).replace(os.sep, "/")
+                 for dirpath, _, filenames in os.walk(source) for name in filenames]
+        yield names, lambda name: open(os.path.join(source, name), "rb")
+        return
+    try:
+        archive = zipfile.ZipFile(source)
+    except (zipfile.BadZipFile, OSError) as e:
+        raise TestDataError(f"Not a test pack: {e}")
+    with archive:
+        yield [info.filename for info in archive.infolist() if not info.is_dir()], archive.open
+
+def import_test_pack(db: Session, problem_id: int, source, replace: bool = True) -> int:
+    """
+    Import a test pack into a problem, replacing its tests unless replace is
+    False, in which case they are appended. Tests under a subtask<N>
+    directory belong to subtask N. Returns the number imported.
+    """
+    with open_test_pack(source) as (names, open_file):
+        tests = read_test_pack(names)
+        if replace:
+            # Past results keep their test numbers but lose the link to the old rows
+            old_ids = db.query(TestCase.id).filter(TestCase.problem_id == problem_id)
+            db.query(TestResult).filter(TestResult.test_case_id.in_(old_ids)).update(
+                {"test_case_id": None}, synchronize_session=False)
+            db.query(TestCase).filter(TestCase.problem_id == problem_id).delete(synchronize_session=False)
+            ordinal = 1
+        else:
+            ordinal = next_ordinal(db, problem_id)
+        for stem, input_name, answer_name in tests:
+            with open_file(input_name) as test_input, open_file(answer_name) as answer:
+                db.add(new_test_case(problem_id, ordinal, test_input, answer, is_sample=_is_sample(stem),
+                                     subtask=_subtask(stem)))
+            ordinal += 1
+        bump_test_version(db, problem_id)
+    db.commit()
+    logger.info(f"Imported {len(tests)} test(s) into problem {problem_id}")
+    return len(tests)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a test pack into an IsoCode problem")
+    parser.add_argument("problem_id", type=int)
+    parser.add_argument("pack", help="directory or zip of <name>.in and <name>.out (or .ans) files")
+    parser.add_argument("--append", action="store_true", help="add to the problem's tests instead of replacing them")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db = SessionLocal()
+    try:
+        import_test_pack(db, args.problem_id, args.pack, replace=not args.append)
+        # Only reaches API processes sharing PROBLEM_CACHE_DIR, others catch up within the TTL
+        problem_cache.invalidate()
+    finally:
+        db.close()
@@ -3,6 +3,7 @@ class ModernProblemDashboard {
         this.editor = null;
         this.currentProblem = null;
         this.testCases = [];
+        this.problemRequests = new Map();
         this.apiBaseUrl = 'http://localhost:8000';
         this.currentTheme = localStorage.getItem('theme') || 'light';
         this.fontSize = parseInt(localStorage.getItem('fontSize')) || 14;
@@ -203,6 +204,24 @@ class ModernProblemDashboard {
         }
     }
 
+    // One request per problem for the page's lifetime, shared by every caller;
+    // the browser revalidates it with the server's ETag on the next page view
+    fetchProblemData(problemId) {
+        const key = String(problemId);
+        if (!this.problemRequests.has(key)) {
+            const request = fetch(`${this.apiBaseUrl}/problems/${key}`).then(response => {
+                if (!response.ok) {
+                    throw new Error(`Failed to fetch problem (${response.status})`);
+                }
+                return response.json();
+            });
+            // A failed request can be retried
+            request.catch(() => this.problemRequests.delete(key));
+            this.problemRequests.set(key, request);
+        }
+        return this.problemRequests.get(key);
+    }
+
     async loadProblem() {
         this.showProgress();
         
@@ -211,12 +230,7 @@ class ModernProblemDashboard {
             const problemId = urlParams.get('id') || '1';
             
             // Get problem and test cases data from API
-            const response = await fetch(`${this.apiBaseUrl}/problems/${problemId}`);
-            if (!response.ok) {
-                throw new Error('Failed to fetch problem');
-            }
-            
-            const data = await response.json();
+            const data = await this.fetchProblemData(problemId);
             this.currentProblem = data.problem;
 
             this.testCases = data.sample_test_cases || [];
@@ -286,12 +300,7 @@ class ModernProblemDashboard {
     // This method is kept for backward compatibility or for use in other places
     async getProblem(id) {
         try {
-            const response = await fetch(`${this.apiBaseUrl}/problems/${id}`);
-            if (!response.ok) {
-                throw new Error('Failed to fetch problem');
-            }
-            
-            const data = await response.json();
+            const data = await this.fetchProblemData(id);
             return data.problem;
         } catch (error) {
             console.error('Error fetching problem:', error);
@@ -304,12 +313,7 @@ class ModernProblemDashboard {
     // Kept for reference or in case it's needed elsewhere
     async getTestCases(problemId) {
         try {
-            const response = await fetch(`${this.apiBaseUrl}/problems/${problemId}`);
-            if (!response.ok) {
-                throw new Error('Failed to fetch test cases');
-            }
-            
-            const data = await response.json();
+            const data = await this.fetchProblemData(problemId);
             console.log('Fetched test cases:', data.sample_test_cases);
             return data.sample_test_cases || [];
         } catch (error) {
@@ -513,7 +517,14 @@ int* twoSum(int* nums, int numsSize, int target, int* returnSize){
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
 
-            const result = await response.json();
+            // The run is queued; follow it until a judge worker finishes it
+            const job = await response.json();
+            let judged = 0, passed = 0;
+            const result = await this.streamJudge(job.submission_id, null, (test) => {
+                judged++;
+                if (test.passed) passed++;
+                this.showJudgeProgress(judged, passed);
+            });
             console.log('Run result:', result);
             this.displayRunResult(result);
 
@@ -623,7 +634,19 @@ int* twoSum(int* nums, int numsSize, int target, int* returnSize){
                 })
             });
 
-            const result = await response.json();
+            const job = await response.json();
+            if (!response.ok || !job.submission_id) {
+                this.displaySubmissionResult(job);
+                return;
+            }
+
+            this.showOutput();
+            let judged = 0, passed = 0;
+            const result = await this.streamJudge(job.submission_id, token, (test) => {
+                judged++;
+                if (test.passed) passed++;
+                this.showJudgeProgress(judged, passed);
+            });
             this.displaySubmissionResult(result);
 
         } catch (error) {
@@ -634,6 +657,40 @@ int* twoSum(int* nums, int numsSize, int target, int* returnSize){
         }
     }
 
+    // Follow a queued run/submission over Server-Sent Events. onTest is called
+    // for every per-test verdict; the promise resolves with the final verdict.
+    // EventSource reconnects on its own and resumes via Last-Event-ID.
+    streamJudge(submissionId, token = null, onTest = () => {}) {
+        return new Promise((resolve, reject) => {
+            let url = `${this.apiBaseUrl}/judge/${submissionId}/events`;
+            if (token) {
+                url += `?token=${encodeURIComponent(token)}`;
+            }
+            const source = new EventSource(url);
+
+            source.addEventListener('test', (event) => {
+                onTest(JSON.parse(event.data));
+            });
+            source.addEventListener('verdict', (event) => {
+                source.close();
+                resolve(JSON.parse(event.data));
+            });
+            source.onerror = () => {
+                // CLOSED means the server refused the stream (404/401), otherwise it reconnects
+                if (source.readyState === EventSource.CLOSED) {
+                    reject(new Error('Lost connection to the judge'));
+                }
+            };
+        });
+    }
+
+    showJudgeProgress(judged, passed) {
+        const outputContent = document.getElementById('outputContent');
+        if (outputContent) {
+            outputContent.innerHTML = `<div class="loading">Judging... ${passed}/${judged} test case(s) passed so far</div>`;
+        }
+    }
+
     displayRunResult(result) {
         const outputContent = document.getElementById('outputContent');
         if (!outputContent) return;
@@ -653,14 +710,24 @@ int* twoSum(int* nums, int numsSize, int target, int* returnSize){
             const testResults = testResult.test_results || [];
             
             let html = '';
-            
+
+            if (testResult.status === 'compilation_error') {
+                outputContent.innerHTML = `
+                    <div class="error-result">
+                        <h4>Compilation Error</h4>
+                        <pre>${testResult.compile_output || ''}</pre>
+                    </div>
+                `;
+                return;
+            }
+
             if (allPassed) {
                 html += `
                     <div class="success-result">
                         <h4>✓ All Tests Passed!</h4>
                         <p class="execution-stats">
-                            <span>Execution Time: ${testResult.execution_time || 'N/A'} ms</span>
-                            <span>Memory Used: ${testResult.memory_used || 'N/A'} MB</span>
+                            <span>Execution Time: ${this.formatTime(testResult.execution_time)}</span>
+                            <span>Memory Used: ${this.formatMemory(testResult.memory_used)}</span>
                         </p>
                     </div>
                 `;
@@ -669,8 +736,8 @@ int* twoSum(int* nums, int numsSize, int target, int* returnSize){
                     <div class="error-result">
                         <h4>✗ Some Tests Failed</h4>
                         <p class="execution-stats">
-                            <span>Execution Time: ${testResult.execution_time || 'N/A'} ms</span>
-                            <span>Memory Used: ${testResult.memory_used || 'N/A'} MB</span>
+                            <span>Execution Time: ${this.formatTime(testResult.execution_time)}</span>
+                            <span>Memory Used: ${this.formatMemory(testResult.memory_used)}</span>
                         </p>
                     </div>
                 `;
@@ -685,7 +752,11 @@ int* twoSum(int* nums, int numsSize, int target, int* returnSize){
                 
                 html += `
                     <div class="test-case ${passClass}">
-                        <h5>${passIcon} Test Case ${test.test_case || index + 1}</h5>
+                        <h5>${passIcon} Test Case ${test.test_case || index + 1}${test.verdict ? ` — ${test.verdict}` : ''}</h5>
+                        <p class="execution-stats">
+                            <span>${this.formatTime(test.execution_time)}</span>
+                            <span>${this.formatMemory(test.memory_used)}</span>
+                        </p>
                         <div class="test-details">
                             <div class="test-io">
                                 <p><strong>Input:</strong></p>
@@ -749,7 +820,29 @@ int* twoSum(int* nums, int numsSize, int target, int* returnSize){
         }
     }
 
+    // execution_time is reported in seconds and memory_used in MB
+    formatTime(seconds) {
+        return seconds === null || seconds === undefined ? 'N/A' : `${Math.round(seconds * 1000)} ms`;
+    }
+
+    formatMemory(megabytes) {
+        return megabytes === null || megabytes === undefined ? 'N/A' : `${megabytes} MB`;
+    }
+
     displaySubmissionResult(result) {
+        const judged = result.result || {};
+        if (judged.execution_time !== undefined) {
+            result.runtime = this.formatTime(judged.execution_time);
+            result.memory = this.formatMemory(judged.memory_used);
+        }
+        const failedTest = (judged.test_results || []).find(test => !test.passed);
+        if (failedTest) {
+            result.failed_case = failedTest.test_case;
+            result.input = failedTest.input;
+            result.expected = failedTest.expected_output;
+            result.actual = failedTest.actual_output;
+            result.error = failedTest.details;
+        }
         if (result.status === 'Accepted') {
             this.showResultModal('🎉 Accepted!', `
                 <div class="submission-success">
@@ -774,7 +867,7 @@ int* twoSum(int* nums, int numsSize, int target, int* returnSize){
             `);
             this.showNotification('Solution accepted!', 'success');
         } else {
-            this.showResultModal('❌ Wrong Answer', `
+            this.showResultModal(`❌ ${result.status || 'Wrong Answer'}`, `
                 <div class="submission-error">
                     <h3>Submission Failed</h3>
                     <p>${result.error || 'Your solution failed on some test cases.'}</p>
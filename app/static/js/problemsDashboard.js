@@ -6,6 +6,7 @@ class ProblemsManager {
         this.sidebarCollapsed = localStorage.getItem('sidebarCollapsed') === 'true';
         this.problems = [];
         this.filteredProblems = [];
+        this.problemsRequest = 0;
         this.currentPage = 1;
         this.pageSize = 20;
         this.currentView = 'table';
@@ -100,7 +101,7 @@ class ProblemsManager {
                 document.querySelectorAll('[data-difficulty]').forEach(b => b.classList.remove('active'));
                 e.target.classList.add('active');
                 this.filters.difficulty = e.target.dataset.difficulty;
-                this.applyFilters();
+                this.loadproblems();
             });
         });
 
@@ -120,7 +121,7 @@ class ProblemsManager {
         if (categorySelect) {
             categorySelect.addEventListener('change', (e) => {
                 this.filters.category = e.target.value;
-                this.applyFilters();
+                this.loadproblems();
             });
         }
 
@@ -218,12 +219,26 @@ class ProblemsManager {
         }
     }
 
+    // Difficulty and category (a tag) are filtered by the server; search,
+    // status and sorting apply to what it returns
     async loadproblems() {
-        const problem_url = `${this.apiBaseUrl}/problems`;
-        this.problems = [];
+        const params = new URLSearchParams();
+        if (this.filters.difficulty !== 'all') {
+            params.set('difficulty', this.filters.difficulty);
+        }
+        if (this.filters.category !== 'all') {
+            params.append('tag', this.filters.category);
+        }
+        const query = params.toString();
+        const problem_url = `${this.apiBaseUrl}/problems${query ? `?${query}` : ''}`;
+        // Only the latest request's answer is shown if filters change quickly
+        const request = ++this.problemsRequest;
         try {
             const response = await fetch(problem_url);
             const data = await response.json();
+            if (request !== this.problemsRequest) {
+                return;
+            }
             this.problems = data.problems || [];
             this.applyFilters();
             this.updateStats();
@@ -245,21 +260,11 @@ class ProblemsManager {
             );
         }
 
-        // Difficulty filter
-        if (this.filters.difficulty !== 'all') {
-            filtered = filtered.filter(problem => problem.difficulty === this.filters.difficulty);
-        }
-
         // Status filter
         if (this.filters.status !== 'all') {
             filtered = filtered.filter(problem => problem.status === this.filters.status);
         }
 
-        // Category filter
-        if (this.filters.category !== 'all') {
-            filtered = filtered.filter(problem => problem.category === this.filters.category);
-        }
-
         // Sort
         if (this.sortBy !== 'default') {
             filtered.sort((a, b) => {
@@ -551,7 +556,7 @@ class ProblemsManager {
             th.classList.remove('asc', 'desc');
         });
 
-        this.applyFilters();
+        this.loadproblems();
         this.showToast('Filters reset', 'info');
     }
 
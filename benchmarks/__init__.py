@@ -0,0 +1,10 @@
+"""
+Judge benchmarks: replay a load profile (a mix of languages, test counts,
+passing and misbehaving submissions, at some concurrency) against the
+judge and record throughput, latency percentiles, time per judging phase
+and host resource use as JSON.
+
+    python -m benchmarks run --profile mixed
+    python -m benchmarks run --profile smoke --target api --url http://localhost:8000 --token ...
+    python -m benchmarks compare benchmarks/results/old.json benchmarks/results/new.json
+"""
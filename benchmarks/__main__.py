@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.drivers import run_api, run_executor
+from benchmarks.host import HostSampler
+from benchmarks.profiles import PROFILES, load_profile
+from benchmarks.report import compare, summarize
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def environment() -> dict:
+    """What the numbers were measured on, to tell runs apart when comparing"""
+    from app.core.config import settings
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "judge_backend": settings.JUDGE_BACKEND,
+        "judge_language_backends": settings.JUDGE_LANGUAGE_BACKENDS,
+        "judge_parallel_tests": settings.JUDGE_PARALLEL_TESTS,
+        "judge_version": settings.JUDGE_VERSION,
+    }
+
+def run(args) -> int:
+    profile = load_profile(args.profile, concurrency=args.concurrency, submissions=args.submissions,
+                           tests=args.tests, seed=args.seed)
+    if args.target == "api":
+        driver = run_api(profile, args.url, token=args.token, problem_id=args.problem_id, endpoint=args.endpoint)
+    else:
+        driver = run_executor(profile)
+
+    print(f"Running profile {profile.name}: {profile.submissions} submission(s) of {profile.tests} test(s), "
+          f"concurrency {profile.concurrency}, against the {args.target}")
+    sampler = HostSampler()
+    started_at = datetime.utcnow()
+    sampler.start()
+    started = time.perf_counter()
+    samples = asyncio.run(driver)
+    elapsed = time.perf_counter() - started
+    host = sampler.stop()
+
+    summary = summarize(samples, elapsed)
+    report = {
+        "profile": profile.to_dict(),
+        "target": args.target,
+        "started_at": started_at.isoformat() + "Z",
+        "environment": environment(),
+        "summary": summary,
+        "host": host,
+        "samples": samples,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{profile.name}-{args.target}-{started_at.strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    latency = summary["latency"]
+    print(f"{summary['submissions']} submission(s) in {summary['elapsed_seconds']} s, "
+          f"{summary['throughput_per_second']}/s, {summary['errors']} error(s)")
+    if latency["count"]:
+        print(f"latency p50 {latency['p50']:.3f} s, p95 {latency['p95']:.3f} s, p99 {latency['p99']:.3f} s")
+    for phase, times in summary["phases"].items():
+        print(f"  {phase:<9} mean {times['mean']:.3f} s, p95 {times['p95']:.3f} s")
+    print(f"verdicts: {summary['verdicts']}")
+    print(f"Wrote {output}")
+    return 1 if summary["errors"] else 0
+
+def compare_runs(args) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline["profile"] != current["profile"]:
+        print("Warning: the runs used different profiles", file=sys.stderr)
+    rows = compare(baseline["summary"], current["summary"], args.threshold)
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['metric']:<24} {row['baseline']:>10.4f} -> {row['current']:>10.4f} "
+              f"({row['change']:+.1%}){flag}")
+    return 1 if any(row["regression"] for row in rows) else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the IsoCode judge")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run a load profile and write its results as JSON")
+    run_parser.add_argument("--profile", default="smoke",
+                            help=f"one of {', '.join(PROFILES)}, or a JSON file of profile fields")
+    run_parser.add_argument("--target", choices=("executor", "api"), default="executor",
+                            help="judge in process, or through a running server's endpoints")
+    run_parser.add_argument("--url", default="http://localhost:8000", help="server for --target api")
+    run_parser.add_argument("--token", default=os.getenv("BENCHMARK_TOKEN"),
+                            help="bearer token for --target api (defaults to BENCHMARK_TOKEN)")
+    run_parser.add_argument("--problem-id", type=int,
+                            help="problem to submit to; by default one is created with the profile's tests")
+    run_parser.add_argument("--endpoint", choices=("submit", "run"), default="submit",
+                            help="judge through /submit, or /run (samples only, no token needed)")
+    run_parser.add_argument("--concurrency", type=int, help="override the profile's concurrency")
+    run_parser.add_argument("--submissions", type=int, help="override the profile's submission count")
+    run_parser.add_argument("--tests", type=int, help="override the profile's test count")
+    run_parser.add_argument("--seed", type=int, help="override the profile's seed")
+    run_parser.add_argument("--output", help="results file (defaults to benchmarks/results/<profile>-...json)")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="compare two results files, exit 1 on a regression")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="relative change counted as a regression (default 0.1)")
+    compare_parser.set_defaults(handler=compare_runs)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
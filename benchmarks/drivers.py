@@ -0,0 +1,141 @@
+import asyncio
+import json
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from benchmarks.profiles import Profile
+
+# A driver judges a profile's jobs with at most profile.concurrency in
+# flight and returns one sample per job: language, kind, latency (seconds
+# from submitting to the verdict), verdict, the judge's phase timings, and
+# error for jobs the judge couldn't take.
+
+async def _gather_jobs(profile: Profile, judge: Callable) -> List[dict]:
+    semaphore = asyncio.Semaphore(profile.concurrency)
+
+    async def run(language, kind, source):
+        async with semaphore:
+            sample = {"language": language, "kind": kind}
+            started = time.perf_counter()
+            try:
+                sample.update(await judge(language, source))
+            except Exception as e:
+                sample["error"] = str(e)
+            sample["latency"] = time.perf_counter() - started
+            return sample
+
+    return await asyncio.gather(*(run(*job) for job in profile.jobs()))
+
+async def run_executor(profile: Profile) -> List[dict]:
+    """Judge in process on one CodeExecutor, as a judge worker does"""
+    from app.services.code_execution import CodeExecutor
+    from app.services.judge_queue import verdict_for
+
+    executor = CodeExecutor(slots=profile.concurrency)
+    await executor.start()
+    tests = profile.test_cases()
+
+    async def judge(language, source):
+        result = await executor.execute(
+            language=language,
+            source_code=source,
+            test_cases=tests,
+            early_termination=profile.early_termination,
+            time_limit_ms=profile.time_limit_ms,
+            memory_limit_mb=profile.memory_limit_mb,
+        )
+        sample = {"verdict": verdict_for(result), "timings": result.get("timings")}
+        if result.get("status") == "error":
+            sample["error"] = result.get("details") or result.get("output") or result.get("message")
+        return sample
+
+    try:
+        return await _gather_jobs(profile, judge)
+    finally:
+        await executor.close()
+
+class ApiClient:
+    """Blocking JSON client for the judge API, run on a thread pool"""
+
+    def __init__(self, url: str, token: Optional[str] = None):
+        self.url = url.rstrip("/")
+        self.token = token
+
+    def request(self, method: str, path: str, body: Optional[dict] = None, params: Optional[dict] = None):
+        url = self.url + path
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(url, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return json.loads(response.read() or b"null")
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"{method} {path}: HTTP {e.code} {e.read().decode('utf-8', 'replace')[:200]}")
+
+    def wait_for_verdict(self, submission_id: int, timeout: float = 600) -> dict:
+        """Follow /judge/{id}/events, as the frontend does, and return the verdict event's data"""
+        params = {"token": self.token} if self.token else {}
+        url = f"{self.url}/judge/{submission_id}/events?" + urllib.parse.urlencode(params)
+        event = None
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            for line in response:
+                line = line.decode("utf-8").rstrip("\n")
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: ") and event == "verdict":
+                    return json.loads(line[len("data: "):])
+        raise RuntimeError(f"Event stream of submission {submission_id} ended without a verdict")
+
+def create_problem(client: ApiClient, profile: Profile) -> int:
+    """Create the benchmark problem with the profile's tests, the first one a sample"""
+    created = client.request("POST", "/problems/", {
+        "title": f"Benchmark: {profile.name}",
+        "difficulty": "Easy",
+        "description": "Print the sum of two integers.",
+        "time_limit_ms": profile.time_limit_ms,
+        "memory_limit_mb": profile.memory_limit_mb,
+    })
+    problem_id = created["problem_id"]
+    for n, test in enumerate(profile.test_cases()):
+        client.request("POST", f"/problems/{problem_id}/test-cases/", params={
+            "input_data": test["input"], "expected_output": test["expected_output"], "is_sample": n == 0,
+        })
+    return problem_id
+
+async def run_api(profile: Profile, url: str, token: Optional[str] = None, problem_id: Optional[int] = None,
+                  endpoint: str = "submit") -> List[dict]:
+    """
+    Judge through a running server's /submit (or /run) endpoint, following
+    each job to its verdict over its event stream. Latency includes
+    queueing. Without problem_id a problem with the profile's tests is
+    created first, which needs a token, as /submit does.
+    """
+    client = ApiClient(url, token)
+    loop = asyncio.get_running_loop()
+    # Each job in flight holds a thread while it waits for its verdict
+    threads = ThreadPoolExecutor(max_workers=profile.concurrency + 1)
+
+    def call(*args, **kwargs):
+        return loop.run_in_executor(threads, lambda: client.request(*args, **kwargs))
+
+    if problem_id is None:
+        problem_id = await loop.run_in_executor(threads, create_problem, client, profile)
+
+    async def judge(language, source):
+        queued = await call("POST", f"/{endpoint}/{problem_id}", {"language": language, "code": source})
+        verdict = await loop.run_in_executor(threads, client.wait_for_verdict, queued["submission_id"])
+        result = verdict.get("result") or {}
+        return {"verdict": verdict["status"], "timings": result.get("timings"), "cached": queued.get("cached", False)}
+
+    try:
+        return await _gather_jobs(profile, judge)
+    finally:
+        threads.shutdown(wait=False)
@@ -0,0 +1,89 @@
+import os
+import resource
+import threading
+import time
+from typing import Optional, Tuple
+
+class HostSampler:
+    """
+    Samples host CPU and memory use from /proc in a background thread while a
+    benchmark runs. On hosts without /proc only the benchmark process's own
+    resource usage is reported.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.cpu_samples = []  # percent busy across all cores
+        self.memory_samples = []  # MB in use
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.started = 0.0
+        self.usage_before = (0.0, 0.0)
+
+    def start(self):
+        self.started = time.monotonic()
+        self.usage_before = self._usage()
+        if os.path.exists("/proc/stat"):
+            self.thread = threading.Thread(target=self._run, name="host-sampler", daemon=True)
+            self.thread.start()
+
+    def stop(self) -> dict:
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        elapsed = time.monotonic() - self.started
+        usage = self._usage()
+        summary = {
+            "cpu_count": os.cpu_count(),
+            # CPU seconds of this process and of the children it waited for
+            "process_cpu_seconds": round(usage[0] - self.usage_before[0], 3),
+            "children_cpu_seconds": round(usage[1] - self.usage_before[1], 3),
+            "process_max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "elapsed_seconds": round(elapsed, 3),
+        }
+        if hasattr(os, "getloadavg"):
+            summary["load_average"] = [round(load, 2) for load in os.getloadavg()]
+        if self.cpu_samples:
+            summary["cpu_percent_mean"] = round(sum(self.cpu_samples) / len(self.cpu_samples), 1)
+            summary["cpu_percent_max"] = round(max(self.cpu_samples), 1)
+        if self.memory_samples:
+            summary["memory_used_mb_max"] = round(max(self.memory_samples), 1)
+            summary["memory_used_mb_start"] = round(self.memory_samples[0], 1)
+        return summary
+
+    def _run(self):
+        previous = self._cpu_times()
+        self.memory_samples.append(self._memory_used())
+        while not self.stop_event.wait(self.interval):
+            current = self._cpu_times()
+            busy, total = current[0] - previous[0], current[1] - previous[1]
+            if total > 0:
+                self.cpu_samples.append(100.0 * busy / total)
+            previous = current
+            self.memory_samples.append(self._memory_used())
+
+    @staticmethod
+    def _usage() -> Tuple[float, float]:
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime
+
+    @staticmethod
+    def _cpu_times() -> Tuple[int, int]:
+        """(busy, total) jiffies of all cores"""
+        with open("/proc/stat") as f:
+            fields = [int(value) for value in f.readline().split()[1:]]
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+        return sum(fields) - idle, sum(fields)
+
+    @staticmethod
+    def _memory_used() -> float:
+        info = {}
+        try:
+            with open("/proc/meminfo") as f:
+                for line in f:
+                    key, value = line.split(":", 1)
+                    info[key] = int(value.split()[0])  # kB
+        except OSError:
+            return 0.0
+        return (info.get("MemTotal", 0) - info.get("MemAvailable", info.get("MemFree", 0))) / 1024
@@ -0,0 +1,167 @@
+import json
+import os
+import random
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Tuple
+
+# Submissions the profiles mix, per language. All of them solve (or fail
+# to solve) the same problem: print the sum of the two numbers on stdin.
+# "ok" is accepted, "wrong" is a wrong answer, the rest hit the judge's
+# limits or crash.
+PROGRAMS: Dict[str, Dict[str, str]] = {
+    "python": {
+        "ok": "a, b = map(int, input().split())\nprint(a + b)\n",
+        "wrong": "a, b = map(int, input().split())\nprint(a - b)\n",
+        "tle": "while True:\n    pass\n",
+        "mle": "data = []\nwhile True:\n    data.append(bytearray(1 << 20))\n",
+        "ole": "while True:\n    print('x' * 1000)\n",
+        "runtime_error": "import sys\nsys.exit(1)\n",
+    },
+    "c": {
+        "ok": "#include <stdio.h>\nint main() { long long a, b; scanf(\"%lld %lld\", &a, &b); "
+              "printf(\"%lld\\n\", a + b); return 0; }\n",
+        "wrong": "#include <stdio.h>\nint main() { long long a, b; scanf(\"%lld %lld\", &a, &b); "
+                 "printf(\"%lld\\n\", a - b); return 0; }\n",
+        "tle": "int main() { volatile unsigned long x = 0; for (;;) x++; }\n",
+        "mle": "#include <stdlib.h>\n#include <string.h>\n"
+               "int main() { for (;;) { char *p = malloc(1 << 20); memset(p, 1, 1 << 20); } }\n",
+        "ole": "#include <stdio.h>\nint main() { for (;;) puts(\"xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\"); }\n",
+        "runtime_error": "int main() { return 1; }\n",
+    },
+    "c++": {
+        "ok": "#include <iostream>\nint main() { long long a, b; std::cin >> a >> b; "
+              "std::cout << a + b << \"\\n\"; }\n",
+        "wrong": "#include <iostream>\nint main() { long long a, b; std::cin >> a >> b; "
+                 "std::cout << a - b << \"\\n\"; }\n",
+        "tle": "int main() { volatile unsigned long x = 0; for (;;) x++; }\n",
+        "mle": "#include <vector>\n#include <cstring>\nint main() { std::vector<char *> v; "
+               "for (;;) { char *p = new char[1 << 20]; std::memset(p, 1, 1 << 20); v.push_back(p); } }\n",
+        "ole": "#include <cstdio>\nint main() { for (;;) std::puts(\"xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\"); }\n",
+        "runtime_error": "int main() { return 1; }\n",
+    },
+    "java": {
+        "ok": "import java.util.*;\npublic class Main { public static void main(String[] args) { "
+              "Scanner s = new Scanner(System.in); System.out.println(s.nextLong() + s.nextLong()); } }\n",
+        "wrong": "import java.util.*;\npublic class Main { public static void main(String[] args) { "
+                 "Scanner s = new Scanner(System.in); System.out.println(s.nextLong() - s.nextLong()); } }\n",
+        "tle": "public class Main { public static void main(String[] args) { long x = 0; "
+               "while (true) { x++; } } }\n",
+        "mle": "import java.util.*;\npublic class Main { public static void main(String[] args) { "
+               "List<long[]> v = new ArrayList<>(); while (true) { v.add(new long[1 << 17]); } } }\n",
+        "ole": "public class Main { public static void main(String[] args) { "
+               "while (true) { System.out.println(\"xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx\"); } } }\n",
+        "runtime_error": "public class Main { public static void main(String[] args) { System.exit(1); } }\n",
+    },
+    "javascript": {
+        "ok": "const [a, b] = require('fs').readFileSync(0, 'utf8').trim().split(/\\s+/).map(BigInt);\n"
+              "console.log((a + b).toString());\n",
+        "wrong": "const [a, b] = require('fs').readFileSync(0, 'utf8').trim().split(/\\s+/).map(BigInt);\n"
+                 "console.log((a - b).toString());\n",
+        "tle": "for (;;) {}\n",
+        "mle": "const v = [];\nfor (;;) v.push(Buffer.alloc(1 << 20, 1));\n",
+        "ole": "for (;;) process.stdout.write('x'.repeat(1000) + '\\n');\n",
+        "runtime_error": "process.exit(1);\n",
+    },
+}
+
+# Comment syntax, to make every submission's source unique
+COMMENTS = {"python": "#", "c": "//", "c++": "//", "java": "//", "javascript": "//"}
+
+@dataclass
+class Profile:
+    """
+    A reproducible load: `submissions` jobs drawn (with `seed`) from the
+    language and kind weights, each judged against `tests` tests, with at
+    most `concurrency` in flight.
+    """
+    name: str
+    languages: Dict[str, float] = field(default_factory=lambda: {"python": 1.0})
+    kinds: Dict[str, float] = field(default_factory=lambda: {"ok": 1.0})
+    tests: int = 10
+    submissions: int = 20
+    concurrency: int = 4
+    time_limit_ms: int = 1000
+    memory_limit_mb: int = 128
+    early_termination: bool = True
+    # Tag each source so the artifact and result caches can't serve it;
+    # turn off to measure cache hits
+    unique_sources: bool = True
+    seed: int = 1
+
+    def jobs(self) -> List[Tuple[str, str, str]]:
+        """(language, kind, source) of each submission, the same for every run of the profile"""
+        rng = random.Random(self.seed)
+        languages, language_weights = zip(*self.languages.items())
+        kinds, kind_weights = zip(*self.kinds.items())
+        jobs = []
+        for n in range(self.submissions):
+            language = rng.choices(languages, language_weights)[0]
+            kind = rng.choices(kinds, kind_weights)[0]
+            source = PROGRAMS[language][kind]
+            if self.unique_sources:
+                source += f"{COMMENTS[language]} benchmark {self.seed}-{n}-{rng.getrandbits(32):08x}\n"
+            jobs.append((language, kind, source))
+        return jobs
+
+    def test_cases(self) -> List[dict]:
+        """The problem's tests, as CodeExecutor.execute takes them"""
+        rng = random.Random(self.seed)
+        tests = []
+        for _ in range(self.tests):
+            a, b = rng.randint(-10 ** 9, 10 ** 9), rng.randint(-10 ** 9, 10 ** 9)
+            tests.append({"input": f"{a} {b}\n", "expected_output": f"{a + b}\n"})
+        return tests
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+PROFILES: Dict[str, Profile] = {
+    # A quick check that the judge works end to end
+    "smoke": Profile("smoke", tests=3, submissions=5, concurrency=1),
+    # Everyday practice traffic: mostly right or wrong answers, a few limits hit
+    "mixed": Profile(
+        "mixed",
+        languages={"python": 0.5, "c++": 0.3, "java": 0.1, "javascript": 0.1},
+        kinds={"ok": 0.6, "wrong": 0.25, "tle": 0.05, "mle": 0.04, "ole": 0.03, "runtime_error": 0.03},
+        tests=20, submissions=100, concurrency=8,
+    ),
+    # Submissions that fight the sandbox: limits and crashes only
+    "adversarial": Profile(
+        "adversarial",
+        languages={"python": 0.5, "c++": 0.5},
+        kinds={"tle": 0.35, "mle": 0.3, "ole": 0.25, "runtime_error": 0.1},
+        tests=10, submissions=40, concurrency=8,
+    ),
+    # Short accepted runs at high concurrency, bounded by sandbox turnover
+    "throughput": Profile(
+        "throughput",
+        languages={"python": 0.6, "c++": 0.4},
+        tests=5, submissions=300, concurrency=32,
+    ),
+    # Few submissions with many tests, bounded by per-test overhead
+    "large_tests": Profile(
+        "large_tests",
+        languages={"python": 0.5, "c++": 0.5},
+        tests=200, submissions=20, concurrency=4, early_termination=False,
+    ),
+}
+
+def load_profile(name: str, **overrides) -> Profile:
+    """A built-in profile by name, or a profile from a JSON file of Profile fields; overrides win"""
+    if name in PROFILES:
+        settings = PROFILES[name].to_dict()
+    elif os.path.isfile(name):
+        with open(name) as f:
+            settings = json.load(f)
+        settings.setdefault("name", os.path.splitext(os.path.basename(name))[0])
+    else:
+        raise ValueError(f"Unknown profile {name!r}, expected one of {', '.join(PROFILES)} or a JSON file")
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    profile = Profile(**settings)
+    for language in profile.languages:
+        if language not in PROGRAMS:
+            raise ValueError(f"No benchmark programs for language {language!r}")
+    for kind in profile.kinds:
+        if kind not in PROGRAMS["python"]:
+            raise ValueError(f"Unknown submission kind {kind!r}")
+    return profile
@@ -0,0 +1,83 @@
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+# Phases CodeExecutor.execute reports in its result's "timings"
+PHASES = ("checkout", "staging", "compile", "tests", "compare", "cleanup")
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+def distribution(values: List[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "max": round(max(values), 4),
+    }
+
+def summarize(samples: List[dict], elapsed: float) -> dict:
+    """
+    Throughput, latency percentiles (seconds, submit to verdict), verdict
+    counts and per-phase time over a run's samples
+    """
+    latencies = [sample["latency"] for sample in samples if not sample.get("error")]
+    by_kind = defaultdict(list)
+    for sample in samples:
+        if not sample.get("error"):
+            by_kind[f"{sample['language']}/{sample['kind']}"].append(sample["latency"])
+    phases = {}
+    for phase in PHASES:
+        values = [sample["timings"][phase] for sample in samples if phase in (sample.get("timings") or {})]
+        if values:
+            phases[phase] = distribution(values)
+    return {
+        "submissions": len(samples),
+        "errors": sum(1 for sample in samples if sample.get("error")),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(len(latencies) / elapsed, 3) if elapsed > 0 else None,
+        "latency": distribution(latencies),
+        "latency_by_kind": {key: distribution(values) for key, values in sorted(by_kind.items())},
+        "phases": phases,
+        "verdicts": dict(Counter(sample.get("verdict") or "error" for sample in samples)),
+    }
+
+# Lower is better for these, higher for throughput
+COMPARED = [
+    ("throughput_per_second", ("throughput_per_second",), True),
+    ("latency p50", ("latency", "p50"), False),
+    ("latency p95", ("latency", "p95"), False),
+    ("latency p99", ("latency", "p99"), False),
+] + [(f"{phase} mean", ("phases", phase, "mean"), False) for phase in PHASES]
+
+def _lookup(summary: dict, path) -> Optional[float]:
+    for key in path:
+        if not isinstance(summary, dict) or key not in summary:
+            return None
+        summary = summary[key]
+    return summary
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[Dict]:
+    """
+    Metric by metric change from a baseline run's summary to the current
+    one; a change worse than threshold (a fraction, 0.1 = 10%) is a regression
+    """
+    rows = []
+    for name, path, higher_is_better in COMPARED:
+        before, after = _lookup(baseline, path), _lookup(current, path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        worse = -change if higher_is_better else change
+        rows.append({"metric": name, "baseline": before, "current": after,
+                     "change": round(change, 4), "regression": worse > threshold})
+    return rows
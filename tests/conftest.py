@@ -0,0 +1,29 @@
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Settings are read when app modules are imported: point the database at an
+# in-memory SQLite and every on-disk cache at a scratch directory, so the
+# tests need neither PostgreSQL nor write into the working tree
+_scratch = tempfile.mkdtemp(prefix="codejudge-tests-")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("JUDGE_WORKERS", "0")
+for name, directory in [("ARTIFACT_CACHE_DIR", "artifact_cache"), ("TEST_DATA_DIR", "test_data"),
+                        ("TEST_CACHE_DIR", "test_cache"), ("JUDGE_METRICS_DIR", "metrics")]:
+    os.environ.setdefault(name, os.path.join(_scratch, directory))
+os.environ.setdefault("JUDGE_LOCK_FILE", os.path.join(_scratch, "judge.lock"))
+
+@pytest.fixture
+def db():
+    """A session on a fresh in-memory database with every table created"""
+    from app.db.database import Base
+    import app.models.models  # noqa: F401 -- registers the tables
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
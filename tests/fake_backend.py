@@ -0,0 +1,71 @@
+import io
+import tarfile
+from contextlib import asynccontextmanager
+
+from app.services.judge_backend import ExecSession, JudgeBackend, JudgeBackendError
+
+class FakeBackend(JudgeBackend):
+    """
+    Sandboxes that only exist as ids: nothing is run, calls are recorded.
+    exec answers with exec_result(sandbox, cmd), (0, b"") by default, and
+    attached commands read nothing and print nothing.
+    """
+    name = "fake"
+
+    def __init__(self):
+        self.running = {}  # sandbox -> whether it is up
+        self.created = 0
+        self.removed = []
+        self.updates = []  # (sandbox, memory_limit, cpuset)
+        self.commands = []  # (sandbox, cmd) of every exec
+        self.attached = []  # (sandbox, cmd) of every attach
+        self.exec_result = lambda sandbox, cmd: (0, b"")
+
+    async def image_id(self, image):
+        return f"sha256:{image}"
+
+    async def create_sandbox(self, image, pinned=False):
+        self.created += 1
+        sandbox = f"{image}-{self.created:012d}"
+        self.running[sandbox] = True
+        return sandbox
+
+    async def remove_sandbox(self, sandbox):
+        self.running.pop(sandbox, None)
+        self.removed.append(sandbox)
+
+    async def is_running(self, sandbox):
+        return self.running.get(sandbox, False)
+
+    async def update_sandbox(self, sandbox, memory_limit=None, cpuset=None):
+        self.updates.append((sandbox, memory_limit, cpuset))
+
+    async def put_archive(self, sandbox, path, data):
+        pass
+
+    async def get_archive(self, sandbox, path):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            tar.addfile(tarfile.TarInfo(path.rsplit("/", 1)[-1]))
+        return buffer.getvalue()
+
+    async def exec(self, sandbox, cmd, user=None, environment=None):
+        if not self.running.get(sandbox):
+            raise JudgeBackendError(f"No such sandbox: {sandbox}")
+        self.commands.append((sandbox, cmd))
+        return self.exec_result(sandbox, cmd)
+
+
+    @asynccontextmanager
+    async def attach(self, sandbox, cmd, environment=None):
+        if not self.running.get(sandbox):
+            raise JudgeBackendError(f"No such sandbox: {sandbox}")
+        self.attached.append((sandbox, cmd))
+        yield NullSession()
+
+class NullSession(ExecSession):
+    async def write(self, data):
+        pass
+
+    async def read(self):
+        return b""
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from app.services.artifact_cache import ArtifactCache, normalize_source
+
+@pytest.mark.parametrize("edited", [
+    's = """a  \nb"""\n',                 # trailing spaces inside a multi-line string
+    "x = 1 + \\ \n2\n",                   # backslash-space is not a line continuation
+    'auto s = R"(a \n)";\n',              # nor are they ignorable in a C++ raw string
+    "\nprint(1)\n",                       # a leading blank line moves __LINE__
+])
+def test_key_changes_with_whitespace_that_matters(edited):
+    original = edited.replace(" \n", "\n").lstrip("\n")
+    assert ArtifactCache.key("python", "img", edited) != ArtifactCache.key("python", "img", original)
+
+def test_key_ignores_line_endings():
+    source = "int main() {\n  return 0;\n}\n"
+    assert normalize_source(source.replace("\n", "\r\n")) == source
+    assert ArtifactCache.key("c++", "img", source.replace("\n", "\r\n")) == ArtifactCache.key("c++", "img", source)
+    assert ArtifactCache.key("c++", "img", source) != ArtifactCache.key("c++", "img2", source)
+    assert ArtifactCache.key("c++", "img", source) != ArtifactCache.key("c", "img", source)
+
+def test_get_and_put(tmp_path):
+    cache = ArtifactCache(str(tmp_path), 1024)
+    assert cache.get("ab12") is None
+    cache.put("ab12", b"build")
+    assert cache.get("ab12") == b"build"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names if name.endswith(".tmp")]
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ArtifactCache(str(tmp_path), 10)
+    cache.put("aa", b"1234")
+    cache.put("bb", b"1234")
+    cache.get("aa")
+    cache.put("cc", b"1234")
+    assert cache.get("bb") is None
+    assert cache.get("aa") == b"1234" and cache.get("cc") == b"1234"
+    assert cache.stats()["evictions"] == 1 and cache.stats()["bytes"] == 8
+    cache.put("dd", b"x" * 11)  # larger than the whole cache: not stored
+    assert cache.get("dd") is None
+
+def test_index_survives_a_restart(tmp_path):
+    cache = ArtifactCache(str(tmp_path), 10)
+    cache.put("aa", b"1234")
+    cache.put("bb", b"1234")
+    os.utime(cache._path("aa"), (1, 1))
+    reopened = ArtifactCache(str(tmp_path), 6)
+    assert reopened.get("aa") is None
+    assert reopened.get("bb") == b"1234"
@@ -0,0 +1,86 @@
+import asyncio
+import subprocess
+
+import pytest
+
+from app.services.code_execution import CodeExecutor
+from app.services.checker import CHECK_DIR, CHECK_SCRIPT, CHECKER_CONFIGS, CheckerError, CheckerSession
+from tests.fake_backend import FakeBackend
+
+CHECKER = {"language": "python", "source": "import sys\nsys.exit(0)\n"}
+
+def test_checkers_dont_wait_on_submission_sandboxes():
+    # The checker's image is the submissions' too; with every sandbox of that
+    # image held by a submission, its checker still gets one
+    async def main():
+        backend = FakeBackend()
+        executor = CodeExecutor(backend, slots=2)
+        await executor.start()
+        try:
+            pool = executor.pools[backend.name].get(CHECKER_CONFIGS["python"]["image"])
+            held = [await pool.checkout(timeout=1) for _ in range(pool.config.max_size)]
+
+            async def check():
+                async with executor.checker_session(CHECKER) as checks:
+                    return checks is not None
+
+            checked = await asyncio.gather(*(asyncio.wait_for(check(), 5) for _ in held))
+            for pooled in held:
+                await pool.checkin(pooled)
+            return checked, backend.attached, len(held)
+        finally:
+            await executor.close()
+
+    checked, attached, held = asyncio.run(main())
+    assert checked == [True] * held
+    assert len(attached) == held and all("checker/checker.pyc" in cmd[-1] for _, cmd in attached)
+
+class FakeRunner:
+    """Stands in for the checker's RunnerSession, answering every check with result"""
+
+    def __init__(self, **result):
+        self.result = {"verdict": "OK", "exit_code": 0, "output": "", "error": "", **result}
+        self.sent = []
+
+    async def run(self, index, parts):
+        self.sent.append(b"".join(bytes(part) for part in parts))
+        return self.result
+
+def check(**result):
+    runner = FakeRunner(**result)
+    verdict = asyncio.run(CheckerSession(runner).check(0, "1 2\n", b"3\n", memoryview(b"3\n")))
+    return verdict, runner.sent
+
+@pytest.mark.parametrize("result, verdict", [
+    ({}, ("Accepted", 1.0, "Checker accepted the output")),
+    ({"verdict": "RE", "exit_code": 1, "error": "expected 3, got 4\n"}, ("Wrong Answer", 0.0, "expected 3, got 4")),
+    ({"verdict": "RE", "exit_code": 2}, ("Wrong Answer", 0.0, "Checker rejected the output")),
+    ({"verdict": "RE", "exit_code": 7, "error": "0.25 close\n"}, ("Partially Correct", 0.25, "0.25 close")),
+    ({"verdict": "RE", "exit_code": 7, "error": "3"}, ("Partially Correct", 1.0, "3")),
+])
+def test_exit_codes(result, verdict):
+    assert check(**result) == (verdict, [b"4 2\n1 2\n3\n3\n"])
+
+@pytest.mark.parametrize("result", [
+    {"verdict": "RE", "exit_code": 3},
+    {"verdict": "RE", "exit_code": 7, "error": "close"},
+    {"verdict": "TLE", "exit_code": 137},
+    {"verdict": "MLE", "exit_code": 137},
+])
+def test_checker_failures(result):
+    with pytest.raises(CheckerError):
+        check(**result)
+
+def run_check_script(tmp_path, checker, stdin):
+    """CHECK_SCRIPT run by a local sh, with its files in tmp_path instead of /sandbox/check"""
+    script = CHECK_SCRIPT.replace(CHECK_DIR, str(tmp_path / "check"))
+    return subprocess.run(["sh", "-c", script, "checker", "sh", "-c", checker, "checker"], input=stdin,
+                          capture_output=True)
+
+def test_check_script_splits_the_files(tmp_path):
+    run = run_check_script(tmp_path, 'cat "$1" "$2" "$3"; exit 7', b"4 2\n1 2\n3\n3 \n")
+    assert run.returncode == 7
+    assert [(tmp_path / "check" / name).read_bytes() for name in ("input", "output", "answer")] == [
+        b"1 2\n", b"3\n", b"3 \n"]
+    # Everything the checker prints goes to stderr, which the runner truncates instead of failing the check
+    assert run.stdout == b"" and run.stderr == b"1 2\n3\n3 \n"
@@ -0,0 +1,72 @@
+import pytest
+
+from app.services.comparator import Comparison, compare_streams
+
+# Chunk sizes that cut lines, tokens and numbers at every possible place
+CHUNK_SIZES = [1, 2, 3, 5, 64 * 1024]
+
+def split(data: bytes, size: int) -> list:
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def compare(actual: bytes, expected: bytes, mode: str, **eps):
+    """Results of comparing actual to expected for every pair of chunk sizes"""
+    return {compare_streams(split(actual, a), split(expected, e), Comparison(mode, **eps))[0]
+            for a in CHUNK_SIZES for e in CHUNK_SIZES}
+
+@pytest.mark.parametrize("actual, expected, passed", [
+    (b"1 2\n3\n", b"1 2\n3\n", True),
+    (b"1 2\n3\t\n\n \n", b"1 2\n3", True),  # whitespace at the end of the output
+    (b"1 2\n3", b"1 2\n3 \n\n", True),
+    (b"1 2\r\n3\r\n", b"1 2\n3\n", True),
+    (b"1 2 \n3\n", b"1 2 \r\n3", True),
+    (b"\n\n", b"\n", True),
+    (b"1 2   \n3\n", b"1 2\n3\n", False),  # but not at the end of earlier lines
+    (b"1 2\n3\n", b"1 2 \n3\n", False),
+    (b"1\n \n3\n", b"1\n\n3\n", False),
+    (b"1\r2\n", b"1\n2\n", False),
+    (b"1\n\n\n", b"1\n\n2\n", False),
+    (b"1 2\n4\n", b"1 2\n3\n", False),
+    (b"1  2\n3\n", b"1 2\n3\n", False),  # spacing inside a line matters
+    (b"1 2\n\n3\n", b"1 2\n3\n", False),  # so do blank lines before more output
+    (b"1 2\n", b"1 2\n3\n", False),
+    (b"1 2\n3\n4\n", b"1 2\n3\n", False),
+])
+def test_exact(actual, expected, passed):
+    assert compare(actual, expected, "exact") == {passed}
+
+@pytest.mark.parametrize("actual, expected, passed", [
+    (b"1   2\n\n3", b"1 2 3\n", True),
+    (b"  10\t20\n", b"10 20", True),
+    (b"12 3", b"1 23", False),  # a token cut by a chunk is still one token
+    (b"1 2", b"1 2 3", False),
+    (b"1 2 3 4", b"1 2 3", False),
+    (b"1.0", b"1", False),  # numbers are tokens like any other
+])
+def test_token(actual, expected, passed):
+    assert compare(actual, expected, "token") == {passed}
+
+@pytest.mark.parametrize("actual, expected, passed", [
+    (b"0.3333334 1000\n", b"0.3333333 1e3", True),
+    (b"1000000.5", b"1000000", True),  # within the relative tolerance
+    (b"0.34", b"0.3333333", False),
+    (b"yes 1.0000001", b"yes 1", True),
+    (b"Yes 1", b"yes 1", False),  # other tokens still match exactly
+    (b"1e", b"1", False),
+])
+def test_float(actual, expected, passed):
+    assert compare(actual, expected, "float", abs_eps=1e-6, rel_eps=1e-6) == {passed}
+
+@pytest.mark.parametrize("actual, expected, passed", [
+    (b"c\na\nb\n", b"a\nb\nc\n", True),
+    (b"b  \n\na\n", b"a\nb", True),
+    (b"a\na\nb\n", b"a\nb\nb\n", False),  # same lines, different counts
+    (b"a\nb\n", b"a\nb\nc\n", False),
+    (b"ab\n", b"a\nb\n", False),
+])
+def test_unordered(actual, expected, passed):
+    assert compare(actual, expected, "unordered") == {passed}
+
+def test_mismatch_details_point_at_the_difference():
+    passed, details = compare_streams(split(b"1\n2\n9\n", 1), [b"1\n2\n3\n"])
+    assert not passed
+    assert "line 3" in details and "'3'" in details and "'9'" in details
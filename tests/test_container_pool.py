@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.container_pool import ContainerPool, ContainerPoolManager, PoolConfig
+from tests.fake_backend import FakeBackend
+
+def run_pool(test, config=PoolConfig(min_size=0, max_size=2, max_uses=3), **kwargs):
+    """Run test(pool, backend) with a pool of fake sandboxes"""
+    backend = FakeBackend()
+
+    async def main():
+        pool = ContainerPool(backend, "python:3.8", config, **kwargs)
+        try:
+            return await test(pool, backend)
+        finally:
+            await pool.shutdown()
+
+    return asyncio.run(main())
+
+def test_checkout_waits_for_a_checkin_when_full():
+    async def test(pool, backend):
+        first, second = await pool.checkout(), await pool.checkout()
+        with pytest.raises(TimeoutError):
+            await pool.checkout(timeout=0.05)
+        waiting = asyncio.ensure_future(pool.checkout(timeout=5))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        await pool.checkin(first)
+        assert (await waiting).sandbox == first.sandbox
+        return backend.created
+
+    assert run_pool(test) == 2
+
+def test_checkin_scrubs_and_recycles():
+    async def test(pool, backend):
+        pooled = await pool.checkout()
+        await pool.checkin(pooled)
+        assert backend.commands[-1][1][0] == "sh" and "rm -rf" in backend.commands[-1][1][2]
+        assert pool.idle == [pooled] and not backend.removed
+
+        # A failed scrub, a discarded run and max_uses all throw the sandbox away
+        backend.exec_result = lambda sandbox, cmd: (1, b"")
+        await pool.checkin(await pool.checkout())
+        assert backend.removed == [pooled.sandbox]
+        backend.exec_result = lambda sandbox, cmd: (0, b"")
+        async with pool.lease():
+            pass
+        with pytest.raises(ValueError):
+            async with pool.lease():
+                raise ValueError()
+        assert len(backend.removed) == 2
+        for _ in range(3):
+            async with pool.lease() as pooled:
+                pass
+        return pooled.uses, pool.idle, backend.removed
+
+    uses, idle, removed = run_pool(test)
+    assert uses == 3 and not idle and len(removed) == 3
+
+def test_dead_idle_sandbox_is_replaced():
+    async def test(pool, backend):
+        pooled = await pool.checkout()
+        await pool.checkin(pooled)
+        backend.running[pooled.sandbox] = False
+        replacement = await pool.checkout()
+        return pooled.sandbox, replacement.sandbox, backend.removed
+
+    dead, replacement, removed = run_pool(test)
+    assert replacement != dead and removed == [dead]
+
+def test_replenisher_keeps_min_size_warm():
+    async def test(pool, backend):
+        for _ in range(100):
+            if len(pool.idle) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await pool.checkout()
+        for _ in range(100):
+            if len(pool.idle) == 2:
+                break
+            await asyncio.sleep(0.01)
+        return len(pool.idle), pool.in_use
+
+    assert run_pool(test, PoolConfig(min_size=2, max_size=4, max_uses=3)) == (2, 1)
+
+def test_checkout_prefers_a_sandbox_on_the_same_cores():
+    async def test(pool, backend):
+        first, second = await pool.checkout(), await pool.checkout()
+        assert await pool.configure(first, cpuset="0") and await pool.configure(second, cpuset="1")
+        await pool.checkin(first)
+        await pool.checkin(second)
+        return (await pool.checkout(cpuset="0")).sandbox, first.sandbox
+
+    taken, first = run_pool(test)
+    assert taken == first
+
+def test_pools_hold_a_sandbox_per_slot(monkeypatch):
+    async def main():
+        backend = FakeBackend()
+        configs = {"gcc:latest": PoolConfig(min_size=0, max_size=8)}
+        manager = ContainerPoolManager(backend, configs, slots=6)
+        default, configured = manager.get("python:3.8"), manager.get("gcc:latest")
+        sizes = default.config.max_size, configured.config.max_size
+        # All six slots judging Python at once each get a sandbox without waiting
+        checkouts = await asyncio.gather(*(default.checkout(timeout=0) for _ in range(6)))
+        await manager.shutdown()
+        return sizes, len({pooled.sandbox for pooled in checkouts}), configs["gcc:latest"].max_size
+
+    monkeypatch.setattr(settings, "DOCKER_POOL_MIN_SIZE", 0)
+    monkeypatch.setattr(settings, "DOCKER_POOL_MAX_SIZE", 4)
+    assert asyncio.run(main()) == ((6, 8), 6, 8)
+
+def test_setup_runs_on_every_new_sandbox():
+    prepared = []
+
+    async def setup(sandbox):
+        prepared.append(sandbox)
+        if len(prepared) == 2:
+            raise RuntimeError("no runner")
+
+    async def test(pool, backend):
+        first = await pool.checkout()
+        with pytest.raises(RuntimeError):
+            await pool.checkout()
+        # The sandbox that failed its setup is gone and doesn't count against the pool
+        return first.sandbox, backend.removed, pool.size
+
+    first, removed, size = run_pool(test, setup=setup)
+    assert prepared[0] == first and removed == [prepared[1]] and size == 1
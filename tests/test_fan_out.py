@@ -0,0 +1,62 @@
+import asyncio
+
+from app.services import code_execution
+
+def fan_out_run(groups, early_termination, delays, failing=(), lanes=3):
+    """
+    Judge len(groups) fake tests on lanes as CodeExecutor.execute does. Test
+    i takes delays[i] seconds and fails if it is in failing. Returns the
+    results, the order on_test_result saw them in, the tests judged to the
+    end and the tests interrupted.
+    """
+    emitted, finished, interrupted = [], [], []
+
+    async def judge(i):
+        try:
+            await asyncio.sleep(delays[i])
+        except asyncio.CancelledError:
+            interrupted.append(i)
+            raise
+        finished.append(i)
+        return {"test_case": i + 1, "passed": i not in failing, "score": 0.0 if i in failing else 1.0}
+
+    async def main():
+        fan_out = code_execution.TestFanOut(groups, early_termination, lambda result: emitted.append(result["test_case"]))
+
+        async def lane():
+            while (i := fan_out.take()) is not None:
+                await fan_out.judge(i, judge(i))
+
+        return await fan_out.run([lane() for _ in range(lanes)])
+
+    results = asyncio.run(main())
+    return [result["test_case"] for result in results], emitted, sorted(finished), sorted(interrupted)
+
+def test_results_merge_in_test_order():
+    # Later tests finish first
+    results, emitted, finished, _ = fan_out_run([None] * 6, True, [0.06, 0.05, 0.04, 0.03, 0.02, 0.01])
+    assert results == emitted == [1, 2, 3, 4, 5, 6]
+    assert finished == list(range(6))
+
+def test_failure_skips_and_interrupts_the_rest_of_the_run():
+    # Test 2 fails while test 3 is running and 4 to 6 are still queued
+    results, emitted, finished, interrupted = fan_out_run(
+        [None] * 6, True, [0.01, 0.02, 1.0, 1.0, 1.0, 1.0], failing={1}, lanes=2)
+    assert results == emitted == [1, 2]
+    assert interrupted == [2]
+    assert finished == [0, 1]
+
+def test_earlier_failure_wins_over_a_later_one():
+    # Test 3 fails first, but test 2, still running, fails too and is the verdict
+    results, emitted, _, _ = fan_out_run([None] * 4, True, [0.01, 0.1, 0.01, 0.01], failing={1, 2}, lanes=2)
+    assert results == emitted == [1, 2]
+
+def test_failure_only_skips_its_own_subtask():
+    results, emitted, finished, _ = fan_out_run([1, 1, 1, 2, 2], True, [0.01] * 5, failing={0}, lanes=1)
+    assert results == emitted == [1, 4, 5]
+    assert finished == [0, 3, 4]
+
+def test_without_early_termination_every_test_is_judged():
+    results, emitted, finished, interrupted = fan_out_run([None] * 5, False, [0.01] * 5, failing={0, 2})
+    assert results == emitted == [1, 2, 3, 4, 5]
+    assert interrupted == []
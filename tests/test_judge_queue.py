@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.models.models import Submission
+from app.services.judge_queue import find_judged_submission, result_key
+
+CODE = "n = int(input())\nprint(n * 2)\n"
+
+def problem(**changes):
+    fields = dict(id=1, test_version=1, time_limit_ms=2000, memory_limit_mb=128, comparison_mode="exact",
+                  float_abs_eps=1e-6, float_rel_eps=1e-6, checker_language=None, checker_source=None)
+    fields.update(changes)
+    return SimpleNamespace(**fields)
+
+@pytest.mark.parametrize("changes", [
+    {"test_version": 2},
+    {"time_limit_ms": 1000},
+    {"memory_limit_mb": 256},
+    {"comparison_mode": "token"},
+    {"float_abs_eps": 1e-3},
+    {"checker_language": "python", "checker_source": "import sys"},
+    {"id": 2},
+])
+def test_result_key_changes_with_the_judging_setup(changes):
+    assert result_key(problem(**changes), "python", CODE) != result_key(problem(), "python", CODE)
+
+def test_result_key_changes_with_the_checker_source():
+    checker = {"checker_language": "python"}
+    assert (result_key(problem(**checker, checker_source="import sys"), "python", CODE)
+            != result_key(problem(**checker, checker_source="import sys\nsys.exit(1)"), "python", CODE))
+
+def test_result_key_changes_with_the_judge_version(monkeypatch):
+    before = result_key(problem(), "python", CODE)
+    monkeypatch.setattr(settings, "JUDGE_VERSION", "2")
+    assert result_key(problem(), "python", CODE) != before
+
+def test_result_key_ignores_only_line_endings():
+    assert result_key(problem(), "python", CODE.replace("\n", "\r\n")) == result_key(problem(), "python", CODE)
+    assert result_key(problem(), "python", CODE.replace("print", " print")) != result_key(problem(), "python", CODE)
+    assert result_key(problem(), "c++", CODE) != result_key(problem(), "python", CODE)
+
+@pytest.mark.parametrize("code, edited", [
+    (CODE, CODE.replace("\n", "   \n")),
+    ('print("""a\nb""")\n', 'print("""a  \nb""")\n'),  # a different program's output
+    ("x = 1 + \\\n2\n", "x = 1 + \\ \n2\n"),         # a syntax error
+    (CODE, "\n" + CODE + "\n"),
+])
+def test_result_key_changes_with_whitespace_edits(code, edited):
+    assert result_key(problem(), "python", edited) != result_key(problem(), "python", code)
+
+def judged(db, status, verdicts, key="k", finished=True):
+    submission = Submission(problem_id=1, language="python", code=CODE, status=status, is_run=False, priority=1,
+                            result_key=key, submitted_at=datetime.utcnow(),
+                            finished_at=datetime.utcnow() if finished else None,
+                            result=json.dumps({"test_results": [{"verdict": verdict} for verdict in verdicts]}))
+    db.add(submission)
+    db.commit()
+    return submission.id
+
+def test_latest_judged_result_is_reused(db):
+    judged(db, "Accepted", ["Accepted", "Accepted"])
+    wrong = judged(db, "Wrong Answer", ["Accepted", "Wrong Answer"])
+    judged(db, "Running", [], finished=False)
+    judged(db, "Accepted", ["Accepted"], key="other")
+    assert find_judged_submission(db, "k").id == wrong
+    assert find_judged_submission(db, "missing") is None
+
+@pytest.mark.parametrize("status, verdicts", [
+    ("Judge Error", []),
+    ("Time Limit Exceeded", ["Accepted", "Time Limit Exceeded"]),
+    ("Memory Limit Exceeded", ["Memory Limit Exceeded"]),
+    ("Wrong Answer", ["Wrong Answer", "Time Limit Exceeded"]),  # a later test timed out
+])
+def test_load_dependent_results_are_never_reused(db, status, verdicts):
+    accepted = judged(db, "Accepted", ["Accepted"])
+    judged(db, status, verdicts)
+    assert find_judged_submission(db, "k").id == accepted
+
+def test_result_cache_can_be_turned_off(db, monkeypatch):
+    judged(db, "Accepted", ["Accepted"])
+    monkeypatch.setattr(settings, "JUDGE_RESULT_CACHE", False)
+    assert find_judged_submission(db, "k") is None
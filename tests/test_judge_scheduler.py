@@ -0,0 +1,54 @@
+import pytest
+
+from app.core.config import settings
+from app.services import judge_scheduler
+from app.services.judge_queue import claim_next_job, enqueue_submission
+
+@pytest.mark.parametrize("cpuset, cpus", [("2", [2]), ("2,3", [2, 3]), ("4-7", [4, 5, 6, 7]), ("0,2-3", [0, 2, 3])])
+def test_expand_cpuset(cpuset, cpus):
+    assert judge_scheduler.expand_cpuset(cpuset) == cpus
+
+@pytest.fixture
+def host(monkeypatch):
+    for name, value in [("JUDGE_PIN_CPUS", True), ("JUDGE_CPUS_PER_SLOT", 1), ("JUDGE_RESERVED_CPUS", 1),
+                        ("JUDGE_MEMORY_PER_SLOT_MB", 1024), ("JUDGE_RESERVED_MEMORY_MB", 1024)]:
+        monkeypatch.setattr(settings, name, value)
+    return monkeypatch
+
+def test_one_pinned_slot_per_core_past_the_reserved_ones(host):
+    assert judge_scheduler.plan_slots(16, list(range(8)), 16384) == ["1", "2", "3", "4", "5", "6", "7"]
+    assert judge_scheduler.plan_slots(3, list(range(8)), 16384) == ["1", "2", "3"]
+    assert judge_scheduler.plan_slots(0, list(range(8)), 16384) == []
+
+def test_slots_with_several_cores(host):
+    host.setattr(settings, "JUDGE_CPUS_PER_SLOT", 2)
+    assert judge_scheduler.plan_slots(16, list(range(8)), 16384) == ["1,2", "3,4", "5,6"]
+
+def test_memory_caps_the_slots(host):
+    assert judge_scheduler.plan_slots(16, list(range(8)), 3072) == ["1", "2"]
+    assert judge_scheduler.plan_slots(16, list(range(8)), 0) == ["1", "2", "3", "4", "5", "6", "7"]  # unknown
+
+def test_small_or_unpinned_hosts(host):
+    assert judge_scheduler.plan_slots(4, [0], 16384) == [None]
+    host.setattr(settings, "JUDGE_PIN_CPUS", False)
+    assert judge_scheduler.plan_slots(4, list(range(8)), 16384) == [None] * 4
+
+@pytest.mark.parametrize("cpuset, tests, lanes", [
+    ("2,3,4,5", 10, ["2", "3", "4"]),  # a core each
+    ("2,3", 10, ["2", "3"]),
+    ("2,3", 1, ["2,3"]),  # one test keeps the whole slot
+    ("2", 10, ["2"]),
+    (None, 10, [None, None, None]),
+])
+def test_lanes_get_cores_of_their_own(monkeypatch, cpuset, tests, lanes):
+    monkeypatch.setattr(settings, "JUDGE_PARALLEL_TESTS", 3)
+    assert judge_scheduler.test_lanes(cpuset, tests) == lanes
+
+def test_runs_go_first_then_contest_then_practice(db):
+    practice = enqueue_submission(db, 1, "python", "print(1)").id
+    contest = enqueue_submission(db, 1, "python", "print(1)", contest=True).id
+    run = enqueue_submission(db, 1, "python", "print(1)", is_run=True).id
+    later_practice = enqueue_submission(db, 1, "python", "print(1)").id
+    claimed = [claim_next_job(db).id for _ in range(4)]
+    assert claimed == [run, contest, practice, later_practice]
+    assert claim_next_job(db) is None
@@ -0,0 +1,62 @@
+import ast
+from pathlib import Path
+
+import pytest
+
+from app.models.models import tag_key as model_tag_key
+
+VERSIONS = Path(__file__).resolve().parents[1] / "alembic" / "versions"
+
+def migration_functions(name: str, *functions: str) -> list:
+    """
+    Functions of a migration, loaded with its imports but without running
+    the rest of it: the migration's alembic import needs alembic installed
+    and a migration context, and the data helpers tested here use neither.
+    """
+    path = VERSIONS / f"{name}.py"
+    body = [node for node in ast.parse(path.read_text()).body
+            if (isinstance(node, ast.Import) and all(alias.name != "alembic" for alias in node.names))
+            or (isinstance(node, ast.ImportFrom) and node.module != "alembic")
+            or (isinstance(node, ast.FunctionDef) and node.name in functions)]
+    namespace = {}
+    exec(compile(ast.Module(body=body, type_ignores=[]), str(path), "exec"), namespace)
+    return [namespace[function] for function in functions]
+
+split_tests, = migration_functions("0007_test_case_rows", "split_tests")
+parse, tag_key = migration_functions("0011_problem_json_tags", "parse", "tag_key")
+
+@pytest.mark.parametrize("input_data, expected_output, tests", [
+    # One line per test
+    ("3\n1 2\n3 4\n5 6\n", "3\n3\n7\n11\n", [("1 2", "3"), ("3 4", "7"), ("5 6", "11")]),
+    # Several lines per test, and a different number for the outputs
+    ("2\n2\n1 2\n3\n4 5 6", "2\n3\n15", [("2\n1 2", "3"), ("3\n4 5 6", "15")]),
+    ("1\nhello\n", "1\nHELLO", [("hello", "HELLO")]),
+    ("\n2\na\nb\n\n", "2\nx\ny", [("a", "x"), ("b", "y")]),
+])
+def test_split_tests_on_old_multi_test_rows(input_data, expected_output, tests):
+    assert split_tests(input_data, expected_output) == tests
+
+@pytest.mark.parametrize("input_data, expected_output", [
+    ("1 2", "3"),  # no count header: a single test
+    ("2\n1\n2\n3", "2\n1\n2"),  # lines don't divide evenly between the tests
+    ("2\n1\n2", "3\n1\n2\n3"),  # counts disagree
+    ("0\n", "0\n"),
+    (None, None),
+])
+def test_split_tests_keeps_rows_that_dont_fit(input_data, expected_output):
+    assert split_tests(input_data, expected_output) is None
+
+@pytest.mark.parametrize("value, document", [
+    ('["Array", "Hash Table"]', ["Array", "Hash Table"]),
+    ('[{"input": "1", "output": "2"}]', [{"input": "1", "output": "2"}]),
+    ("", None),
+    (None, None),
+    ("[unterminated", None),
+])
+def test_json_columns_are_parsed(value, document):
+    assert parse(value) == document
+
+@pytest.mark.parametrize("tag, key", [("Array", "array"), ("Hash Table", "hash-table"),
+                                      ("  two   pointers ", "two-pointers"), ("DP", "dp")])
+def test_tag_keys_match_the_model(tag, key):
+    assert tag_key(tag) == model_tag_key(tag) == key
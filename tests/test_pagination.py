@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.api.problems import decode_cursor, encode_cursor, load_problems
+from app.db.database import Base
+from app.models.models import Problem
+
+# (title, acceptance) of each problem, in id order: plenty of ties on both
+PROBLEMS = [("B", 50.0), ("A", 50.0), ("B", 20.0), ("C", 50.0), ("A", 80.0), ("B", 50.0), ("A", 20.0)]
+
+SORT_KEYS = {
+    "id": lambda problem: (problem[0],),
+    "title": lambda problem: (problem[1], problem[0]),
+    "acceptance": lambda problem: (problem[2], problem[0]),
+}
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(50.0, 7)
+    assert decode_cursor(cursor, (float, int)) == [50.0, 7]
+    assert decode_cursor(encode_cursor("Two Sum", 1), (str, int)) == ["Two Sum", 1]
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(1), encode_cursor(None, 1),
+                                    encode_cursor("x", 1)])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, (float, int))
+    assert error.value.status_code == 400
+
+async def page_through(sort: str, descending: bool, limit: int) -> list:
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(engine)() as db:
+            db.add_all([Problem(id=i + 1, title=title, description="", difficulty="Easy", acceptance=acceptance)
+                        for i, (title, acceptance) in enumerate(PROBLEMS)])
+            await db.commit()
+            ids, cursor = [], None
+            while True:
+                page = await load_problems(db, limit=limit, cursor=cursor, sort=sort, descending=descending,
+                                           difficulty=None, tags=[])
+                assert page["total"] == len(PROBLEMS)
+                assert len(page["problems"]) <= limit
+                ids += [problem["id"] for problem in page["problems"]]
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    return ids
+    finally:
+        await engine.dispose()
+
+@pytest.mark.parametrize("sort", list(SORT_KEYS))
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("limit", [1, 2, 3, 7])
+def test_pages_cover_every_problem_once_in_order(sort, descending, limit):
+    rows = [(i + 1, title, acceptance) for i, (title, acceptance) in enumerate(PROBLEMS)]
+    expected = [row[0] for row in sorted(rows, key=SORT_KEYS[sort], reverse=descending)]
+    assert asyncio.run(page_through(sort, descending, limit)) == expected
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import pytest
+from starlette.requests import Request
+
+from app.api import problems
+from app.services.problem_cache import ProblemCache, etag_for
+
+def test_get_put_and_invalidate():
+    cache = ProblemCache(60, 8)
+    assert cache.get("problem:1") is None
+    body, etag = cache.put("problem:1", b'{"id": 1}', cache.generation())
+    assert etag == etag_for(b'{"id": 1}') and etag.startswith('"')
+    assert cache.get("problem:1") == (body, etag)
+    cache.invalidate()
+    assert cache.get("problem:1") is None
+
+def test_response_built_across_an_invalidation_is_not_kept():
+    cache = ProblemCache(60, 8)
+    generation = cache.generation()
+    cache.invalidate()  # a write lands while the response is built
+    assert cache.put("problems", b"[]", generation) == (b"[]", etag_for(b"[]"))
+    assert cache.get("problems") is None
+
+def test_entries_expire_and_are_capped():
+    cache = ProblemCache(0.05, 2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.encode(), cache.generation())
+    assert cache.get("a") is None and cache.get("c") is not None
+    time.sleep(0.06)
+    assert cache.get("c") is None
+    assert ProblemCache(0, 8).put("a", b"a", (0,)) == (b"a", etag_for(b"a"))  # a TTL of 0 turns caching off
+
+def test_processes_share_entries_and_invalidations(tmp_path):
+    writer, reader = ProblemCache(60, 8, str(tmp_path)), ProblemCache(60, 8, str(tmp_path))
+    writer.put("problem:1", b"old", writer.generation())
+    assert reader.get("problem:1") == (b"old", etag_for(b"old"))
+    time.sleep(0.01)  # so the stamp's mtime is past the entry's
+    writer.invalidate()
+    assert reader.get("problem:1") is None
+    reader.put("problem:1", b"new", reader.generation())
+    assert writer.get("problem:1") == (b"new", etag_for(b"new"))
+
+@pytest.mark.parametrize("if_none_match, matches", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", "abc"', True),
+    ("*", True),
+    ('"xyz"', False),
+    ("", False),
+])
+def test_etag_matches(if_none_match, matches):
+    assert problems.etag_matches(if_none_match, '"abc"') == matches
+
+def test_cached_response_and_revalidation(monkeypatch):
+    monkeypatch.setattr(problems, "problem_cache", ProblemCache(60, 8))
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return {"id": 1}
+
+    def get(if_none_match=None):
+        headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+        request = Request({"type": "http", "method": "GET", "path": "/problems/1", "headers": headers})
+        return asyncio.run(problems.cached_response(request, "problem:1", build))
+
+    first = get()
+    assert first.status_code == 200 and first.body == b'{"id": 1}'
+    etag = first.headers["etag"]
+    revalidated = get(etag)
+    assert revalidated.status_code == 304 and revalidated.body == b"" and revalidated.headers["etag"] == etag
+    assert get('"stale"').body == first.body
+    assert len(builds) == 1
@@ -0,0 +1,116 @@
+import asyncio
+import shutil
+import subprocess
+
+import pytest
+
+from app.services.judge_backend import ExecSession, JudgeBackendError, ProcessExecSession
+from app.services.sandbox_runner import RUNNER_SOURCE, RunnerSession
+
+# The runner built from RUNNER_SOURCE and run on this host, as a sandbox
+# would run it; memory limits come from the sandbox's cgroup, so MLE isn't
+# covered here
+
+@pytest.fixture(scope="module")
+def runner(tmp_path_factory):
+    if shutil.which("gcc") is None:
+        pytest.skip("gcc is needed to build the runner")
+    directory = tmp_path_factory.mktemp("runner")
+    (directory / "runner.c").write_text(RUNNER_SOURCE)
+    subprocess.run(["gcc", "-O2", "-o", str(directory / "runner"), str(directory / "runner.c")], check=True)
+    return str(directory / "runner")
+
+def run_tests(runner, command, inputs, wall_ms=5000, cpu_ms=2000, output_limit=1024, preview_limit=None):
+    """Results of running command on each input through one runner session"""
+    async def main():
+        process = await asyncio.create_subprocess_exec(
+            runner, str(wall_ms), str(cpu_ms), str(256 * 1024), str(output_limit), "--", *command,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        session = RunnerSession(ProcessExecSession(process), output_limit, preview_limit)
+        results = []
+        for index, data in enumerate(inputs):
+            output = bytearray()
+            result = await session.run(index, data, on_output=output.extend)
+            results.append((result, bytes(output)))
+        await session.close()
+        assert await process.wait() == 0
+        return results
+
+    return asyncio.run(main())
+
+def test_tests_run_one_after_another(runner):
+    results = run_tests(runner, ["sh", "-c", 'read n; echo $((n * 2)); echo done >&2'], [b"1\n", b"21\n", b""])
+    assert [(result["index"], result["verdict"], output) for result, output in results] == [
+        (0, "OK", b"2\n"), (1, "OK", b"42\n"), (2, "OK", b"0\n")]
+    assert all(result["error"] == "done\n" for result, _ in results)
+
+def test_exit_codes_and_signals(runner):
+    results = run_tests(runner, ["sh", "-c", 'read code; [ "$code" = segv ] && kill -SEGV $$; exit $code'],
+                        [b"0\n", b"3\n", b"segv\n"])
+    assert [(result["verdict"], result["exit_code"]) for result, _ in results] == [("OK", 0), ("RE", 3), ("RE", 139)]
+
+def test_a_sigkill_the_runner_didnt_send_is_the_oom_killer(runner):
+    (result, _), = run_tests(runner, ["sh", "-c", "kill -9 $$"], [b""])
+    assert (result["verdict"], result["exit_code"]) == ("MLE", 137)
+
+def test_cpu_and_wall_limits(runner):
+    (busy, _), = run_tests(runner, ["sh", "-c", "while :; do :; done"], [b""], cpu_ms=100)
+    assert busy["verdict"] == "TLE" and busy["cpu_ms"] >= 100
+    (sleeping, _), = run_tests(runner, ["sleep", "5"], [b""], wall_ms=200)
+    assert sleeping["verdict"] == "TLE" and 200 <= sleeping["wall_ms"] < 2000
+
+def test_output_past_the_limit(runner):
+    (result, output), = run_tests(runner, ["yes"], [b""], output_limit=1000, preview_limit=10)
+    assert result["verdict"] == "OLE"
+    assert result["output_bytes"] == 1001 and len(output) == 1001
+    assert result["output"] == "y\ny\ny\ny\ny\n"
+
+def test_large_input_and_output_stream_through(runner):
+    data = bytes(range(256)) * 16 * 1024  # 4 MB, more than any pipe buffers
+    (result, output), = run_tests(runner, ["cat"], [[memoryview(data), b"", data[:10]]],
+                                  output_limit=len(data) + 10, preview_limit=16)
+    assert result["verdict"] == "OK"
+    assert output == data + data[:10]
+    assert result["output_bytes"] == len(data) + 10 and len(result["output"]) <= 16  # only the preview is kept
+
+def test_unread_input_is_skipped(runner):
+    results = run_tests(runner, ["head", "-c", "3"], [b"x" * 1024 * 1024, b"abcdef"])
+    assert [output for _, output in results] == [b"xxx", b"abc"]
+
+class ReplaySession(ExecSession):
+    """Plays back canned runner output a few bytes at a time, recording what is written"""
+
+    def __init__(self, output: bytes):
+        self.output = output
+        self.written = bytearray()
+
+    async def write(self, data):
+        self.written += data
+
+    async def read(self):
+        chunk, self.output = self.output[:3], self.output[3:]
+        return chunk
+
+def replay(output: bytes, index=0, output_limit=8):
+    session = ReplaySession(output)
+    result = asyncio.run(RunnerSession(session, output_limit).run(index, [b"in", b"put"]))
+    return result, bytes(session.written)
+
+def test_frames_are_parsed_across_reads():
+    result, written = replay(b"@@out 0 3\nabc@@err 0 2\nno@@out 0 2\nde@@result 0 OK 0 5 4 100 5 2\n")
+    assert written == b"@@test 0 5\ninput"
+    assert (result["output"], result["error"], result["output_bytes"]) == ("abcde", "no", 5)
+    assert (result["wall_ms"], result["cpu_ms"], result["rss_kb"]) == (5, 4, 100)
+
+def test_output_past_the_limit_is_dropped_whatever_the_runner_says():
+    result, _ = replay(b"@@out 0 6\nabcdef@@out 0 6\nghijkl@@result 0 OK 0 1 1 1 12 0\n")
+    assert result["output"] == "abcdef" and result["output_bytes"] == 9
+
+def test_runner_that_dies_mid_test_is_a_runtime_error():
+    result, _ = replay(b"@@out 0 2\nab")
+    assert (result["verdict"], result["exit_code"], result["output"]) == ("RE", 255, "ab")
+
+@pytest.mark.parametrize("output", [b"hello\n", b"@@result 1 OK 0 1 1 1 0 0\n", b"@@out 0 5\nab"])
+def test_unexpected_runner_output(output):
+    with pytest.raises(JudgeBackendError):
+        replay(output)
@@ -0,0 +1,25 @@
+import pytest
+
+from app.services.code_execution import score_tests
+
+@pytest.mark.parametrize("judged, subtask_scores, score", [
+    ({1: 1.0, 2: 1.0, 3: 1.0, 4: 1.0}, {1: 40.0, 2: 60.0}, 100.0),
+    ({1: 1.0, 2: 1.0, 3: 0.5, 4: 1.0}, {1: 40.0, 2: 30.0}, 70.0),  # a checker's partial score
+    ({1: 0.0, 3: 1.0, 4: 1.0}, {1: 0.0, 2: 60.0}, 60.0),  # test 2 skipped after test 1 failed
+])
+def test_subtask_scoring(judged, subtask_scores, score):
+    test_cases = [{"group": 1}, {"group": 1}, {"group": 2}, {"group": 2}]
+    results = [{"test_case": number, "score": value} for number, value in judged.items()]
+    assert score_tests(test_cases, results, {1: 40.0, 2: 60.0}) == (score, 100.0, subtask_scores)
+
+def test_weighted_scoring_without_subtasks():
+    test_cases = [{"weight": 1.0}, {"weight": 3.0}, {}]
+    results = [{"test_case": 1, "score": 1.0}, {"test_case": 2, "score": 0.5}]
+    assert score_tests(test_cases, results) == (50.0, 100.0, None)
+
+def test_subtask_without_tests_earns_nothing():
+    assert score_tests([{"group": 1}], [{"test_case": 1, "score": 1.0}], {1: 50.0, 2: 50.0}) == (
+        50.0, 100.0, {1: 50.0, 2: 0.0})
+
+def test_no_tests_score_zero():
+    assert score_tests([], []) == (0.0, 100.0, None)
@@ -0,0 +1,81 @@
+import os
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.models import models
+from app.services import test_data
+from app.services.test_data import case_text, import_test_pack, new_test_case, open_cached_tests, store_test_data
+
+@pytest.fixture
+def inline_limit(monkeypatch):
+    monkeypatch.setattr(settings, "TEST_DATA_INLINE_LIMIT", 8)
+
+def test_small_text_is_stored_inline(inline_limit):
+    assert store_test_data("1 2\n") == ("1 2\n", None)
+    assert store_test_data(None) == (None, None)
+
+@pytest.mark.parametrize("data", [b"123456789", b"1\x002", b"\xff\xfe"])
+def test_large_or_binary_data_goes_to_the_store(inline_limit, data):
+    text, blob = store_test_data(data)
+    assert text is None
+    assert test_data.test_data_store.read(blob) == data
+    assert store_test_data(data) == (None, blob)  # same content, same file
+
+def test_case_text_is_cut_at_the_limit(inline_limit):
+    case = new_test_case(1, 1, "abc", "0123456789")
+    assert case.expected_output is None
+    assert case_text(case) == ("abc", "0123456789")
+    assert case_text(case, limit=2) == ("ab", "01")
+
+def add_tests(db, problem_id, tests):
+    for ordinal, (test_input, answer, subtask) in enumerate(tests, start=1):
+        db.add(new_test_case(problem_id, ordinal, test_input, answer, is_sample=ordinal == 1, subtask=subtask))
+    db.commit()
+
+def test_cache_materializes_a_version_once(db, tmp_path, inline_limit):
+    cache = test_data.TestDataCache(str(tmp_path))
+    add_tests(db, 1, [("1\n", "2\n", None), ("x" * 20, "y" * 20, 2)])
+    directory, manifest = cache.tests(db, SimpleNamespace(id=1, test_version=1))
+    assert [(entry["number"], entry["is_sample"], entry["subtask"]) for entry in manifest] == [
+        (1, True, None), (2, False, 2)]
+    assert open(os.path.join(directory, "2.out"), "rb").read() == b"y" * 20
+
+    # Later lookups don't go to the database, and a reopened cache reads the manifest from disk
+    db.query(models.TestCase).delete()
+    db.commit()
+    assert cache.tests(db, SimpleNamespace(id=1, test_version=1))[1] == manifest
+    assert test_data.TestDataCache(str(tmp_path)).tests(db, SimpleNamespace(id=1, test_version=1))[1] == manifest
+
+    with open_cached_tests(directory, manifest) as tests:
+        assert [(bytes(test["input"]), test["group"]) for test in tests] == [(b"1\n", None), (b"x" * 20, 2)]
+    with open_cached_tests(directory, manifest, samples_only=True) as tests:
+        assert [test["id"] for test in tests] == [manifest[0]["id"]]
+
+def test_cache_keeps_only_the_previous_version(db, tmp_path):
+    cache = test_data.TestDataCache(str(tmp_path))
+    for version in (1, 2, 3):
+        cache.tests(db, SimpleNamespace(id=1, test_version=version))
+    assert sorted(os.listdir(tmp_path / "1")) == ["2", "3"]
+
+def test_pack_order_samples_and_subtasks(db, tmp_path):
+    pack = tmp_path / "pack.zip"
+    with zipfile.ZipFile(pack, "w") as archive:
+        for name, data in [("10.in", "10"), ("10.ans", "a10"), ("2.in", "2"), ("2.out", "a2"),
+                           ("sample/1.in", "s"), ("sample/1.out", "as"),
+                           ("subtask3/1.in", "t"), ("subtask3/1.out", "at")]:
+            archive.writestr(name, data)
+    assert import_test_pack(db, 1, str(pack)) == 4
+    rows = db.query(models.TestCase).order_by(models.TestCase.ordinal).all()
+    assert [(row.input_data, row.is_sample, row.subtask) for row in rows] == [
+        ("s", True, None), ("2", False, None), ("10", False, None), ("t", False, 3)]
+
+    assert import_test_pack(db, 1, str(pack), replace=False) == 4
+    assert db.query(models.TestCase).count() == 8
+
+def test_pack_without_answers_is_rejected(db, tmp_path):
+    (tmp_path / "1.in").write_text("1")
+    with pytest.raises(test_data.TestDataError):
+        import_test_pack(db, 1, str(tmp_path))